@@ -162,6 +162,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.singletons.site_singletons',
             ],
         },
     },
@@ -197,6 +198,73 @@ else:
         }
     }
 
+# Shared cache (exam clocks and payloads, rendered pages, tag versions) and a
+# separate session cache. All gunicorn workers must see the same entries, so
+# the default is the database cache, in the `django_cache` and
+# `django_session_cache` tables (created by `manage.py createcachetable` in
+# build.sh / start.sh). Every read from it is a SQL query, so the "no query"
+# paths (304s, cached home and course pages) only avoid the database with a
+# network cache. Set CACHE_URL to use another backend:
+#   redis://host:6379/0       network cache (requires the `redis` package)
+#   memcached://host:11211    network cache (requires the `pymemcache` package)
+#   file:///var/tmp/oc-cache  file cache, shared by workers on one host
+#   locmem://                 per-process memory, for local experiments only
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'oc')
+# Entries kept by the database, file and memory backends before they cull a
+# third of them. Django's default of 300 is far below one entry per session
+# and exam attempt plus the page renders, and a culled tag version silently
+# invalidates everything stored under it.
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '100000'))
+
+
+def _cache_config(url, table):
+    from urllib.parse import urlparse
+    parsed = urlparse(url)
+    scheme = parsed.scheme
+    if scheme in ('redis', 'rediss'):
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured('CACHE_URL uses redis but the redis package is not installed.')
+        return {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': url}
+    if scheme == 'memcached':
+        try:
+            import pymemcache  # noqa: F401
+        except ImportError:
+            from django.core.exceptions import ImproperlyConfigured
+            raise ImproperlyConfigured('CACHE_URL uses memcached but pymemcache is not installed.')
+        return {'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache', 'LOCATION': parsed.netloc}
+    # The remaining backends cull at MAX_ENTRIES; each alias gets its own
+    # directory / table / memory so sessions never evict cache entries
+    options = {'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES}}
+    if scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.path.join(parsed.path, table), **options}
+    if scheme == 'locmem':
+        return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': f'{parsed.netloc or "default"}-{table}', **options}
+    return {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': table, **options}
+
+
+CACHES = {
+    'default': {
+        **_cache_config(CACHE_URL, 'django_cache'),
+        'KEY_PREFIX': CACHE_KEY_PREFIX,
+        'TIMEOUT': 300,
+    },
+    'sessions': {
+        **_cache_config(CACHE_URL, 'django_session_cache'),
+        'KEY_PREFIX': f'{CACHE_KEY_PREFIX}-sessions',
+    },
+}
+
+# Sessions are read on every exam clock poll; keep them in the cache and only
+# fall back to the database on a miss.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+
 # Security Settings - Production only (disabled in DEBUG mode for local dev)
 SECURE_SSL_REDIRECT = not DEBUG
 SECURE_HSTS_SECONDS = 31536000 if not DEBUG else 0  # 1 year in production
@@ -253,6 +321,15 @@ SECURE_CONTENT_SECURITY_POLICY = {
         "'self'",
         "cdnjs.cloudflare.com",
     ),
+    # hls.js plays packaged lecture videos from blob: URLs and workers
+    "media-src": (
+        "'self'",
+        "blob:",
+    ),
+    "worker-src": (
+        "'self'",
+        "blob:",
+    ),
 } if not DEBUG else {}
 
 # Static files (CSS, JavaScript, Images)
@@ -269,6 +346,28 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Who sends protected media (videos, brochures, certificates) once a view has
+# authorized the request: 'python' streams it from the worker, 'nginx' hands
+# it off with X-Accel-Redirect, 'sendfile' with X-Sendfile. 'python' is for
+# local runs: with DEBUG off it fails the core.E002 deploy check that start.sh
+# runs (core/checks.py)
+PROTECTED_MEDIA_BACKEND = os.environ.get('PROTECTED_MEDIA_BACKEND', 'python').lower()
+# Internal nginx location mapped onto MEDIA_ROOT (see core/media_streaming.py)
+PROTECTED_MEDIA_ACCEL_PREFIX = os.environ.get('PROTECTED_MEDIA_ACCEL_PREFIX', '/protected-media/')
+
+# Comma-separated check ids to silence, e.g. core.E002 on a host with no
+# front proxy for protected media
+SILENCED_SYSTEM_CHECKS = [
+    check.strip() for check in os.environ.get('SILENCED_SYSTEM_CHECKS', '').split(',') if check.strip()
+]
+
+# ffmpeg used to package lecture videos as HLS (see core/video_packaging.py);
+# empty means `ffmpeg` on PATH, and without one packaging is skipped
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', '')
+
+# Processes resizing uploaded images into responsive variants (see core/image_variants.py)
+IMAGE_VARIANT_WORKERS = int(os.environ.get('IMAGE_VARIANT_WORKERS', '2'))
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -290,7 +389,11 @@ RAZORPAY_SETTINGS = {
     'ENABLED': os.environ.get('RAZORPAY_ENABLED', 'true').lower() == 'true',
     'KEY_ID': os.environ.get('RAZORPAY_KEY_ID'),
     'KEY_SECRET': os.environ.get('RAZORPAY_KEY_SECRET'),
-    'CURRENCY': os.environ.get('RAZORPAY_CURRENCY', 'INR')
+    'CURRENCY': os.environ.get('RAZORPAY_CURRENCY', 'INR'),
+    # Secret configured for the webhook in the Razorpay dashboard
+    'WEBHOOK_SECRET': os.environ.get('RAZORPAY_WEBHOOK_SECRET', ''),
+    # API base URL override, e.g. a local stub (scripts/razorpay_stub.py)
+    'BASE_URL': os.environ.get('RAZORPAY_BASE_URL', ''),
 }
 
 # Direct settings for easier access in views
@@ -298,6 +401,8 @@ RAZORPAY_ENABLED = RAZORPAY_PACKAGE_AVAILABLE and RAZORPAY_SETTINGS['ENABLED']
 RAZORPAY_KEY_ID = RAZORPAY_SETTINGS['KEY_ID']
 RAZORPAY_KEY_SECRET = RAZORPAY_SETTINGS['KEY_SECRET']
 RAZORPAY_CURRENCY = RAZORPAY_SETTINGS['CURRENCY']
+RAZORPAY_WEBHOOK_SECRET = RAZORPAY_SETTINGS['WEBHOOK_SECRET']
+RAZORPAY_BASE_URL = RAZORPAY_SETTINGS['BASE_URL']
 
 # Logging configuration
 LOGGING = {
@@ -8,6 +8,9 @@ pip install -r requirements.txt
 # Run database migrations
 python manage.py migrate
 
+# Create the database cache table (no-op when it exists or another CACHE_URL is set)
+python manage.py createcachetable
+
 # Collect static files (WhiteNoise will serve these)
 python manage.py collectstatic --no-input
 
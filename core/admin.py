@@ -19,6 +19,7 @@ from .models import (
 )
 from .models_brochure import BrochureDownload
 from .admin_brochure import BrochureDownloadAdmin
+from . import video_packaging
 from django.urls import path, reverse
 from django.shortcuts import render
 from django.forms import formset_factory
@@ -306,14 +307,14 @@ class CourseCategoryAdmin(admin.ModelAdmin):
 
 @admin.register(CourseBrowser)
 class CourseBrowserAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category', 'is_active', 'order', 'created_at')
+    list_display = ('name', 'category', 'course', 'is_active', 'order', 'created_at')
     list_filter = ('is_active', 'category')
     search_fields = ('name',)
     list_editable = ('is_active', 'order')
     ordering = ('order',)
     fieldsets = (
         (None, {
-            'fields': ('name', 'image', 'category', 'is_active', 'order')
+            'fields': ('name', 'image', 'category', 'course', 'is_active', 'order')
         }),
     )
     
@@ -375,10 +376,10 @@ class CourseScheduleDayInline(admin.TabularInline):
 
 @admin.register(CoursePayment)
 class CoursePaymentAdmin(admin.ModelAdmin):
-    list_display = ('user', 'course', 'amount', 'status', 'created_at')
-    list_filter = ('status', 'created_at')
+    list_display = ('user', 'course', 'amount', 'status', 'confirmed_via', 'captured_at', 'created_at')
+    list_filter = ('status', 'confirmed_via', 'created_at')
     search_fields = ('user__email', 'course__name', 'order_id', 'payment_id')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('confirmed_via', 'captured_at', 'created_at', 'updated_at')
     ordering = ('-created_at',)
 
 @admin.register(CourseAccess)
@@ -714,9 +715,18 @@ class CourseScheduleItemAdmin(admin.ModelAdmin):
     ordering = ('day', 'order')
     fieldsets = (
         (None, {'fields': ('day', 'title', 'thumbnail')}),
-        ('Video', {'fields': ('video_file',)}),
+        ('Video', {'fields': ('video_file', 'duration_seconds', 'hls_status', 'hls_progress', 'hls_error')}),
         ('Options', {'fields': ('order', 'is_active')}),
     )
+    readonly_fields = ('duration_seconds', 'hls_status', 'hls_progress', 'hls_error')
+    actions = ['repackage_videos']
+
+    def repackage_videos(self, request, queryset):
+        """Bulk action to package the selected videos as HLS again"""
+        item_pks = list(queryset.values_list('pk', flat=True))
+        queued = video_packaging.mark_pending(item_pks)
+        self.message_user(request, f'{queued} video(s) queued for HLS packaging.', messages.SUCCESS)
+    repackage_videos.short_description = 'Package selected videos as HLS again'
 
 
 # ============ EXAM ADMIN ============
@@ -738,8 +748,8 @@ class CourseExamAdmin(admin.ModelAdmin):
     fieldsets = (
         (None, {'fields': ('course', 'title', 'description')}),
         ('Exam Settings', {
-            'fields': ('duration_minutes', 'passing_score', 'max_attempts', 'question_count', 'is_active'),
-            'description': 'Configure exam duration (minutes), passing score (%), max attempts, and active status.'
+            'fields': ('duration_minutes', 'passing_score', 'max_attempts', 'question_count', 'randomize_questions', 'shuffle_options', 'is_active'),
+            'description': 'Configure exam duration (minutes), passing score (%), max attempts, per-attempt question selection, and active status.'
         }),
     )
     readonly_fields = ('updated_at',)
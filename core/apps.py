@@ -21,3 +21,12 @@ class CoreConfig(AppConfig):
             import core.signals  # noqa
         except ImportError:
             pass
+
+        # Register the deployment system checks (see core.checks)
+        from . import checks  # noqa: F401
+
+        # Resolve payment gateway credentials once per process; the optional
+        # health check runs in the background (see core.payment_gateway)
+        from . import payment_gateway
+        payment_gateway.get_config()
+        payment_gateway.start_health_check()
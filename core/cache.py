@@ -0,0 +1,205 @@
+"""
+Shared cache helpers for the `core` app.
+
+Wraps Django's configured cache (see CACHES in settings) with:
+
+* Namespaces: every entry lives under a named namespace with a code-level
+  schema version, so changing the shape of cached data only requires bumping
+  that version (old entries are ignored and age out).
+* Tags: entries can be stored with tags. Invalidating a tag bumps its version
+  and every entry stored under an older version becomes a miss.
+  `invalidate_tags_on` wires that to model post_save/post_delete signals.
+* Single-flight `get_or_set`: on a miss, only the caller holding a short
+  lock recomputes. Entries outlive their timeout (and tag invalidations) by
+  `STALE_SECONDS`, and concurrent callers are served that stale value while
+  the refresh runs; with nothing to serve they compute it themselves. Nobody
+  waits on the lock: under ASGI sync views share one thread per worker, and
+  with the database cache every poll of the lock would be another query.
+* Per-process hit/miss counters, exposed through `metrics()`.
+"""
+
+from collections import defaultdict
+import os
+import threading
+import time
+
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+TAG_KEY = 'tag:{tag}'
+# How long a recompute lock is held at most.
+LOCK_TIMEOUT = 30
+# How long past its timeout an entry is kept to serve while it is refreshed.
+STALE_SECONDS = 60
+
+_MISSING = object()
+
+_metrics_lock = threading.Lock()
+_metrics = defaultdict(lambda: defaultdict(int))
+
+
+def _count(namespace, event, amount=1):
+    with _metrics_lock:
+        _metrics[namespace][event] += amount
+
+
+def metrics():
+    """Snapshot of this worker's cache counters, per namespace."""
+    with _metrics_lock:
+        namespaces = {name: dict(counters) for name, counters in _metrics.items()}
+    for counters in namespaces.values():
+        lookups = counters.get('hits', 0) + counters.get('misses', 0)
+        counters['hit_ratio'] = round(counters.get('hits', 0) / lookups, 4) if lookups else None
+    return {'pid': os.getpid(), 'namespaces': namespaces}
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def _backend(alias='default'):
+    return caches[alias]
+
+
+def tag_version(tag, alias='default'):
+    """Current version of `tag`, creating it on first use."""
+    backend = _backend(alias)
+    key = TAG_KEY.format(tag=tag)
+    version = backend.get(key)
+    if version is None:
+        version = time.time_ns()
+        # add() so concurrent first readers agree on a single version
+        if not backend.add(key, version, None):
+            version = backend.get(key, version)
+    return version
+
+
+def tag_versions(tags, alias='default'):
+    """Current versions of several tags, read in one round-trip."""
+    if not tags:
+        return {}
+    backend = _backend(alias)
+    found = backend.get_many([TAG_KEY.format(tag=tag) for tag in tags])
+    versions = {}
+    for tag in tags:
+        version = found.get(TAG_KEY.format(tag=tag))
+        versions[tag] = version if version is not None else tag_version(tag, alias)
+    return versions
+
+
+def invalidate_tags(*tags, alias='default'):
+    """Make every entry stored under any of `tags` stale."""
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+    version = time.time_ns()
+    _backend(alias).set_many({TAG_KEY.format(tag=tag): version for tag in tags}, None)
+    for tag in tags:
+        _count('tags', 'invalidations')
+
+
+def invalidate_tags_on(model, tags_for, alias='default'):
+    """Invalidate `tags_for(instance)` whenever a `model` row is saved or deleted."""
+    def _invalidate(sender, instance, **kwargs):
+        invalidate_tags(*tags_for(instance), alias=alias)
+
+    uid = f'core.cache:{model._meta.label}:{getattr(tags_for, "__qualname__", id(tags_for))}'
+    post_save.connect(_invalidate, sender=model, weak=False, dispatch_uid=uid + ':save')
+    post_delete.connect(_invalidate, sender=model, weak=False, dispatch_uid=uid + ':delete')
+    return _invalidate
+
+
+class Namespace:
+    """A named, versioned group of cache entries."""
+
+    def __init__(self, name, version=1, timeout=300, alias='default'):
+        self.name = name
+        self.version = version
+        self.timeout = timeout
+        self.alias = alias
+
+    @property
+    def backend(self):
+        return _backend(self.alias)
+
+    def key(self, *parts):
+        return ':'.join([self.name, f'v{self.version}', *(str(part) for part in parts)])
+
+    def _unwrap(self, envelope):
+        """Return ``(value, fresh)``; value is _MISSING if absent.
+
+        An entry past its timeout or stored under stale tags is returned with
+        ``fresh=False`` so `get_or_set` can serve it during a refresh.
+        """
+        if envelope is None or len(envelope) != 3:
+            return _MISSING, False
+        value, tags, fresh_until = envelope
+        if fresh_until is not None and time.time() >= fresh_until:
+            _count(self.name, 'expired')
+            return value, False
+        if tags and tag_versions(list(tags), self.alias) != tags:
+            _count(self.name, 'stale')
+            return value, False
+        return value, True
+
+    def _store(self, key, value, versions, timeout):
+        timeout = self.timeout if timeout is _MISSING else timeout
+        if timeout is None:
+            self.backend.set(key, (value, versions, None), None)
+        else:
+            self.backend.set(key, (value, versions, time.time() + timeout), timeout + STALE_SECONDS)
+
+    def get(self, *parts, default=None):
+        value, fresh = self._unwrap(self.backend.get(self.key(*parts)))
+        if not fresh:
+            _count(self.name, 'misses')
+            return default
+        _count(self.name, 'hits')
+        return value
+
+    def set(self, *parts, value, timeout=_MISSING, tags=()):
+        versions = tag_versions(list(tags), self.alias) if tags else None
+        self._store(self.key(*parts), value, versions, timeout)
+
+    def delete(self, *parts):
+        self.backend.delete(self.key(*parts))
+
+    def get_or_set(self, *parts, compute, timeout=_MISSING, tags=()):
+        """Return the cached value, computing it under a single-flight lock on a miss."""
+        key = self.key(*parts)
+        value, fresh = self._unwrap(self.backend.get(key))
+        if fresh:
+            _count(self.name, 'hits')
+            return value
+        _count(self.name, 'misses')
+
+        lock_key = key + ':lock'
+        if not self.backend.add(lock_key, 1, LOCK_TIMEOUT):
+            # Someone else is refreshing it: serve the old value if there is
+            # one, otherwise compute it here rather than wait
+            if value is not _MISSING:
+                _count(self.name, 'stale_served')
+                return value
+            _count(self.name, 'lock_contended')
+            return self._compute(parts, compute, timeout, tags)
+        try:
+            return self._compute(parts, compute, timeout, tags)
+        finally:
+            self.backend.delete(lock_key)
+
+    def _compute(self, parts, compute, timeout, tags):
+        # Read tag versions before computing so an invalidation that happens
+        # while computing leaves the new entry stale rather than wrong.
+        versions = tag_versions(list(tags), self.alias) if tags else None
+        started = time.perf_counter()
+        value = compute()
+        _count(self.name, 'computes')
+        _count(self.name, 'compute_ms', int((time.perf_counter() - started) * 1000))
+        self._store(self.key(*parts), value, versions, timeout)
+        return value
+
+
+def namespace(name, version=1, timeout=300, alias='default'):
+    """Declare a cache namespace; see `Namespace`."""
+    return Namespace(name, version=version, timeout=timeout, alias=alias)
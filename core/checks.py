@@ -0,0 +1,39 @@
+"""
+System checks for deployment settings the core app depends on.
+
+Registered from CoreConfig.ready() as deploy checks: `manage.py check
+--deploy`, which start.sh runs before anything else, refuses a configuration
+that would quietly degrade in production. (The test runner switches DEBUG off
+but skips deploy checks.)
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROTECTED_MEDIA_BACKENDS = ('python', 'nginx', 'sendfile')
+
+
+@register(Tags.compatibility, deploy=True)
+def check_protected_media_backend(app_configs, **kwargs):
+    """Protected media must be handed to a front proxy outside DEBUG."""
+    backend = settings.PROTECTED_MEDIA_BACKEND
+    if backend not in PROTECTED_MEDIA_BACKENDS:
+        return [Error(
+            f'PROTECTED_MEDIA_BACKEND is {backend!r}.',
+            hint=f"Use one of: {', '.join(PROTECTED_MEDIA_BACKENDS)}.",
+            id='core.E001',
+        )]
+    if backend == 'python' and not settings.DEBUG:
+        return [Error(
+            "PROTECTED_MEDIA_BACKEND is 'python' with DEBUG off.",
+            hint=(
+                'Every lecture video, brochure and certificate download is then '
+                'streamed by the ASGI workers for as long as the client takes. '
+                "Serve MEDIA_ROOT from a front proxy and set PROTECTED_MEDIA_BACKEND "
+                "to 'nginx' (X-Accel-Redirect) or 'sendfile' (X-Sendfile); only "
+                "where no such proxy exists, add 'core.E002' to "
+                'SILENCED_SYSTEM_CHECKS.'
+            ),
+            id='core.E002',
+        )]
+    return []
@@ -0,0 +1,70 @@
+"""
+Conditional GET for the public content pages.
+
+The home, about and course pages only change when an admin edits the content
+behind them, and each of those edits already invalidates a `core.cache` tag.
+For anonymous visitors the tag version (a nanosecond timestamp) is therefore
+a complete version stamp of the page: it is served as a weak ETag and as
+Last-Modified, and `If-None-Match` / `If-Modified-Since` requests that match
+get a 304 after a single cache read, before the view runs (no model queries,
+no template rendering). With the default database cache that read is itself
+a SQL query; only a network cache (CACHE_URL) keeps the database out of it.
+
+Logged-in users see per-user content (navigation, access state), so their
+requests skip the conditional path and always get a full response.
+"""
+
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .cache import tag_version
+
+ABOUT_TAG = 'about'
+
+_UNSET = object()
+
+
+def _content_version(tag_for):
+    """Per-request memoized tag version, or None for logged-in users."""
+    def version(request, *args, **kwargs):
+        found = getattr(request, '_content_version', _UNSET)
+        if found is _UNSET:
+            found = None
+            if not request.user.is_authenticated:
+                found = tag_version(tag_for(*args, **kwargs))
+            request._content_version = found
+        return found
+    return version
+
+
+def conditional_page(tag_for):
+    """Serve a view with ETag/Last-Modified derived from `tag_for(*args, **kwargs)`.
+
+    `tag_for` receives the view's URL arguments and returns the cache tag
+    whose invalidation marks a content change of the page.
+    """
+    version = _content_version(tag_for)
+
+    def etag(request, *args, **kwargs):
+        current = version(request, *args, **kwargs)
+        return None if current is None else 'W/"%x"' % current
+
+    def last_modified(request, *args, **kwargs):
+        current = version(request, *args, **kwargs)
+        return None if current is None else datetime.fromtimestamp(current / 1e9, tz=dt_timezone.utc)
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def _wrapped(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if version(request, *args, **kwargs) is not None:
+                # Let browsers keep the page but revalidate it on every visit
+                patch_cache_control(response, no_cache=True)
+            return response
+        return _wrapped
+    return decorator
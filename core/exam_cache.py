@@ -0,0 +1,225 @@
+"""
+Cache helpers for the exam portal.
+
+Every open exam tab polls the server for the attempt clock. The values it
+needs (deadline, exam version stamp, question count) only change when the
+attempt is created or submitted, or when an admin edits the exam, so they are
+computed once and served from the shared cache (`core.cache`). Signal
+handlers in `core.signals` drop the per-exam metadata whenever a `CourseExam`
+or `ExamQuestion` changes. Polling is database-free only with a network
+cache (CACHE_URL); with the default database cache every cache read is a
+query.
+
+The answer-free question payload is identical for everyone taking an exam,
+so it is encoded once per content version and shared through the cache, with
+a small in-process LRU in front of it.
+"""
+
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import json
+import threading
+
+from django.contrib.auth import HASH_SESSION_KEY
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .cache import invalidate_tags, namespace, tag_version
+
+# Clock entries only need to outlive the attempt itself.
+CLOCK_TIMEOUT = 60 * 60 * 24
+# Payloads are keyed by content version, so they never go stale; the timeout
+# only lets old versions age out.
+PAYLOAD_TIMEOUT = 60 * 60 * 24
+# Admin edits delete the metadata entry directly (see core.signals), so the
+# aggregate only reruns after an edit; the timeout is just a safety net.
+META_TIMEOUT = PAYLOAD_TIMEOUT
+# Encoded payloads kept in this process, most recently used last.
+LOCAL_PAYLOAD_SLOTS = 32
+
+clocks = namespace('exam-clock', version=2, timeout=CLOCK_TIMEOUT)
+exam_meta = namespace('exam-meta', timeout=META_TIMEOUT)
+question_payloads = namespace('exam-payload', timeout=PAYLOAD_TIMEOUT)
+
+_local_payloads = OrderedDict()
+_local_payloads_lock = threading.Lock()
+
+
+def questions_tag(exam_id):
+    """Cache tag covering everything derived from an exam's questions."""
+    return f'exam-questions:{exam_id}'
+
+
+def user_tag(user_id):
+    """Cache tag covering the clocks of a user's attempts (moved by account edits)."""
+    return f'exam-user:{user_id}'
+
+
+def _compute_exam_meta(exam):
+    """Run the (relatively expensive) aggregate over the exam's questions."""
+    qagg = exam.questions.aggregate(updated_at=Max('updated_at'), total=Count('id'))
+    return {
+        'exam_active': exam.is_active,
+        'exam_updated_at': (exam.updated_at.isoformat() if exam.updated_at else None),
+        'questions_updated_at': (qagg['updated_at'].isoformat() if qagg.get('updated_at') else None),
+        'questions_total': int(qagg.get('total') or 0),
+        'duration_minutes': exam.duration_minutes,
+    }
+
+
+def get_exam_meta(exam):
+    """Return cached metadata for `exam`, computing it on a miss."""
+    return exam_meta.get_or_set(exam.pk, compute=lambda: _compute_exam_meta(exam))
+
+
+def get_exam_meta_by_id(exam_id):
+    """Like `get_exam_meta` but only loads the exam row on a cache miss."""
+    meta = exam_meta.get(exam_id)
+    if meta is None:
+        from .models import CourseExam
+        meta = get_exam_meta(CourseExam.objects.get(pk=exam_id))
+    return meta
+
+
+def invalidate_exam_meta(exam_id):
+    """Forget the cached metadata for an exam (called from admin-edit signals)."""
+    exam_meta.delete(exam_id)
+
+
+def attempt_deadline(attempt):
+    """Absolute deadline of an attempt, based on its duration snapshot."""
+    if attempt.expires_at:
+        return attempt.expires_at
+    return attempt.started_at + timedelta(minutes=(attempt.duration_minutes or 150))
+
+
+def prime_clock(attempt, exam, user):
+    """Compute and cache the clock entry for `attempt`, taken by `user`.
+
+    Called when the attempt is created, and lazily on a cache miss. The
+    user's session auth hash and active flag are kept with it so polls can
+    authenticate without loading the user; saving the user (password change,
+    deactivation) invalidates the entry through `user_tag`.
+    """
+    clock = {
+        'attempt_id': attempt.pk,
+        'user_id': user.pk,
+        'user_active': user.is_active,
+        'session_hash': user.get_session_auth_hash(),
+        'exam_id': exam.pk,
+        'deadline': attempt_deadline(attempt).timestamp(),
+        'duration_minutes': attempt.duration_minutes or exam.duration_minutes,
+        'total_questions': attempt.total_questions,
+        'is_submitted': attempt.is_submitted,
+    }
+    clocks.set(attempt.pk, value=clock, tags=[user_tag(user.pk)])
+    return clock
+
+
+def get_clock(attempt_id):
+    """Return the cached clock entry for an attempt, or None."""
+    return clocks.get(attempt_id)
+
+
+def mark_clock_submitted(attempt):
+    """Flip the cached clock to submitted so pollers stop immediately."""
+    clock = clocks.get(attempt.pk)
+    if clock is not None:
+        clock['is_submitted'] = True
+        clocks.set(attempt.pk, value=clock, tags=[user_tag(clock['user_id'])])
+
+
+def session_matches(clock, session):
+    """Whether `session` still authenticates the clock's user.
+
+    The same checks `django.contrib.auth.get_user` makes, minus the
+    SECRET_KEY_FALLBACKS hashes (callers fall back to `request.user`).
+    """
+    session_hash = session.get(HASH_SESSION_KEY)
+    return bool(
+        clock.get('user_active') and session_hash
+        and constant_time_compare(session_hash, clock['session_hash'])
+    )
+
+
+def remaining_seconds(clock, now=None):
+    """Seconds left on the clock (>= 0)."""
+    if clock['is_submitted']:
+        return 0
+    now = now or timezone.now()
+    return max(0, int(clock['deadline'] - now.timestamp()))
+
+
+def clock_payload(clock, meta, now=None):
+    """Build the JSON body served to the portal (same shape as exam_time_left)."""
+    return {
+        'remaining_seconds': remaining_seconds(clock, now),
+        'is_submitted': clock['is_submitted'],
+        'deadline': clock['deadline'],
+        'exam_active': meta['exam_active'],
+        'exam_updated_at': meta['exam_updated_at'],
+        'questions_updated_at': meta['questions_updated_at'],
+        'questions_count': int(clock['total_questions'] or meta['questions_total']),
+        'duration_minutes': clock['duration_minutes'],
+    }
+
+
+def clock_etag(clock, meta):
+    """Weak ETag covering everything except the ticking remaining time.
+
+    The client runs its own countdown towards `deadline`, so two responses
+    with the same deadline, submission state and exam version are
+    interchangeable for it.
+    """
+    raw = '|'.join(str(v) for v in (
+        clock['deadline'], clock['is_submitted'], clock['total_questions'],
+        meta['exam_active'], meta['exam_updated_at'], meta['questions_updated_at'],
+    ))
+    return 'W/"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def get_payload_version(exam_id):
+    """Current content version of an exam's question payload."""
+    return tag_version(questions_tag(exam_id))
+
+
+def bump_payload_version(exam_id):
+    """Start a new payload version (called when any of the exam's questions change)."""
+    invalidate_tags(questions_tag(exam_id))
+
+
+def _encode_question_payload(exam_id):
+    """JSON-encode every question of an exam without answers or explanations."""
+    from .models import ExamQuestion
+    rows = ExamQuestion.objects.filter(exam_id=exam_id).values(
+        'id', 'order', 'question_text', 'option_a', 'option_b', 'option_c', 'option_d',
+    )
+    return {row['id']: json.dumps(row) for row in rows}
+
+
+def get_question_payload(exam_id):
+    """Map of question id -> pre-encoded JSON object for the current version.
+
+    Served from the in-process LRU when possible, then the shared cache, and
+    only rebuilt from the database after the version changes.
+    """
+    version = get_payload_version(exam_id)
+    local_key = (exam_id, version)
+    with _local_payloads_lock:
+        payload = _local_payloads.get(local_key)
+        if payload is not None:
+            _local_payloads.move_to_end(local_key)
+            return payload
+
+    payload = question_payloads.get_or_set(
+        exam_id, version, compute=lambda: _encode_question_payload(exam_id),
+    )
+
+    with _local_payloads_lock:
+        _local_payloads[local_key] = payload
+        _local_payloads.move_to_end(local_key)
+        while len(_local_payloads) > LOCAL_PAYLOAD_SLOTS:
+            _local_payloads.popitem(last=False)
+    return payload
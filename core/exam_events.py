@@ -0,0 +1,116 @@
+"""
+In-process event broadcaster for the exam portal's Server-Sent Events stream.
+
+Each open exam tab subscribes to two channels: one for its attempt
+(forced submission) and one for its exam (admin edits). Publishers are plain
+synchronous code (views, signal handlers) that may run on any thread, so
+events are handed to each subscriber's event loop with
+`call_soon_threadsafe`.
+
+The broadcaster only reaches streams served by the same process. Streams
+also re-read the shared clock/metadata cache on every tick, which is how
+changes made in other workers reach them.
+"""
+
+from collections import defaultdict
+import asyncio
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Events queued for a subscriber that is not reading are dropped beyond this.
+SUBSCRIBER_QUEUE_SIZE = 32
+
+
+def attempt_channel(attempt_id):
+    return f'attempt:{attempt_id}'
+
+
+def exam_channel(exam_id):
+    return f'exam:{exam_id}'
+
+
+class Subscription:
+    """A single stream's view of the broadcaster."""
+
+    def __init__(self, broadcaster, channels):
+        self.broadcaster = broadcaster
+        self.channels = tuple(channels)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _deliver(self, event, data):
+        try:
+            self.queue.put_nowait((event, data))
+        except asyncio.QueueFull:
+            logger.warning('Dropping exam event %s for slow subscriber', event)
+
+    async def get(self, timeout):
+        """Wait up to `timeout` seconds for the next (event, data) pair."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None, None
+
+    def close(self):
+        self.broadcaster.unsubscribe(self)
+
+
+class ExamBroadcaster:
+    """Fan-out of exam events to the streams subscribed in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, *channels):
+        """Subscribe the running event loop to `channels`."""
+        subscription = Subscription(self, channels)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, event, data=None):
+        """Deliver `event` to every subscriber of `channel`. Thread-safe."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event, data)
+            except RuntimeError:
+                # The subscriber's loop has already shut down.
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+broadcaster = ExamBroadcaster()
+
+
+def publish_attempt_submitted(attempt_id):
+    broadcaster.publish(attempt_channel(attempt_id), 'submitted')
+
+
+def publish_exam_updated(exam_id):
+    broadcaster.publish(exam_channel(exam_id), 'exam_updated')
+
+
+def format_event(event, data):
+    """Encode one Server-Sent Events frame."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
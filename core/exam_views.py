@@ -1,14 +1,21 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.contrib.auth import SESSION_KEY
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.views.decorators.http import require_http_methods
-from django.db import transaction
-from django.db.models import Count, Max
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef
 from django.utils import timezone
+from django.utils.http import parse_etags
+from asgiref.sync import sync_to_async
 from datetime import timedelta
+import asyncio
 import json
+import random
 from .models import Course, CourseAccess, CourseProgress, CourseExam, ExamAttempt, ExamAnswer, ExamQuestion, ExamViolation, Certificate, CourseScheduleItem
 from django.conf import settings
+from . import exam_cache, exam_events
 
 
 @login_required
@@ -110,6 +117,12 @@ def exam_start(request, course_id):
         is_submitted=False
     ).order_by('-attempt_number').first()
     
+    if unsubmitted and unsubmitted.expires_at and unsubmitted.expires_at <= timezone.now():
+        # The deadline passed without a submission (e.g. the tab was closed
+        # before the sweeper ran): grade it now instead of resuming it.
+        _finalize_expired_attempt(unsubmitted.id)
+        unsubmitted = None
+
     if unsubmitted:
         # Resume the existing unsubmitted attempt
         return redirect('exam_portal', attempt_id=unsubmitted.id)
@@ -124,25 +137,72 @@ def exam_start(request, course_id):
     # attempt_number should be last attempt_number + 1
     last_attempt = attempts.order_by('-attempt_number').first()
     attempt_number = (last_attempt.attempt_number + 1) if last_attempt else 1
-    # Determine how many questions should be included in this attempt.
-    active_q_count = exam.questions.filter(is_active=True).count()
-    # If exam.question_count is 0, it means use all active questions. Otherwise use the configured count.
-    configured_count = (exam.question_count or 0)
-    if configured_count and configured_count > 0:
-        use_count = min(configured_count, active_q_count)
-    else:
-        use_count = active_q_count
+    # Pick this attempt's questions once; every later read uses the snapshot.
+    seed = random.SystemRandom().getrandbits(63)
+    question_ids, option_order = _select_attempt_questions(exam, seed)
 
     attempt = ExamAttempt.objects.create(
         course_access=access,
         attempt_number=attempt_number,
-        total_questions=use_count,
+        total_questions=len(question_ids),
+        question_ids=question_ids,
+        option_order=option_order,
+        question_seed=seed,
         duration_minutes=exam.duration_minutes  # Capture exam duration at time of attempt creation
     )
+    # Cache the clock now so the portal's polling never has to rebuild it
+    exam_cache.prime_clock(attempt, exam, request.user)
     
     return redirect('exam_portal', attempt_id=attempt.id)
 
 
+def _select_attempt_questions(exam, seed):
+    """Choose the question snapshot for a new attempt.
+
+    Samples `exam.question_count` questions (0 = all) from the active pool
+    with a generator seeded by `seed`, so the selection can be reproduced.
+    Returns the ordered question IDs and, when the exam shuffles options, a
+    per-question option display order such as ``{"12": "CADB"}``.
+    """
+    pool = list(exam.questions.filter(is_active=True).order_by('order').values_list('id', flat=True))
+    # If exam.question_count is 0, it means use all active questions. Otherwise use the configured count.
+    configured_count = (exam.question_count or 0)
+    use_count = min(configured_count, len(pool)) if configured_count > 0 else len(pool)
+
+    rng = random.Random(seed)
+    if exam.randomize_questions:
+        question_ids = rng.sample(pool, use_count)
+    else:
+        question_ids = pool[:use_count]
+
+    option_order = {}
+    if exam.shuffle_options:
+        option_order = {str(qid): ''.join(rng.sample('ABCD', 4)) for qid in question_ids}
+    return question_ids, option_order
+
+
+def _attempt_question_ids(attempt, exam=None):
+    """Ordered question IDs assigned to an attempt.
+
+    Attempts created before question snapshots existed fall back to the
+    first `total_questions` active questions, as they were served then.
+    """
+    if attempt.question_ids:
+        return list(attempt.question_ids)
+    exam = exam or attempt.course_access.course.exam
+    return list(
+        exam.questions.filter(is_active=True).order_by('order')
+        .values_list('id', flat=True)[:attempt.total_questions]
+    )
+
+
+def _attempt_questions(attempt, exam=None):
+    """The attempt's ExamQuestion rows, in snapshot order (one PK lookup)."""
+    question_ids = _attempt_question_ids(attempt, exam)
+    by_id = ExamQuestion.objects.in_bulk(question_ids)
+    return [by_id[qid] for qid in question_ids if qid in by_id]
+
+
 @login_required
 def exam_portal(request, attempt_id):
     """Full-screen exam portal."""
@@ -153,8 +213,8 @@ def exam_portal(request, attempt_id):
     if attempt.is_submitted:
         return redirect('exam_results', attempt_id=attempt.id)
     
-    # Limit the questions returned to the attempt's total_questions (snapshot at creation time)
-    questions = exam.questions.filter(is_active=True).order_by('order')[:attempt.total_questions]
+    # Questions assigned to this attempt (snapshot at creation time)
+    questions = _attempt_questions(attempt, exam)
 
     context = {
         'attempt': attempt,
@@ -171,34 +231,38 @@ def exam_portal(request, attempt_id):
 @require_http_methods(['GET'])
 @login_required
 def exam_get_questions(request, attempt_id):
-    """API: Get all questions for the exam."""
-    attempt = get_object_or_404(ExamAttempt, id=attempt_id, course_access__user=request.user)
+    """API: Get all questions for the exam.
+
+    The answer-free question JSON is shared by everyone taking the exam and
+    comes pre-encoded from `exam_cache.get_question_payload`; only this
+    attempt's selected answers and option order are added per request.
+    """
+    attempt = get_object_or_404(
+        ExamAttempt.objects.select_related('course_access__course__exam'),
+        id=attempt_id, course_access__user=request.user,
+    )
     exam = attempt.course_access.course.exam
     
     if attempt.is_submitted:
         return JsonResponse({'error': 'Exam already submitted'}, status=400)
     
-    # Return only the subset of active questions assigned to this attempt
-    questions = exam.questions.filter(is_active=True).order_by('order')[:attempt.total_questions]
+    # Return only the questions assigned to this attempt, in snapshot order
+    question_ids = _attempt_question_ids(attempt, exam)
+    payload = exam_cache.get_question_payload(exam.pk)
+    fragments = [payload[qid] for qid in question_ids if qid in payload]
     
     # Fetch user's answers
-    answers = ExamAnswer.objects.filter(attempt=attempt)
-    answer_map = {a.question_id: a.selected_answer for a in answers}
-    
-    data = []
-    for q in questions:
-        data.append({
-            'id': q.id,
-            'order': q.order,
-            'question_text': q.question_text,
-            'option_a': q.option_a,
-            'option_b': q.option_b,
-            'option_c': q.option_c,
-            'option_d': q.option_d,
-            'selected_answer': answer_map.get(q.id, ''),
-        })
+    answer_map = dict(
+        ExamAnswer.objects.filter(attempt=attempt).values_list('question_id', 'selected_answer')
+    )
     
-    return JsonResponse({'questions': data, 'total': len(data)})
+    body = '{"questions": [%s], "answers": %s, "option_order": %s, "total": %d}' % (
+        ','.join(fragments),
+        json.dumps(answer_map),
+        json.dumps(attempt.option_order or {}),
+        len(fragments),
+    )
+    return HttpResponse(body, content_type='application/json')
 
 
 @require_http_methods(['GET'])
@@ -217,25 +281,22 @@ def exam_time_left(request, attempt_id):
 
     # If the attempt is already submitted, remaining is zero
     exam = attempt.course_access.course.exam
+    exam_meta = exam_cache.get_exam_meta(exam)
 
     if attempt.is_submitted:
         # Use snapshot number of questions stored on the attempt when possible
         meta = {
-            'exam_active': exam.is_active,
-            'exam_updated_at': (exam.updated_at.isoformat() if exam.updated_at else None),
+            'exam_active': exam_meta['exam_active'],
+            'exam_updated_at': exam_meta['exam_updated_at'],
+            'questions_updated_at': exam_meta['questions_updated_at'],
+            'questions_count': int(attempt.total_questions or exam_meta['questions_total']),
+            'duration_minutes': attempt.duration_minutes or exam.duration_minutes,
         }
-        qagg = exam.questions.aggregate(updated_at=Max('updated_at'), total=Count('id'))
-        meta['questions_updated_at'] = (qagg.get('updated_at').isoformat() if qagg.get('updated_at') else None)
-        meta['questions_count'] = int(attempt.total_questions or (qagg.get('total') or 0))
-        meta['duration_minutes'] = attempt.duration_minutes or exam.duration_minutes
         return JsonResponse({'remaining_seconds': 0, 'is_submitted': True, **meta})
 
-    # Compute elapsed seconds since attempt started
+    # Use the attempt's stored deadline (captured at creation time), not the current exam duration
     now = timezone.now()
-    elapsed = int((now - attempt.started_at).total_seconds())
-    # Use the attempt's stored duration (captured at creation time), not the current exam duration
-    total_seconds = (attempt.duration_minutes or 150) * 60
-    remaining = max(0, total_seconds - elapsed)
+    remaining = max(0, int((exam_cache.attempt_deadline(attempt) - now).total_seconds()))
 
     # If remaining time is 0 and attempt not submitted, finalize server-side
     if remaining <= 0 and not attempt.is_submitted:
@@ -245,16 +306,151 @@ def exam_time_left(request, attempt_id):
         return JsonResponse({'remaining_seconds': 0, 'is_submitted': True})
 
     meta = {
-        'exam_active': exam.is_active,
-        'exam_updated_at': (exam.updated_at.isoformat() if exam.updated_at else None),
+        'exam_active': exam_meta['exam_active'],
+        'exam_updated_at': exam_meta['exam_updated_at'],
+        'questions_updated_at': exam_meta['questions_updated_at'],
+        'questions_count': int(attempt.total_questions or exam_meta['questions_total']),
+        'duration_minutes': attempt.duration_minutes or exam.duration_minutes,
     }
-    qagg = exam.questions.aggregate(updated_at=Max('updated_at'), total=Count('id'))
-    meta['questions_updated_at'] = (qagg.get('updated_at').isoformat() if qagg.get('updated_at') else None)
-    meta['questions_count'] = int(attempt.total_questions or (qagg.get('total') or 0))
-    meta['duration_minutes'] = attempt.duration_minutes or exam.duration_minutes
     return JsonResponse({'remaining_seconds': remaining, 'is_submitted': False, **meta})
 
 
+def _load_attempt_clock(attempt_id, user_id):
+    """Return the cached clock for an attempt owned by `user_id` (sync)."""
+    clock = exam_cache.get_clock(attempt_id)
+    if clock is None or str(clock['user_id']) != str(user_id):
+        attempt = get_object_or_404(
+            ExamAttempt.objects.select_related('course_access__course__exam', 'course_access__user'),
+            id=attempt_id, course_access__user_id=user_id,
+        )
+        access = attempt.course_access
+        clock = exam_cache.prime_clock(attempt, access.course.exam, access.user)
+    return clock
+
+
+def _finalize_expired_attempt(attempt_id):
+    """Finalize an attempt whose deadline has passed (sync)."""
+    with transaction.atomic():
+        attempt = ExamAttempt.objects.filter(id=attempt_id).first()
+        if attempt and not attempt.is_submitted:
+            _finalize_and_grade_attempt(attempt)
+
+
+@require_http_methods(['GET'])
+def exam_clock(request, attempt_id):
+    """API: compact, cache-served variant of `exam_time_left` for polling.
+
+    The attempt's deadline and the exam's version stamp are cached when the
+    attempt is created, so the steady-state poll is answered from the cache
+    and the session alone; the session is checked against the user's auth
+    hash and active flag cached with the clock. Responses carry a weak ETag;
+    a matching If-None-Match gets an empty 304 and the client keeps its local
+    countdown. Once the deadline passes the attempt is finalized through the
+    same path as `exam_time_left`.
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if not user_id:
+        return redirect_to_login(request.get_full_path())
+
+    # A cache miss (or someone else's attempt) rebuilds the clock from the
+    # database, which also enforces ownership.
+    clock = _load_attempt_clock(attempt_id, user_id)
+    if not exam_cache.session_matches(clock, request.session):
+        # Changed password, deactivated account or rotated secret key: let
+        # django.contrib.auth verify (and flush) the session
+        if not request.user.is_authenticated or str(request.user.pk) != str(user_id):
+            return redirect_to_login(request.get_full_path())
+
+    meta = exam_cache.get_exam_meta_by_id(clock['exam_id'])
+
+    if not clock['is_submitted'] and exam_cache.remaining_seconds(clock) <= 0:
+        _finalize_expired_attempt(attempt_id)
+        clock = dict(clock, is_submitted=True)
+
+    etag = exam_cache.clock_etag(clock, meta)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(exam_cache.clock_payload(clock, meta))
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+# How often the event stream pushes the remaining time when nothing else
+# happens, and how long a single stream stays open before the browser's
+# EventSource reconnects (which also re-checks the session).
+EXAM_EVENTS_TICK_SECONDS = 15
+EXAM_EVENTS_MAX_SECONDS = 10 * 60
+
+
+async def _exam_event_stream(attempt_id, clock):
+    """Yield SSE frames for one exam tab until the attempt ends."""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    subscription = exam_events.broadcaster.subscribe(
+        exam_events.attempt_channel(attempt_id),
+        exam_events.exam_channel(clock['exam_id']),
+    )
+    try:
+        meta = await sync_to_async(exam_cache.get_exam_meta_by_id)(clock['exam_id'])
+        etag = exam_cache.clock_etag(clock, meta)
+        yield 'retry: 5000\n\n'
+        yield exam_events.format_event('clock', exam_cache.clock_payload(clock, meta))
+
+        while loop.time() - started < EXAM_EVENTS_MAX_SECONDS:
+            event, _ = await subscription.get(EXAM_EVENTS_TICK_SECONDS)
+
+            # Re-read the shared cache so changes made by other workers
+            # (submission, admin edits) are picked up on the next tick.
+            clock = await sync_to_async(exam_cache.get_clock)(attempt_id) or clock
+            meta = await sync_to_async(exam_cache.get_exam_meta_by_id)(clock['exam_id'])
+
+            if event == 'submitted' or clock['is_submitted']:
+                yield exam_events.format_event('submitted', {'is_submitted': True, 'remaining_seconds': 0})
+                return
+
+            if exam_cache.remaining_seconds(clock) <= 0:
+                await sync_to_async(_finalize_expired_attempt)(attempt_id)
+                yield exam_events.format_event('submitted', {'is_submitted': True, 'remaining_seconds': 0})
+                return
+
+            payload = exam_cache.clock_payload(clock, meta)
+            new_etag = exam_cache.clock_etag(clock, meta)
+            if event == 'exam_updated' or new_etag != etag:
+                etag = new_etag
+                yield exam_events.format_event('exam_updated', payload)
+            else:
+                yield exam_events.format_event('clock', payload)
+    finally:
+        subscription.close()
+
+
+@require_http_methods(['GET'])
+async def exam_events_stream(request, attempt_id):
+    """API: Server-Sent Events stream replacing the portal's clock polling.
+
+    Pushes `clock` (remaining time), `exam_updated` (exam or question edits,
+    same fields as `exam_time_left`) and `submitted` (forced or deadline
+    submission) events. Runs as an async view, so under ASGI an idle stream
+    costs a coroutine rather than a worker.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    clock = await sync_to_async(_load_attempt_clock)(attempt_id, user.pk)
+
+    response = StreamingHttpResponse(
+        _exam_event_stream(attempt_id, clock),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Ask nginx-style proxies not to buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @require_http_methods(['POST'])
 @login_required
 def exam_save_answer(request, attempt_id):
@@ -265,9 +461,14 @@ def exam_save_answer(request, attempt_id):
         return JsonResponse({'error': 'Exam already submitted'}, status=400)
     
     data = json.loads(request.body)
-    question_id = data.get('question_id')
+    try:
+        question_id = int(data.get('question_id'))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'Invalid question'}, status=400)
     selected_answer = data.get('selected_answer', '')
     
+    if attempt.question_ids and question_id not in attempt.question_ids:
+        return JsonResponse({'error': 'Question is not part of this attempt'}, status=400)
     question = get_object_or_404(ExamQuestion, id=question_id, exam=attempt.course_access.course.exam)
     
     answer, created = ExamAnswer.objects.update_or_create(
@@ -279,17 +480,133 @@ def exam_save_answer(request, attempt_id):
     return JsonResponse({'success': True})
 
 
+# Values accepted for ExamAnswer.selected_answer ('' clears an answer).
+VALID_SELECTED_ANSWERS = {'A', 'B', 'C', 'D', ''}
+
+
+def _parse_answer_entries(body):
+    """The ``answers`` list of a JSON request body (None when malformed)."""
+    try:
+        entries = json.loads(body or b'{}').get('answers', [])
+    except (ValueError, AttributeError):
+        return None
+    return entries if isinstance(entries, list) else None
+
+
+def _upsert_answers(attempt_id, exam_id, snapshot_ids, entries):
+    """Store a batch of answer entries for an attempt.
+
+    Keeps the entry with the highest ``client_seq`` per question, validates
+    the questions against the attempt's snapshot (or the exam when there is
+    none, with one query) and writes them with a single bulk upsert. Returns
+    ``(saved, rejected, acked_seq)``.
+    """
+    # Keep only the newest entry per question
+    latest = {}
+    acked_seq = 0
+    rejected = []
+    for entry in entries:
+        try:
+            question_id = int(entry['question_id'])
+            client_seq = int(entry.get('client_seq') or 0)
+            selected_answer = entry.get('selected_answer') or ''
+        except (KeyError, TypeError, ValueError, AttributeError):
+            continue
+        acked_seq = max(acked_seq, client_seq)
+        if selected_answer not in VALID_SELECTED_ANSWERS:
+            rejected.append(question_id)
+            continue
+        if question_id not in latest or client_seq >= latest[question_id][1]:
+            latest[question_id] = (selected_answer, client_seq)
+
+    if snapshot_ids:
+        # The attempt's snapshot already lists its questions: no query needed
+        valid_ids = set(snapshot_ids).intersection(latest)
+    else:
+        valid_ids = set(ExamQuestion.objects.filter(
+            exam_id=exam_id, id__in=list(latest),
+        ).values_list('id', flat=True))
+    rejected.extend(qid for qid in latest if qid not in valid_ids)
+
+    rows = [
+        ExamAnswer(attempt_id=attempt_id, question_id=qid, selected_answer=answer)
+        for qid, (answer, _) in latest.items() if qid in valid_ids
+    ]
+    if rows:
+        ExamAnswer.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['attempt', 'question'],
+            update_fields=['selected_answer'],
+        )
+    return len(rows), rejected, acked_seq
+
+
+@require_http_methods(['POST'])
+@login_required
+def exam_save_answers(request, attempt_id):
+    """API: Save a batch of answers in one request.
+
+    Expects ``{"answers": [{"question_id", "selected_answer", "client_seq"}]}``.
+    The portal queues answer changes and flushes them here on a debounce, so
+    a student clicking through options costs one request per flush instead of
+    one per click. See `_upsert_answers`: when a question appears more than
+    once the entry with the highest ``client_seq`` wins. The response echoes
+    the highest ``client_seq`` processed so the client can drop acknowledged
+    entries from its queue.
+    """
+    attempt = get_object_or_404(
+        ExamAttempt.objects.filter(course_access__user=request.user).values(
+            'id', 'is_submitted', 'question_ids', 'course_access__course__exam__id',
+        ),
+        id=attempt_id,
+    )
+
+    if attempt['is_submitted']:
+        return JsonResponse({'error': 'Exam already submitted'}, status=400)
+
+    entries = _parse_answer_entries(request.body)
+    if entries is None:
+        return JsonResponse({'error': 'Invalid request format'}, status=400)
+
+    saved, rejected, acked_seq = _upsert_answers(
+        attempt['id'], attempt['course_access__course__exam__id'], attempt['question_ids'], entries,
+    )
+    return JsonResponse({
+        'success': True,
+        'saved': saved,
+        'rejected': rejected,
+        'acked_seq': acked_seq,
+    })
+
+
 @require_http_methods(['POST'])
 @login_required
 def exam_submit(request, attempt_id):
-    """API: Submit exam and auto-grade."""
+    """API: Submit exam and auto-grade.
+
+    The body may carry answers the portal could not flush yet (a forced or
+    deadline submit), in the `exam_save_answers` format; they are stored
+    before grading, under the same row lock.
+    """
     attempt = get_object_or_404(ExamAttempt, id=attempt_id, course_access__user=request.user)
     exam = attempt.course_access.course.exam
     
     if attempt.is_submitted:
         return JsonResponse({'error': 'Already submitted'}, status=400)
+
+    entries = _parse_answer_entries(request.body)
+    if entries is None:
+        return JsonResponse({'error': 'Invalid request format'}, status=400)
     
     with transaction.atomic():
+        # Lock before storing the last answers so a racing finalize cannot
+        # grade the attempt in between
+        still_open = ExamAttempt.objects.select_for_update().filter(
+            pk=attempt.pk, is_submitted=False,
+        ).exists()
+        if still_open and entries:
+            _upsert_answers(attempt.pk, exam.pk, attempt.question_ids, entries)
         # Finalize grading via helper (keeps logic in one place)
         result = _finalize_and_grade_attempt(attempt)
     
@@ -320,26 +637,47 @@ def _generate_certificate_if_not_exists(course_access):
     )
 
 
+def _on_attempt_submitted(attempt):
+    """Tell pollers and open event streams that the attempt is over."""
+    exam_cache.mark_clock_submitted(attempt)
+    exam_events.publish_attempt_submitted(attempt.pk)
+
+
 def _finalize_and_grade_attempt(attempt):
     """Internal helper to grade and finalize an ExamAttempt.
 
     Returns a dict with grading results and total questions count.
+
+    Must run inside a transaction. The attempt row is locked first, so a
+    manual submit, a deadline poll and the expiry sweeper racing on the same
+    attempt grade it exactly once; the losers just get the stored result.
     """
+    already_submitted = ExamAttempt.objects.select_for_update().filter(
+        pk=attempt.pk
+    ).values_list('is_submitted', flat=True).first()
+    if already_submitted:
+        attempt.refresh_from_db()
+        return {
+            'is_passed': attempt.is_passed,
+            'score_percentage': attempt.score_percentage,
+            'correct_count': attempt.correct_answers,
+            'total_questions': attempt.total_questions,
+        }
+
     exam = attempt.course_access.course.exam
-    answers = ExamAnswer.objects.filter(attempt=attempt).select_related('question')
 
     # Only grade the subset of questions that were assigned to the attempt
-    questions = exam.questions.filter(is_active=True).order_by('order')[:attempt.total_questions]
+    question_ids = _attempt_question_ids(attempt, exam)
+    answers = ExamAnswer.objects.filter(attempt=attempt, question_id__in=question_ids)
 
-    correct_count = 0
-    for answer in answers:
-        is_correct = answer.selected_answer == answer.question.correct_answer
-        answer.is_correct = is_correct
-        answer.save()
-        if is_correct:
-            correct_count += 1
+    # Grade every answer with a single UPDATE joined against the answer key,
+    # then derive the score from one aggregate instead of a save per answer.
+    answers.update(is_correct=Exists(
+        ExamQuestion.objects.filter(pk=OuterRef('question_id'), correct_answer=OuterRef('selected_answer'))
+    ))
+    correct_count = answers.filter(is_correct=True).count()
 
-    total = attempt.total_questions or questions.count()
+    total = attempt.total_questions or len(question_ids)
     score_percentage = (correct_count / total * 100) if total > 0 else 0
     is_passed = score_percentage >= exam.passing_score
 
@@ -349,7 +687,11 @@ def _finalize_and_grade_attempt(attempt):
     attempt.correct_answers = correct_count
     attempt.score_percentage = score_percentage
     attempt.is_passed = is_passed
-    attempt.save()
+    attempt.save(update_fields=[
+        'submitted_at', 'time_taken_seconds', 'is_submitted', 'correct_answers',
+        'score_percentage', 'is_passed', 'updated_at',
+    ])
+    transaction.on_commit(lambda: _on_attempt_submitted(attempt))
 
     if is_passed:
         _generate_certificate_if_not_exists(attempt.course_access)
@@ -362,50 +704,110 @@ def _finalize_and_grade_attempt(attempt):
     }
 
 
+# Upper bound on the events accepted in one coalesced violation report.
+MAX_VIOLATION_EVENTS = 50
+
+
+def _record_violation_events(attempt_id, events):
+    """Record a batch of violation events with atomic counter updates.
+
+    Events are grouped by type; each type costs one UPDATE with an F()
+    increment, plus an INSERT the first time it occurs in this attempt. The
+    attempt's counters are bumped with a single `update()` so no model save
+    (or post_save signal) runs. Returns the set of recorded types.
+    """
+    grouped = {}
+    for event in events:
+        violation_type = str(event.get('violation_type') or 'other')[:20]
+        entry = grouped.setdefault(violation_type, {'count': 0, 'description': '', 'auto_submit': False})
+        entry['count'] += 1
+        entry['description'] = event.get('description', '') or entry['description']
+        entry['auto_submit'] = entry['auto_submit'] or bool(event.get('auto_submit', False))
+    
+    new_types = 0
+    with transaction.atomic():
+        for violation_type, entry in grouped.items():
+            changes = {
+                'violation_count': F('violation_count') + entry['count'],
+                'description': entry['description'],
+            }
+            if entry['auto_submit']:
+                changes['auto_submitted'] = True
+            violations = ExamViolation.objects.filter(attempt_id=attempt_id, violation_type=violation_type)
+            if violations.update(**changes):
+                continue
+            try:
+                with transaction.atomic():
+                    ExamViolation.objects.create(
+                        attempt_id=attempt_id,
+                        violation_type=violation_type,
+                        violation_count=entry['count'],
+                        description=entry['description'],
+                        auto_submitted=entry['auto_submit'],
+                    )
+                new_types += 1
+            except IntegrityError:
+                # A concurrent request created the row first
+                violations.update(**changes)
+        
+        # violation_count on the attempt counts distinct violation types
+        ExamAttempt.objects.filter(pk=attempt_id).update(
+            has_violations=True,
+            violation_count=F('violation_count') + new_types,
+        )
+    return grouped
+
+
 @require_http_methods(['POST'])
 @login_required
 def exam_record_violation(request, attempt_id):
-    """API: Record a security violation during the exam."""
-    attempt = get_object_or_404(ExamAttempt, id=attempt_id, course_access__user=request.user)
+    """API: Record one or more security violations during the exam.
     
-    if attempt.is_submitted:
+    Accepts a single event (``violation_type``, ``description``,
+    ``auto_submit``) or a coalesced batch as ``{"events": [...]}``.
+    """
+    attempt_row = ExamAttempt.objects.filter(
+        id=attempt_id, course_access__user=request.user,
+    ).values('id', 'is_submitted').first()
+    if attempt_row is None:
+        return JsonResponse({'error': 'Exam attempt not found'}, status=404)
+    
+    if attempt_row['is_submitted']:
         return JsonResponse({'error': 'Exam already submitted'}, status=400)
     
-    data = json.loads(request.body)
-    violation_type = data.get('violation_type', 'other')
-    description = data.get('description', '')
-    should_auto_submit = data.get('auto_submit', False)
+    try:
+        data = json.loads(request.body)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
     
-    # Record the violation
-    violation, created = ExamViolation.objects.update_or_create(
-        attempt=attempt,
-        violation_type=violation_type,
-        defaults={
-            'description': description,
-            'auto_submitted': should_auto_submit,
-            'violation_count': (ExamViolation.objects.get(attempt=attempt, violation_type=violation_type).violation_count + 1) if not created else 1,
-        }
-    )
+    events = data.get('events') if isinstance(data, dict) else None
+    if events is None:
+        events = [data] if isinstance(data, dict) else []
+    events = [e for e in events if isinstance(e, dict)][:MAX_VIOLATION_EVENTS]
+    if not events:
+        return JsonResponse({'error': 'No violation events'}, status=400)
     
-    # Update attempt violation tracking
-    attempt.has_violations = True
-    attempt.violation_count = ExamViolation.objects.filter(attempt=attempt).aggregate(total=Count('id'))['total'] or 0
-    attempt.save()
+    grouped = _record_violation_events(attempt_row['id'], events)
+    should_auto_submit = any(entry['auto_submit'] for entry in grouped.values())
     
     # If auto-submit is requested, finalize the exam
-    if should_auto_submit and not attempt.is_submitted:
-        with transaction.atomic():
-            _finalize_and_grade_attempt(attempt)
+    if should_auto_submit:
+        attempt = ExamAttempt.objects.select_related('course_access__course__exam').get(pk=attempt_row['id'])
+        if not attempt.is_submitted:
+            with transaction.atomic():
+                _finalize_and_grade_attempt(attempt)
         return JsonResponse({
             'success': True,
             'auto_submitted': True,
+            'recorded': len(events),
             'message': 'Your exam has been auto-submitted due to a security violation.'
         })
     
     return JsonResponse({
         'success': True,
         'violation_recorded': True,
-        'violation_type': violation_type,
+        'recorded': len(events),
+        'violation_types': list(grouped),
     })
 
 
@@ -0,0 +1,80 @@
+"""
+Cached context for the home page.
+
+The home page is the highest-traffic URL and only shows admin-managed
+content, so everything it needs is loaded in a fixed number of queries,
+stored as one object in the shared cache (`core.cache`) under the `home` tag,
+and served from there until an admin edits one of `HOME_MODELS`. (With the
+default database cache, reading it back still costs a few cache-table
+queries; see CACHES in settings.) Signal hooks
+in `core.signals` invalidate the tag on every save or delete of those models.
+"""
+
+from django.db.models import Prefetch
+
+from .cache import namespace
+from .singletons import get_singletons
+
+HOME_TAG = 'home'
+# The home context holds model instances; bump the version whenever the shape
+# of the cached dict or of those models changes.
+home_context_cache = namespace('home-context', version=1, timeout=60 * 60 * 24)
+
+
+def home_models():
+    """Models whose rows are shown on the home page."""
+    from .models import (
+        CertificateSection, Content, Course, CourseBrowser, CourseCategory, FAQQuestion,
+        FeatureCard, HeroBanner, HomeAboutSection, LearningBanner, Section, Testimonial,
+        TestimonialStrip, WhyChoose, WhyChooseItem,
+    )
+    return (
+        HeroBanner, Section, Content, FeatureCard, HomeAboutSection, CourseCategory,
+        CourseBrowser, Course, LearningBanner, WhyChoose, WhyChooseItem, CertificateSection,
+        Testimonial, TestimonialStrip, FAQQuestion,
+    )
+
+
+def _build_home_context():
+    from .models import (
+        Content, CourseBrowser, CourseCategory, FAQQuestion, FeatureCard, Section, Testimonial,
+        TestimonialStrip,
+    )
+    singletons = get_singletons(
+        'hero_banner', 'home_about', 'learning_banner', 'why_choose', 'certificate_section',
+    )
+    categories = list(
+        CourseCategory.objects.filter(is_active=True).order_by('order').prefetch_related(
+            Prefetch('courses',
+                     queryset=CourseBrowser.objects.filter(is_active=True).select_related('course').order_by('order'),
+                     to_attr='active_courses'),
+        )
+    )
+    course_browsers = sorted(
+        (card for category in categories for card in category.active_courses),
+        key=lambda card: (card.order, card.pk),
+    )
+    return {
+        'hero_banner': singletons['hero_banner'],
+        'sections': list(
+            Section.objects.filter(is_active=True).order_by('order').prefetch_related(
+                Prefetch('contents', queryset=Content.objects.filter(is_active=True).order_by('order'),
+                         to_attr='active_contents'),
+            )
+        ),
+        'feature_cards': list(FeatureCard.objects.filter(is_active=True).order_by('order')),
+        'home_about': singletons['home_about'],
+        'course_categories': categories,
+        'course_browsers': course_browsers,
+        'learning_banner': singletons['learning_banner'],
+        'why_choose': singletons['why_choose'],
+        'certificate_section': singletons['certificate_section'],
+        'testimonials': list(Testimonial.objects.filter(is_active=True).order_by('order')),
+        'testimonial_strips': list(TestimonialStrip.objects.filter(is_active=True).order_by('order')),
+        'faqs': list(FAQQuestion.objects.filter(is_active=True).order_by('order')),
+    }
+
+
+def get_home_context():
+    """The home page context, served from the cache after the first build."""
+    return home_context_cache.get_or_set('context', compute=_build_home_context, tags=[HOME_TAG])
@@ -0,0 +1,232 @@
+"""
+Responsive variants of uploaded images.
+
+Templates used to serve every upload at its original size, so a 24px video
+thumbnail could cost a full-size photo. After an image field registered with
+`generate_on_save` is saved, the upload is resized in a process pool (Pillow
+work is CPU bound, and the admin save does not wait for it) into the width
+buckets in `WIDTHS` that are smaller than the original, plus one at its own
+width (capped at the largest bucket). Each width is stored as WebP and as a
+JPEG fallback (PNG when the image has transparency):
+
+    media/variants/3f/3fa4.../640.webp, 640.jpg, ...
+    media/variants/names/9c/9c1e....json    upload name -> manifest
+
+Variants are keyed by a hash of the image content, so re-uploading the same
+picture reuses them. The `{% picture %}` and `{% variant_url %}` tags in
+`core.templatetags.responsive_images` read the manifest and fall back to the
+original until the variants exist; once they do, the pages registered for
+the field are invalidated so cached renders pick them up. The
+`generate_image_variants` command covers existing uploads.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from .cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (96, 160, 320, 640, 960, 1280, 1920)
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+VARIANTS_DIR = 'variants'
+
+# Fields registered with generate_on_save: (model, field name, tags_for)
+registry = []
+
+_pool = None
+_pool_lock = threading.Lock()
+# Upload name -> manifest, for manifests already found on disk
+_manifests = {}
+_MANIFEST_MEMO_SIZE = 2048
+
+
+def variants_root():
+    """Directory holding the variants and their manifests."""
+    return os.path.join(settings.MEDIA_ROOT, VARIANTS_DIR)
+
+
+def _index_path(root, name):
+    digest = hashlib.sha1(name.encode('utf-8')).hexdigest()
+    return os.path.join(root, 'names', digest[:2], f'{digest}.json')
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    with open(temporary, 'wb') as handle:
+        handle.write(data)
+    os.replace(temporary, path)
+
+
+def build_variants(path, name, root, force=False):
+    """Write the variants of the image at `path` (uploaded as `name`) and its manifest; returns the manifest.
+
+    Runs in the process pool, so it only touches the filesystem.
+    """
+    from PIL import Image, ImageOps
+
+    with open(path, 'rb') as handle:
+        data = handle.read()
+    content_hash = hashlib.sha256(data).hexdigest()[:24]
+    directory = os.path.join(VARIANTS_DIR, content_hash[:2], content_hash)
+
+    with Image.open(io.BytesIO(data)) as image:
+        if getattr(image, 'is_animated', False):
+            widths, fallback = [], None
+            width, height = image.size
+        else:
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+            fallback = 'png' if has_alpha else 'jpg'
+            width, height = image.size
+            widths = [w for w in WIDTHS if w < width] + [min(width, WIDTHS[-1])]
+            for target in widths:
+                outputs = {ext: os.path.join(root, content_hash[:2], content_hash, f'{target}.{ext}')
+                           for ext in ('webp', fallback)}
+                if not force and all(os.path.exists(output) for output in outputs.values()):
+                    continue
+                resized = image if target == width else image.resize(
+                    (target, max(1, round(height * target / width))), Image.LANCZOS
+                )
+                for ext, output in outputs.items():
+                    encoded = io.BytesIO()
+                    if ext == 'webp':
+                        resized.save(encoded, 'WEBP', quality=WEBP_QUALITY, method=4)
+                    elif ext == 'png':
+                        resized.save(encoded, 'PNG', optimize=True)
+                    else:
+                        resized.save(encoded, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+                    _write_atomic(output, encoded.getvalue())
+
+    manifest = {
+        'source': name,
+        'hash': content_hash,
+        'dir': directory.replace(os.sep, '/'),
+        'width': width,
+        'height': height,
+        'widths': widths,
+        'fallback': fallback,
+    }
+    _write_atomic(_index_path(root, name), json.dumps(manifest).encode('utf-8'))
+    return manifest
+
+
+def get_manifest(field_file):
+    """Manifest of an uploaded image's variants, or None while there are none."""
+    if not field_file:
+        return None
+    name = field_file.name
+    manifest = _manifests.get(name)
+    if manifest is not None:
+        return manifest
+    try:
+        with open(_index_path(variants_root(), name), 'rb') as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    if len(_manifests) >= _MANIFEST_MEMO_SIZE:
+        _manifests.clear()
+    _manifests[name] = manifest
+    return manifest
+
+
+def variant_url(manifest, width, ext):
+    return f"{settings.MEDIA_URL}{manifest['dir']}/{width}.{ext}"
+
+
+def srcset(manifest, ext):
+    return ', '.join(f'{variant_url(manifest, width, ext)} {width}w' for width in manifest['widths'])
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded server process is not safe
+            _pool = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def _reset_pool(broken):
+    """Drop a pool whose worker died so the next upload starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+def source_path(field_file):
+    """Local path of an upload, or None for remote storage or a missing file."""
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        return None
+    return path if os.path.exists(path) else None
+
+
+def schedule(field_file, tags=()):
+    """Generate an upload's variants in the process pool, then invalidate `tags`."""
+    if not field_file or get_manifest(field_file) is not None:
+        return None
+    path = source_path(field_file)
+    if path is None:
+        return None
+    name, tags = field_file.name, list(tags)
+
+    def done(future):
+        try:
+            future.result()
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                _reset_pool(pool)
+            logger.exception(f'Generating image variants of {name} failed')
+            return
+        if tags:
+            invalidate_tags(*tags)
+
+    pool = _get_pool()
+    try:
+        future = pool.submit(build_variants, path, name, variants_root())
+    except BrokenProcessPool:
+        _reset_pool(pool)
+        pool = _get_pool()
+        future = pool.submit(build_variants, path, name, variants_root())
+    future.add_done_callback(done)
+    return future
+
+
+def generate_on_save(model, field_name, tags_for=lambda instance: []):
+    """Generate variants of `model.field_name` uploads after each save.
+
+    `tags_for(instance)` names the cache tags of pages showing the image.
+    """
+    registry.append((model, field_name, tags_for))
+
+    def handler(sender, instance, raw=False, **kwargs):
+        field_file = getattr(instance, field_name)
+        if raw or not field_file or get_manifest(field_file) is not None:
+            return
+        transaction.on_commit(lambda: schedule(field_file, tags_for(instance)))
+
+    post_save.connect(
+        handler, sender=model, weak=False,
+        dispatch_uid=f'image_variants:{model._meta.label}.{field_name}',
+    )
@@ -0,0 +1,103 @@
+"""
+Benchmark exam grading (`_finalize_and_grade_attempt`).
+
+Builds throw-away exams of different sizes inside a transaction that is
+rolled back at the end, grades a fully answered attempt for each and reports
+wall time and query count. `--legacy` also runs the previous per-answer
+`save()` loop for comparison.
+
+Usage:
+    python manage.py benchmark_grading
+    python manage.py benchmark_grading --sizes 50 150 500 --repeat 5 --legacy
+"""
+
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.exam_views import _finalize_and_grade_attempt
+from core.models import (
+    Course, CourseAccess, CourseExam, ExamAnswer, ExamAttempt, ExamQuestion,
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Measure per-attempt grading time and query count for different exam sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[50, 150, 500],
+                            help='Question counts to benchmark (default: 50 150 500)')
+        parser.add_argument('--repeat', type=int, default=3,
+                            help='Gradings per size; the median is reported (default: 3)')
+        parser.add_argument('--legacy', action='store_true',
+                            help='Also time the old per-answer save() grading loop')
+
+    def handle(self, *args, **options):
+        rows = []
+        try:
+            with transaction.atomic():
+                for size in options['sizes']:
+                    attempt = self._build_attempt(size)
+                    rows.append(('set-based', size) + self._measure(
+                        lambda: _finalize_and_grade_attempt(attempt), attempt, options['repeat']))
+                    if options['legacy']:
+                        rows.append(('legacy', size) + self._measure(
+                            lambda: self._legacy_grade(attempt), attempt, options['repeat']))
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f'{"mode":<10} {"questions":>9} {"median ms":>10} {"queries":>8}')
+        for mode, size, ms, queries in rows:
+            self.stdout.write(f'{mode:<10} {size:>9} {ms:>10.2f} {queries:>8}')
+        self.stdout.write(self.style.SUCCESS('Benchmark finished (all data rolled back).'))
+
+    def _measure(self, grade, attempt, repeat):
+        timings = []
+        queries = 0
+        for _ in range(repeat):
+            ExamAttempt.objects.filter(pk=attempt.pk).update(is_submitted=False, correct_answers=0)
+            ExamAnswer.objects.filter(attempt=attempt).update(is_correct=False)
+            attempt.refresh_from_db()
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                grade()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(ctx.captured_queries)
+        return statistics.median(timings), queries
+
+    def _legacy_grade(self, attempt):
+        """The grading loop as it was before set-based grading (answers only)."""
+        for answer in ExamAnswer.objects.filter(attempt=attempt).select_related('question'):
+            answer.is_correct = answer.selected_answer == answer.question.correct_answer
+            answer.save()
+
+    def _build_attempt(self, size):
+        User = get_user_model()
+        user = User.objects.create_user(username=f'bench-grading-{size}@example.com')
+        course = Course.objects.create(name=f'Grading benchmark {size}', slug=f'bench-grading-{size}')
+        exam = CourseExam.objects.create(course=course)
+        ExamQuestion.objects.bulk_create([
+            ExamQuestion(
+                exam=exam, order=i, question_text=f'Question {i}',
+                option_a='A', option_b='B', option_c='C', option_d='D',
+                correct_answer=random.choice('ABCD'),
+            )
+            for i in range(size)
+        ])
+        access = CourseAccess.objects.create(user=user, course=course)
+        attempt = ExamAttempt.objects.create(course_access=access, total_questions=size)
+        ExamAnswer.objects.bulk_create([
+            ExamAnswer(attempt=attempt, question=q, selected_answer=random.choice('ABCD'))
+            for q in exam.questions.all()
+        ])
+        return attempt
@@ -0,0 +1,69 @@
+"""
+Confirm the capture status of paid orders.
+
+Payments confirmed by the checkout callback (or an authorized webhook) are
+left with `captured_at` unset until Razorpay reports the capture, either by
+a `payment.captured` webhook or through this sweeper. It checks those rows
+once they are older than --min-age seconds, and rows it cannot settle
+(Razorpay down, payment still only authorized) are retried on the next run.
+render.yaml schedules it as a cron service.
+
+Usage:
+    python manage.py confirm_payment_captures
+    python manage.py confirm_payment_captures --min-age 120 --limit 500
+    python manage.py confirm_payment_captures --loop --interval 60
+"""
+
+from datetime import timedelta
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import CoursePayment
+from core.payments import check_capture
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Check Razorpay capture status of confirmed payments that are not yet captured'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=60,
+                            help='Only check payments last updated at least this many seconds ago (default: 60)')
+        parser.add_argument('--limit', type=int, default=200,
+                            help='Payments checked per sweep (default: 200)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=60,
+                            help='Seconds between sweeps with --loop (default: 60)')
+
+    def handle(self, *args, **options):
+        while True:
+            self._sweep(options['min_age'], options['limit'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _sweep(self, min_age, limit):
+        started = time.perf_counter()
+        cutoff = timezone.now() - timedelta(seconds=min_age)
+        pending = list(
+            CoursePayment.objects.filter(status='successful', captured_at__isnull=True, updated_at__lte=cutoff)
+            .exclude(payment_id=None).order_by('updated_at').values_list('pk', flat=True)[:limit]
+        )
+        outcomes = {}
+        for payment_pk in pending:
+            try:
+                status = check_capture(payment_pk)
+            except Exception as e:
+                status = 'error'
+                logger.error(f'Capture check failed for payment {payment_pk}: {str(e)}', exc_info=True)
+            outcomes[status] = outcomes.get(status, 0) + 1
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {status}' for status, count in sorted(outcomes.items(), key=str)) or 'nothing to do'
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(pending)} payments in {elapsed:.2f}s: {summary}'))
+        return outcomes
@@ -0,0 +1,55 @@
+"""
+Read durations and poster frames of uploaded lecture videos.
+
+New uploads are handled by a background thread pool right after they are
+saved; this command backfills videos uploaded before that existed, or with
+--all re-reads every video (e.g. after installing ffmpeg for thumbnails).
+Thumbnails admins uploaded are kept.
+
+Usage:
+    python manage.py extract_video_metadata
+    python manage.py extract_video_metadata --all --limit 500
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core import video_metadata
+from core.models import CourseScheduleItem
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Read duration and poster frame of lecture videos that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Re-read every video, not only those missing a duration or thumbnail')
+        parser.add_argument('--limit', type=int, default=1000,
+                            help='Maximum number of items to process (default: 1000)')
+
+    def handle(self, *args, **options):
+        items = CourseScheduleItem.objects.exclude(video_file='').exclude(video_file=None)
+        if not options['all']:
+            items = items.filter(Q(duration_seconds=None) | Q(thumbnail='') | Q(thumbnail=None))
+        item_pks = list(items.order_by('pk').values_list('pk', flat=True)[:options['limit']])
+
+        started = time.perf_counter()
+        updated = failed = 0
+        for item_pk in item_pks:
+            try:
+                fields = video_metadata.extract_item(item_pk)
+            except Exception as e:
+                failed += 1
+                logger.error(f'Video metadata extraction failed for item {item_pk}: {str(e)}', exc_info=True)
+                continue
+            updated += bool(fields)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(item_pks)} items in {elapsed:.2f}s: {updated} updated, {failed} failed'
+        ))
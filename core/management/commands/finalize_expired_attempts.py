@@ -0,0 +1,81 @@
+"""
+Grade every exam attempt whose deadline has passed without a submission.
+
+Expired attempts used to be graded only when their owner's browser polled the
+clock, so abandoned attempts stayed open forever. This sweeper finds them
+with one indexed query on (is_submitted, expires_at), locks them with
+SELECT ... FOR UPDATE SKIP LOCKED and grades them in batches through the same
+helper the exam views use, so several sweepers (or a sweeper and a live
+request) can run at once without double-grading. render.yaml runs it as a
+cron service every minute; the Procfile's worker uses --loop.
+
+Usage:
+    python manage.py finalize_expired_attempts
+    python manage.py finalize_expired_attempts --batch-size 200
+    python manage.py finalize_expired_attempts --loop --interval 30
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.exam_views import _finalize_and_grade_attempt
+from core.models import ExamAttempt
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Finalize and grade exam attempts whose deadline has passed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Attempts locked and graded per transaction (default: 100)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=30,
+                            help='Seconds between sweeps with --loop (default: 30)')
+
+    def handle(self, *args, **options):
+        while True:
+            self._sweep(options['batch_size'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _sweep(self, batch_size):
+        started = time.perf_counter()
+        cutoff = timezone.now()
+        graded = 0
+        failed = set()
+
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    ExamAttempt.objects.select_for_update(skip_locked=True, of=('self',))
+                    .filter(is_submitted=False, expires_at__lte=cutoff)
+                    .exclude(pk__in=failed)
+                    .select_related('course_access__course__exam')
+                    .order_by('expires_at')[:batch_size]
+                )
+                if not batch:
+                    break
+                for attempt in batch:
+                    try:
+                        with transaction.atomic():
+                            _finalize_and_grade_attempt(attempt)
+                        graded += 1
+                    except Exception as e:
+                        failed.add(attempt.pk)
+                        logger.error(f'Failed to finalize expired attempt {attempt.pk}: {str(e)}', exc_info=True)
+
+        elapsed = time.perf_counter() - started
+        rate = graded / elapsed if elapsed > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Finalized {graded} expired attempts in {elapsed:.2f}s ({rate:.1f} attempts/s)'
+            + (f', {len(failed)} failed' if failed else '')
+        ))
+        return graded
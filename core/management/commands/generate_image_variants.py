@@ -0,0 +1,58 @@
+"""
+Generate responsive variants for images uploaded before they existed.
+
+New uploads get their variants in a process pool right after they are
+saved; this command walks every registered image field (see
+`core.image_variants.generate_on_save`) and builds whatever is missing, or
+with --force rebuilds everything (e.g. after changing WIDTHS or quality).
+
+Usage:
+    python manage.py generate_image_variants
+    python manage.py generate_image_variants --force
+"""
+
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import image_variants
+from core.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Build WebP/JPEG width variants of uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Rebuild variants that already exist')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        built = skipped = failed = 0
+        root = image_variants.variants_root()
+        tags = set()
+        for model, field_name, tags_for in image_variants.registry:
+            rows = model.objects.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            for instance in rows.iterator():
+                field_file = getattr(instance, field_name)
+                path = image_variants.source_path(field_file)
+                if path is None or (not options['force'] and image_variants.get_manifest(field_file)):
+                    skipped += 1
+                    continue
+                try:
+                    image_variants.build_variants(path, field_file.name, root, force=options['force'])
+                    tags.update(tags_for(instance))
+                    built += 1
+                except Exception as e:
+                    failed += 1
+                    logger.error(f'Image variants failed for {field_file.name}: {str(e)}', exc_info=True)
+        if tags:
+            invalidate_tags(*tags)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Built variants for {built} images in {elapsed:.2f}s ({skipped} skipped, {failed} failed)'
+        ))
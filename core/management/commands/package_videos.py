@@ -0,0 +1,86 @@
+"""
+Package uploaded lecture videos as HLS.
+
+Saving an upload only marks its item `pending`; this command does the
+encoding, outside the web workers (render.yaml and the Procfile run it with
+--loop). Each sweep packages pending items, videos uploaded before
+packaging existed, items left processing by a worker that died (once
+untouched for --stale-minutes), and with --retry failed or skipped items
+(e.g. after installing ffmpeg).
+
+Usage:
+    python manage.py package_videos
+    python manage.py package_videos --item 42
+    python manage.py package_videos --retry --limit 20
+    python manage.py package_videos --loop --interval 60
+"""
+
+from datetime import timedelta
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import video_packaging
+from core.models import CourseScheduleItem
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Package lecture videos that have no HLS renditions yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--item', type=int, action='append', default=[],
+                            help='Package this item id regardless of its status (repeatable)')
+        parser.add_argument('--retry', action='store_true',
+                            help='Also package items that failed or were skipped')
+        parser.add_argument('--stale-minutes', type=int, default=30,
+                            help='Treat processing items untouched this long as abandoned (default: 30)')
+        parser.add_argument('--limit', type=int, default=50,
+                            help='Items packaged per sweep (default: 50)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, sweeping every --interval seconds')
+        parser.add_argument('--interval', type=int, default=300,
+                            help='Seconds between sweeps with --loop (default: 300)')
+
+    def handle(self, *args, **options):
+        if options['item']:
+            self._package(options['item'])
+            return
+        while True:
+            self._package(self._due(options['retry'], options['stale_minutes'], options['limit']))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _due(self, retry, stale_minutes, limit):
+        cutoff = timezone.now() - timedelta(minutes=stale_minutes)
+        abandoned = Q(hls_status=video_packaging.PROCESSING, updated_at__lte=cutoff)
+        due = ~Q(hls_source=F('video_file')) | Q(hls_status=video_packaging.PENDING) | abandoned
+        if retry:
+            due |= Q(hls_status__in=[video_packaging.FAILED, video_packaging.SKIPPED])
+        return list(
+            CourseScheduleItem.objects.exclude(video_file='').exclude(video_file=None)
+            .filter(due).order_by('updated_at').values_list('pk', flat=True)[:limit]
+        )
+
+    def _package(self, item_pks):
+        started = time.perf_counter()
+        outcomes = {}
+        # Record which upload this run packages, as saving the item would
+        video_packaging.mark_pending(item_pks)
+        for item_pk in item_pks:
+            try:
+                status = video_packaging.package_item(item_pk)
+            except Exception as e:
+                status = 'error'
+                logger.error(f'HLS packaging failed for item {item_pk}: {str(e)}', exc_info=True)
+            outcomes[status] = outcomes.get(status, 0) + 1
+
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(f'{count} {status}' for status, count in sorted(outcomes.items(), key=str)) or 'nothing to do'
+        self.stdout.write(self.style.SUCCESS(f'Packaged {len(item_pks)} items in {elapsed:.2f}s: {summary}'))
+        return outcomes
@@ -0,0 +1,36 @@
+"""
+Recompute CourseProgress.watched_count from VideoPlay rows.
+
+`watched_count` is maintained incrementally when a user plays an item for
+the first time. This command re-derives it with one set-based UPDATE per run,
+for existing rows or after bulk edits made outside the admin (which skip the
+schedule-item signals), and drops the cached active-item counts.
+
+Usage:
+    python manage.py reconcile_course_progress
+    python manage.py reconcile_course_progress --course 3
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.models import Course
+from core.progress_cache import invalidate_active_item_count, reconcile_watched_counts
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-user watched video counters from VideoPlay rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', type=int, default=None,
+                            help='Only reconcile progress for this course ID')
+
+    def handle(self, *args, **options):
+        course_id = options['course']
+        updated = reconcile_watched_counts(course_id)
+
+        course_ids = [course_id] if course_id is not None else Course.objects.values_list('id', flat=True)
+        for cid in course_ids:
+            invalidate_active_item_count(cid)
+
+        scope = f'course {course_id}' if course_id is not None else 'all courses'
+        self.stdout.write(self.style.SUCCESS(f'Reconciled {updated} progress rows for {scope}.'))
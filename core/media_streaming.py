@@ -0,0 +1,232 @@
+"""
+HTTP Range support for serving large media files.
+
+Lecture videos are served through a view instead of MEDIA_URL so access can
+be checked per user, and players seek by requesting byte ranges. Only the
+requested range is ever read:
+
+* the file is opened, positioned at the start of the range and wrapped in
+  `RangeFile`, which stops reading at the end of the range;
+* under WSGI the result goes out as a `FileResponse`, so a server that
+  provides `wsgi.file_wrapper` (gunicorn sync workers) sends the range with
+  sendfile() straight from the page cache, and others stream it in
+  `BLOCK_SIZE` chunks;
+* under ASGI (uvicorn workers, as deployed) Django would drain a sync
+  iterator into memory before sending anything, so `RangeFile` is iterated
+  asynchronously instead: each `BLOCK_SIZE` read runs in a thread and is
+  sent before the next one starts.
+
+Single ranges (`bytes=a-b`, `bytes=a-`, `bytes=-n`) get a 206, unsatisfiable
+ones a 416, and multi-range requests or a stale `If-Range` validator fall
+back to the full file, as RFC 9110 allows.
+
+Protected downloads (videos, brochures, certificates) go through
+`protected_file_response`: the view only checks access, and with
+PROTECTED_MEDIA_BACKEND set the bytes are sent by the front proxy so a slow
+client never holds a worker:
+
+* `nginx`: an empty response with `X-Accel-Redirect` pointing into an
+  internal location that maps PROTECTED_MEDIA_ACCEL_PREFIX onto MEDIA_ROOT::
+
+      location /protected-media/ {
+          internal;
+          alias /srv/app/media/;
+      }
+
+* `sendfile`: an `X-Sendfile` header with the absolute path (Apache
+  mod_xsendfile, lighttpd);
+* `python` (default, local runs): `ranged_file_response` above. Outside
+  DEBUG this fails the core.E002 deploy check unless it is silenced.
+
+The proxy handles Range and conditional requests itself in the first two
+cases.
+"""
+
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.shortcuts import redirect
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+# Read size when the server cannot use sendfile()
+BLOCK_SIZE = 256 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangeFile:
+    """File-like view of `length` bytes of `file`, starting at its current position.
+
+    Exposes `fileno()` so WSGI file wrappers can sendfile() the range; the
+    server limits the transfer to the response's Content-Length. Async
+    iteration yields `BLOCK_SIZE` chunks read in a worker thread.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def __aiter__(self):
+        return self._read_blocks()
+
+    async def _read_blocks(self):
+        read = sync_to_async(self.read, thread_sensitive=False)
+        while True:
+            data = await read(BLOCK_SIZE)
+            if not data:
+                return
+            yield data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single-range header, or None to send everything.
+
+    Raises RangeNotSatisfiable when the range lies outside the file.
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip().replace(' ', ''))
+    if not match:
+        # Multiple ranges or another unit: serving the full file is allowed
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+def file_etag(stat):
+    """Strong ETag from size and modification time."""
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def _if_range_matches(request, etag, last_modified):
+    validator = request.headers.get('If-Range')
+    if not validator:
+        return True
+    if validator.startswith('"') or validator.startswith('W/'):
+        return validator == etag
+    since = parse_http_date_safe(validator)
+    return since is not None and int(last_modified) <= since
+
+
+def ranged_file_response(request, path, content_type=None):
+    """Serve the file at `path` honoring Range, If-Range and If-None-Match."""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = file_etag(stat)
+    content_type = content_type or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if request.method == 'GET' and _if_range_matches(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+    start, end = byte_range or (0, size - 1)
+    length = max(0, end - start + 1)
+    handle = open(path, 'rb')
+    if start:
+        handle.seek(start)
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(RangeFile(handle, length), content_type=content_type)
+    else:
+        response = FileResponse(RangeFile(handle, length), content_type=content_type)
+        response.block_size = BLOCK_SIZE
+    if byte_range is not None:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return response
+
+
+def _accel_redirect_uri(path):
+    """Internal nginx URI for `path`, or None when it lies outside MEDIA_ROOT."""
+    relative = os.path.relpath(path, settings.MEDIA_ROOT)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return None
+    prefix = settings.PROTECTED_MEDIA_ACCEL_PREFIX.rstrip('/') + '/'
+    return prefix + quote(relative.replace(os.sep, '/'))
+
+
+def protected_file_response(request, field_file, filename=None, as_attachment=False, content_type=None):
+    """Send a stored file after the caller has authorized the request.
+
+    Files on remote storage are redirected to their storage URL; local ones
+    go through `protected_path_response`.
+    """
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        return redirect(field_file.url)
+    return protected_path_response(request, path, filename, as_attachment, content_type)
+
+
+def protected_path_response(request, path, filename=None, as_attachment=False, content_type=None):
+    """Send the local file at `path`, handed to the front proxy or streamed per PROTECTED_MEDIA_BACKEND."""
+    if not os.path.isfile(path):
+        raise Http404('File missing')
+    content_type = content_type or mimetypes.guess_type(filename or path)[0] or 'application/octet-stream'
+
+    backend = settings.PROTECTED_MEDIA_BACKEND
+    accel_uri = _accel_redirect_uri(path) if backend == 'nginx' else None
+    if accel_uri:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = accel_uri
+    elif backend == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.abspath(path)
+    else:
+        response = ranged_file_response(request, path, content_type)
+    if as_attachment or filename:
+        response['Content-Disposition'] = content_disposition_header(
+            as_attachment, filename or os.path.basename(path)
+        )
+    return response
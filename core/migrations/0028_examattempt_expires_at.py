@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:15
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+
+def backfill_expires_at(apps, schema_editor):
+    """Populate expires_at for existing attempts from started_at + duration."""
+    ExamAttempt = apps.get_model('core', 'ExamAttempt')
+    batch = []
+    for attempt in ExamAttempt.objects.filter(expires_at__isnull=True).only('id', 'started_at', 'duration_minutes').iterator():
+        attempt.expires_at = attempt.started_at + timedelta(minutes=(attempt.duration_minutes or 150))
+        batch.append(attempt)
+        if len(batch) >= 500:
+            ExamAttempt.objects.bulk_update(batch, ['expires_at'])
+            batch = []
+    if batch:
+        ExamAttempt.objects.bulk_update(batch, ['expires_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_examcertificate_delete_examcertificaterecord_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattempt',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='Absolute deadline (start + duration), set when the attempt is created', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='examattempt',
+            index=models.Index(fields=['is_submitted', 'expires_at'], name='core_examattempt_expiry_idx'),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
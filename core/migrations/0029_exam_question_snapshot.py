@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_examattempt_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseexam',
+            name='randomize_questions',
+            field=models.BooleanField(default=True, help_text='Give each attempt a random sample of the active questions (otherwise the first N by order)'),
+        ),
+        migrations.AddField(
+            model_name='courseexam',
+            name='shuffle_options',
+            field=models.BooleanField(default=False, help_text='Show the A-D options of each question in a random order per attempt'),
+        ),
+        migrations.AddField(
+            model_name='examattempt',
+            name='option_order',
+            field=models.JSONField(blank=True, default=dict, help_text='Per-question display order of options, e.g. {"12": "CADB"}'),
+        ),
+        migrations.AddField(
+            model_name='examattempt',
+            name='question_ids',
+            field=models.JSONField(blank=True, default=list, help_text='Ordered IDs of the questions assigned to this attempt'),
+        ),
+        migrations.AddField(
+            model_name='examattempt',
+            name='question_seed',
+            field=models.BigIntegerField(blank=True, help_text='Random seed used to pick the question snapshot', null=True),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_watched_count(apps, schema_editor):
+    """Count each user's plays of active items of the course in one UPDATE."""
+    CourseAccess = apps.get_model('core', 'CourseAccess')
+    CourseProgress = apps.get_model('core', 'CourseProgress')
+    VideoPlay = apps.get_model('core', 'VideoPlay')
+    plays = (
+        VideoPlay.objects.filter(
+            user_id=OuterRef('user_id'),
+            course_item__day__course_id=OuterRef('course_id'),
+            course_item__is_active=True,
+        )
+        .order_by()
+        .values('user_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    per_access = (
+        CourseAccess.objects.filter(pk=OuterRef('course_access_id'))
+        .annotate(total=Coalesce(Subquery(plays), 0))
+        .values('total')
+    )
+    CourseProgress.objects.update(watched_count=Coalesce(Subquery(per_access), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_exam_question_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseprogress',
+            name='watched_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of active course videos played at least once'),
+        ),
+        migrations.RunPython(backfill_watched_count, migrations.RunPython.noop),
+    ]
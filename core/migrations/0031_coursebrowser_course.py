@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_cards_by_name(apps, schema_editor):
+    """Link existing browser cards to the course with the same name."""
+    Course = apps.get_model('core', 'Course')
+    CourseBrowser = apps.get_model('core', 'CourseBrowser')
+    courses = {name.strip().lower(): pk for pk, name in Course.objects.values_list('pk', 'name')}
+    for card in CourseBrowser.objects.filter(course__isnull=True):
+        course_id = courses.get(card.name.strip().lower())
+        if course_id:
+            CourseBrowser.objects.filter(pk=card.pk).update(course_id=course_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_courseprogress_watched_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursebrowser',
+            name='course',
+            field=models.ForeignKey(blank=True, help_text='Course page this card links to', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='browser_cards', to='core.course'),
+        ),
+        migrations.RunPython(link_cards_by_name, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:34
+
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def dedupe_order_ids(apps, schema_editor):
+    """Keep one row per order_id before the unique index is created.
+
+    The row that is referenced by a course access (or else the newest one)
+    keeps the order_id; the others are renamed rather than deleted so no
+    payment history is lost.
+    """
+    CoursePayment = apps.get_model('core', 'CoursePayment')
+    duplicated = (
+        CoursePayment.objects.values('order_id').annotate(rows=Count('pk')).filter(rows__gt=1)
+        .values_list('order_id', flat=True)
+    )
+    for order_id in list(duplicated):
+        rows = list(
+            CoursePayment.objects.filter(order_id=order_id)
+            .annotate(accesses=Count('courseaccess')).order_by('-accesses', '-created_at', '-pk')
+        )
+        for row in rows[1:]:
+            CoursePayment.objects.filter(pk=row.pk).update(order_id=f'{order_id[:80]}-dup{row.pk}')
+
+
+def mark_captured(apps, schema_editor):
+    """Successful payments were only recorded after Razorpay reported them captured."""
+    CoursePayment = apps.get_model('core', 'CoursePayment')
+    CoursePayment.objects.filter(status='successful', captured_at__isnull=True).update(
+        captured_at=F('updated_at'), confirmed_via='callback',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_coursebrowser_course'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_order_ids, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='coursepayment',
+            name='captured_at',
+            field=models.DateTimeField(blank=True, help_text='When Razorpay reported the payment as captured', null=True),
+        ),
+        migrations.AddField(
+            model_name='coursepayment',
+            name='confirmed_via',
+            field=models.CharField(blank=True, default='', help_text='What confirmed the payment first: callback or webhook', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='coursepayment',
+            name='order_id',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.RunPython(mark_captured, migrations.RunPython.noop),
+    ]
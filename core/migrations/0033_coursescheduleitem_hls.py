@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_coursepayment_unique_order_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursescheduleitem',
+            name='hls_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='coursescheduleitem',
+            name='hls_manifest',
+            field=models.CharField(blank=True, default='', help_text='Storage name of the master playlist', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='coursescheduleitem',
+            name='hls_progress',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Packaging progress in percent'),
+        ),
+        migrations.AddField(
+            model_name='coursescheduleitem',
+            name='hls_source',
+            field=models.CharField(blank=True, default='', help_text='video_file the HLS status refers to', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='coursescheduleitem',
+            name='hls_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='', max_length=20),
+        ),
+    ]
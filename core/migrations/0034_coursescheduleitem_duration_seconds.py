@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0033_coursescheduleitem_hls'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursescheduleitem',
+            name='duration_seconds',
+            field=models.PositiveIntegerField(blank=True, help_text='Length of video_file, read from the file', null=True),
+        ),
+    ]
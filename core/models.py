@@ -339,6 +339,7 @@ class CourseBrowser(models.Model):
     name = models.CharField(max_length=100)
     image = models.ImageField(upload_to='course_browser_images/')
     category = models.ForeignKey(CourseCategory, on_delete=models.CASCADE, related_name='courses')
+    course = models.ForeignKey('Course', on_delete=models.SET_NULL, null=True, blank=True, related_name='browser_cards', help_text='Course page this card links to')
     is_active = models.BooleanField(default=True)
     order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -486,8 +487,22 @@ class CourseScheduleItem(models.Model):
     video_file = models.FileField(upload_to='course_videos/', blank=True, null=True, help_text='Optional uploaded video file')
     thumbnail = models.ImageField(upload_to='course_video_thumbs/', blank=True, null=True, help_text='Thumbnail image for the video')
     duration = models.CharField(max_length=50, blank=True, null=True, help_text='Video duration (e.g. 12:34)')
+    duration_seconds = models.PositiveIntegerField(blank=True, null=True, help_text='Length of video_file, read from the file')
     order = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
+    # HLS renditions of video_file, produced by the package_videos worker (see core.video_packaging)
+    HLS_STATUSES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('skipped', 'Skipped'),
+        ('failed', 'Failed'),
+    ]
+    hls_status = models.CharField(max_length=20, choices=HLS_STATUSES, blank=True, default='')
+    hls_progress = models.PositiveSmallIntegerField(default=0, help_text='Packaging progress in percent')
+    hls_manifest = models.CharField(max_length=255, blank=True, default='', help_text='Storage name of the master playlist')
+    hls_source = models.CharField(max_length=255, blank=True, default='', help_text='video_file the HLS status refers to')
+    hls_error = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -499,6 +514,36 @@ class CourseScheduleItem(models.Model):
     def __str__(self):
         return f"{self.day.course.name} - {self.day.title} - {self.title}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_progress_state()
+        return instance
+
+    def _remember_progress_state(self):
+        # The fields progress counters depend on, as last read from / written
+        # to the database, so the progress signal can skip unrelated edits.
+        self._loaded_progress_state = (self.is_active, self.day_id)
+
+    @property
+    def loaded_progress_state(self):
+        """(is_active, day_id) as stored before the current save, or None if unknown."""
+        return getattr(self, '_loaded_progress_state', None)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._remember_progress_state()
+
+    @property
+    def duration_label(self):
+        """Duration typed in by an admin, else the one read from the video file."""
+        if self.duration:
+            return self.duration
+        if self.duration_seconds is not None:
+            from .video_metadata import format_duration
+            return format_duration(self.duration_seconds)
+        return ''
+
 
 class VideoPlay(models.Model):
     """Records each time a user plays a specific course video item.
@@ -539,7 +584,9 @@ class CourseInstructor(models.Model):
 class CoursePayment(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE)
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
-    order_id = models.CharField(max_length=100)
+    # One row per Razorpay order; the checkout callback and the webhook both
+    # look payments up (and lock them) by this key
+    order_id = models.CharField(max_length=100, unique=True)
     payment_id = models.CharField(max_length=100, null=True, blank=True)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='INR')
@@ -556,6 +603,10 @@ class CoursePayment(models.Model):
         ('successful', 'Successful'),
         ('failed', 'Failed')
     ], default='pending')
+    confirmed_via = models.CharField(max_length=20, blank=True, default='',
+                                     help_text='What confirmed the payment first: callback or webhook')
+    captured_at = models.DateTimeField(null=True, blank=True,
+                                       help_text='When Razorpay reported the payment as captured')
     notes = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -588,21 +639,16 @@ class CourseAccess(models.Model):
     @property
     def progress(self):
         """Get or create progress record for this access."""
-        from django.utils import timezone
-        prog, created = CourseProgress.objects.get_or_create(
-            course_access=self,
-            defaults={
-                'progress_percentage': 0.0,
-                'completed_lessons': [],
-                'last_accessed': timezone.now()
-            }
-        )
-        return prog
+        from .progress_cache import get_or_create_progress
+        return get_or_create_progress(self)
 
 class CourseProgress(models.Model):
     course_access = models.OneToOneField(CourseAccess, on_delete=models.CASCADE, related_name='_progress')
     progress_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
     completed_lessons = models.JSONField(default=list)
+    # Distinct active items of the course the user has played; maintained
+    # incrementally by core.progress_cache
+    watched_count = models.PositiveIntegerField(default=0, help_text='Number of active course videos played at least once')
     # New flag: user has played every video in the course at least once
     ready_for_exam = models.BooleanField(default=False, help_text='Set when user has played all course videos at least once')
     ready_for_exam_date = models.DateTimeField(null=True, blank=True)
@@ -618,28 +664,27 @@ class CourseProgress(models.Model):
     def __str__(self):
         return f"{self.course_access} - {self.progress_percentage}%"
     
-    def update_progress(self, completed_lesson_id=None):
-        """Update progress when a lesson is completed."""
-        if completed_lesson_id and completed_lesson_id not in self.completed_lessons:
-            self.completed_lessons.append(completed_lesson_id)
-            
-        # Calculate total lessons
-        total_lessons = CourseScheduleItem.objects.filter(
-            day__course=self.course_access.course,
-            is_active=True
-        ).count()
-        
-        if total_lessons > 0:
-            self.progress_percentage = (len(self.completed_lessons) / total_lessons) * 100
-            
-            # Check if course is completed
-            if self.progress_percentage >= 100 and not self.is_completed:
-                from django.utils import timezone
-                self.is_completed = True
-                self.completion_date = timezone.now()
-                self.generate_certificate()
-        
-        self.save()
+    def update_progress(self, total_lessons):
+        """Refresh the percentage and completion state from `watched_count`.
+
+        Runs no queries and does not save: returns the names of the fields it
+        changed so the caller can save them with its own. Once the save
+        commits, a newly completed course still needs `generate_certificate()`.
+        """
+        changed = []
+        watched = min(self.watched_count, total_lessons)
+        percentage = round(watched / total_lessons * 100, 2) if total_lessons > 0 else 0.0
+        if float(self.progress_percentage) != percentage:
+            self.progress_percentage = percentage
+            changed.append('progress_percentage')
+
+        # Check if course is completed
+        if total_lessons > 0 and watched == total_lessons and not self.is_completed:
+            from django.utils import timezone
+            self.is_completed = True
+            self.completion_date = timezone.now()
+            changed += ['is_completed', 'completion_date']
+        return changed
 
     def generate_certificate(self):
         """Generate a certificate upon course completion."""
@@ -650,13 +695,15 @@ class CourseProgress(models.Model):
         import uuid
         certificate_number = f"CERT-{uuid.uuid4().hex[:8].upper()}"
         
-        # Create certificate if it doesn't exist
-        if not hasattr(self, 'certificate'):
-            Certificate.objects.create(
-                course_progress=self,
-                certificate_type='achievement',
-                certificate_number=certificate_number
-            )
+        # Create certificate if it doesn't exist (get_or_create also covers
+        # two final plays completing the course at once)
+        Certificate.objects.get_or_create(
+            course_progress=self,
+            defaults={
+                'certificate_type': 'achievement',
+                'certificate_number': certificate_number,
+            },
+        )
 
 class Certificate(models.Model):
     CERTIFICATE_TYPES = (
@@ -730,6 +777,8 @@ class CourseExam(models.Model):
     max_attempts = models.IntegerField(default=3, help_text='Maximum number of attempts allowed')
     # Number of questions to include in each user's attempt. If 0, include all active questions.
     question_count = models.PositiveIntegerField(default=0, help_text='Number of questions per attempt (0 = use all active questions)')
+    randomize_questions = models.BooleanField(default=True, help_text='Give each attempt a random sample of the active questions (otherwise the first N by order)')
+    shuffle_options = models.BooleanField(default=False, help_text='Show the A-D options of each question in a random order per attempt')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -781,6 +830,11 @@ class ExamAttempt(models.Model):
     has_violations = models.BooleanField(default=False, help_text='True if any violations were detected')
     violation_count = models.IntegerField(default=0, help_text='Total number of violations recorded')
     duration_minutes = models.IntegerField(default=150, help_text='Duration in minutes for this attempt (snapshot at creation time)')
+    expires_at = models.DateTimeField(null=True, blank=True, help_text='Absolute deadline (start + duration), set when the attempt is created')
+    # Question snapshot chosen once at exam start (empty for legacy attempts)
+    question_ids = models.JSONField(default=list, blank=True, help_text='Ordered IDs of the questions assigned to this attempt')
+    option_order = models.JSONField(default=dict, blank=True, help_text='Per-question display order of options, e.g. {"12": "CADB"}')
+    question_seed = models.BigIntegerField(null=True, blank=True, help_text='Random seed used to pick the question snapshot')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -789,10 +843,44 @@ class ExamAttempt(models.Model):
         unique_together = ['course_access', 'attempt_number']
         verbose_name = 'Exam Attempt'
         verbose_name_plural = 'Exam Attempts'
+        indexes = [
+            # Used by the finalize_expired_attempts sweeper
+            models.Index(fields=['is_submitted', 'expires_at'], name='core_examattempt_expiry_idx'),
+        ]
 
     def __str__(self):
         return f'{self.course_access.user.email} - {self.course_access.course.name} - Attempt {self.attempt_number}'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_result_state()
+        return instance
+
+    def _remember_result_state(self):
+        # Submission state as last read from / written to the database, so the
+        # certificate signal can tell a submit transition from a routine save.
+        self._loaded_result_state = (self.is_submitted, self.is_passed)
+
+    @property
+    def loaded_result_state(self):
+        """(is_submitted, is_passed) as stored before the current save."""
+        return getattr(self, '_loaded_result_state', (False, None))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_result_state()
+
+    def save(self, *args, **kwargs):
+        # Snapshot the deadline once so expired attempts can be found with a
+        # single indexed range query instead of per-row date arithmetic.
+        if self.expires_at is None:
+            from datetime import timedelta
+            started = self.started_at or timezone.now()
+            self.expires_at = started + timedelta(minutes=(self.duration_minutes or 150))
+        super().save(*args, **kwargs)
+        self._remember_result_state()
+
 
 class ExamAnswer(models.Model):
     """User's answer to a specific question in an attempt."""
@@ -0,0 +1,72 @@
+"""
+Rendered-page cache for the public course detail page.
+
+Most course_detail traffic is anonymous, and for those visitors the page only
+depends on the course and the content attached to it. Each course slug has a
+content version (a `core.cache` tag); signal hooks in `core.signals` bump it
+whenever a model that feeds the page is saved or deleted (admin inlines
+included), so cached renders are never served stale and old versions simply
+age out.
+
+Two things are cached per (slug, version):
+
+* the complete anonymous response body, served without model queries (and
+  without touching the database at all when CACHE_URL names a network cache);
+* the course content sections, one per audience variant (anonymous, logged in
+  without access, enrolled), which logged-in users get inside a per-request
+  render of the user-specific hero and navigation.
+"""
+
+from .cache import invalidate_tags, namespace, tag_version
+
+# Renders are keyed by content version, so the timeout only bounds how long
+# superseded versions linger.
+PAGE_TIMEOUT = 60 * 60 * 24
+
+# Audience variants of the content sections
+VARIANT_ANONYMOUS = 'anon'
+VARIANT_BUYER = 'buyer'
+VARIANT_ENROLLED = 'enrolled'
+
+# Bump the versions whenever the course page templates change
+pages = namespace('course-page', version=6, timeout=PAGE_TIMEOUT)
+sections = namespace('course-sections', version=6, timeout=PAGE_TIMEOUT)
+
+
+def page_tag(slug):
+    """Cache tag covering everything rendered for a course slug."""
+    return f'course-page:{slug}'
+
+
+def course_page_tags(**course_filter):
+    """Page tags of the courses matching `course_filter` (for signal hooks)."""
+    from .models import Course
+    return [page_tag(slug) for slug in Course.objects.filter(**course_filter).values_list('slug', flat=True)]
+
+
+def get_page_version(slug):
+    """Current content version of a course page."""
+    return tag_version(page_tag(slug))
+
+
+def bump_page_version(*slugs):
+    """Start a new content version for the given course slugs."""
+    invalidate_tags(*(page_tag(slug) for slug in slugs if slug))
+
+
+def get_page(slug, version):
+    """Cached anonymous page body, or None."""
+    return pages.get(slug, version)
+
+
+def set_page(slug, version, content):
+    pages.set(slug, version, value=content)
+
+
+def get_sections(slug, version, variant):
+    """Cached content sections for an audience variant, or None."""
+    return sections.get(slug, version, variant)
+
+
+def set_sections(slug, version, variant, rendered):
+    sections.set(slug, version, variant, value=rendered)
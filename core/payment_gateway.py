@@ -0,0 +1,150 @@
+"""
+Process-wide Razorpay client.
+
+Checkout used to resolve credentials, build a new `razorpay.Client` (and with
+it a new HTTP session) and make a test API call on every order. Instead the
+configuration is resolved once per process, and one client with a pooled
+keep-alive session is built lazily and shared by every request, so creating
+an order is a single outbound call.
+
+Credentials come from the RAZORPAY_* settings, overridden by a local
+`razorpay_config.py` when it provides keys (same precedence as before).
+The optional health check (`RAZORPAY_HEALTH_CHECK=true`) runs in a
+background thread at startup and only records its result; it never blocks
+or fails a request.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import razorpay
+except Exception:
+    razorpay = None
+
+logger = logging.getLogger(__name__)
+
+# Connections kept alive per host in the shared session
+POOL_MAXSIZE = int(os.environ.get('RAZORPAY_POOL_MAXSIZE', '10'))
+
+_lock = threading.Lock()
+_config = None
+_client = None
+_health = {'status': 'unknown', 'checked_at': None, 'detail': None}
+
+
+class GatewayUnavailable(Exception):
+    """Razorpay cannot be used; `reason` says why (for DEBUG responses and logs)."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _resolve_config():
+    config = {
+        'ENABLED': getattr(settings, 'RAZORPAY_ENABLED', False),
+        'KEY_ID': getattr(settings, 'RAZORPAY_KEY_ID', '') or '',
+        'KEY_SECRET': getattr(settings, 'RAZORPAY_KEY_SECRET', '') or '',
+        'CURRENCY': getattr(settings, 'RAZORPAY_CURRENCY', 'INR'),
+        'WEBHOOK_SECRET': getattr(settings, 'RAZORPAY_WEBHOOK_SECRET', '') or '',
+        'BASE_URL': getattr(settings, 'RAZORPAY_BASE_URL', '') or '',
+        'SOURCE': 'settings',
+    }
+    # If a local razorpay_config.py exists with explicit keys, prefer it
+    try:
+        import razorpay_config
+        local = razorpay_config.get_config(test_mode=True)
+    except Exception:
+        local = None
+    if local and local.get('KEY_ID') and local.get('KEY_SECRET'):
+        config.update(
+            ENABLED=local.get('ENABLED', config['ENABLED']),
+            KEY_ID=local['KEY_ID'],
+            KEY_SECRET=local['KEY_SECRET'],
+            CURRENCY=local.get('CURRENCY', config['CURRENCY']),
+            SOURCE='razorpay_config.py',
+        )
+    return config
+
+
+def get_config():
+    """Effective Razorpay configuration, resolved once per process."""
+    global _config
+    if _config is None:
+        with _lock:
+            if _config is None:
+                _config = _resolve_config()
+                logger.info(
+                    'Razorpay config from %s: ENABLED=%s, KEY_ID=%s, CURRENCY=%s',
+                    _config['SOURCE'], _config['ENABLED'], _config['KEY_ID'], _config['CURRENCY'],
+                )
+    return _config
+
+
+def _build_client(config):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    options = {'base_url': config['BASE_URL']} if config['BASE_URL'] else {}
+    return razorpay.Client(session=session, auth=(config['KEY_ID'], config['KEY_SECRET']), **options)
+
+
+def get_client():
+    """The shared Razorpay client; raises GatewayUnavailable when it cannot be used."""
+    global _client
+    if _client is not None:
+        return _client
+    if razorpay is None:
+        raise GatewayUnavailable('razorpay package not installed')
+    config = get_config()
+    if not config['ENABLED']:
+        raise GatewayUnavailable('razorpay is disabled in settings')
+    if not config['KEY_ID'] or not config['KEY_SECRET']:
+        raise GatewayUnavailable('missing credentials')
+    with _lock:
+        if _client is None:
+            _client = _build_client(config)
+    return _client
+
+
+def reset():
+    """Forget the resolved configuration and client (e.g. after changing settings)."""
+    global _config, _client
+    with _lock:
+        _config = None
+        _client = None
+
+
+def health():
+    """Result of the last background health check."""
+    return dict(_health)
+
+
+def _check_health():
+    try:
+        get_client().payment.all({'count': 1})
+        _health.update(status='ok', detail=None)
+    except GatewayUnavailable as exc:
+        _health.update(status='unavailable', detail=exc.reason)
+    except Exception as exc:
+        logger.warning('Razorpay health check failed: %s', exc)
+        _health.update(status='error', detail=str(exc))
+    _health['checked_at'] = time.time()
+
+
+def start_health_check():
+    """Run the optional gateway health check in a daemon thread."""
+    if os.environ.get('RAZORPAY_HEALTH_CHECK', 'false').lower() != 'true':
+        return None
+    thread = threading.Thread(target=_check_health, name='razorpay-health', daemon=True)
+    thread.start()
+    return thread
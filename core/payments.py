@@ -0,0 +1,206 @@
+"""
+Idempotent payment confirmation for Razorpay checkouts.
+
+`create_order` records a pending `CoursePayment` keyed by the (unique)
+Razorpay order id. Access is then granted by whichever of these arrives
+first:
+
+* the checkout callback, after verifying the payment signature locally;
+* the Razorpay webhook (`payment.authorized`, `payment.captured`,
+  `order.paid`), after verifying its HMAC signature locally.
+
+Both go through `confirm_payment`, which locks the payment row with
+SELECT ... FOR UPDATE, so a duplicate or concurrent confirmation sees the
+first one's result and never grants twice. No network call happens on the
+request path: a confirmed payment with `captured_at` unset is its own queue
+entry, and the `confirm_payment_captures` command (a cron service in
+render.yaml) asks Razorpay about those rows. Nothing is held in a web
+worker's memory, so a restart or redeploy loses no checks.
+"""
+
+from decimal import Decimal
+import hashlib
+import hmac
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import payment_gateway
+
+logger = logging.getLogger(__name__)
+
+CALLBACK = 'callback'
+WEBHOOK = 'webhook'
+
+# Webhook events that mean the customer has paid for an order
+PAID_EVENTS = {'payment.authorized', 'payment.captured', 'order.paid'}
+# ...and the ones that also mean the money was captured
+CAPTURED_EVENTS = {'payment.captured', 'order.paid'}
+
+# Checkout form field -> CoursePayment field
+BILLING_FIELDS = {
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'email': 'email',
+    'phone': 'phone',
+    'address': 'address',
+    'city': 'city',
+    'state': 'state',
+    'zip': 'zip_code',
+}
+
+def record_order(user, course, order_id, amount, currency, billing):
+    """Store the pending payment for a freshly created Razorpay order."""
+    from .models import CoursePayment
+    defaults = {
+        'user': user,
+        'course': course,
+        'amount': amount,
+        'currency': currency,
+        **{field: billing.get(key) or '' for key, field in BILLING_FIELDS.items()},
+    }
+    payment, _ = CoursePayment.objects.get_or_create(order_id=order_id, defaults=defaults)
+    return payment
+
+
+class OrderMismatch(Exception):
+    """The order being confirmed was not created for this user and course."""
+
+
+def record_gateway_order(user, order_id, billing):
+    """Record the pending payment of an order created before orders were stored.
+
+    The course and amount come from Razorpay's copy of the order (the notes
+    and amount `create_order` sent), never from the request; raises
+    OrderMismatch when the order was created for another user or an unknown
+    course. Makes one call to Razorpay, so only the legacy path uses it.
+    """
+    from .models import Course
+    order = payment_gateway.get_client().order.fetch(order_id)
+    notes = order.get('notes') or {}
+    if str(notes.get('user_id')) != str(user.pk):
+        raise OrderMismatch(f'order {order_id} was created for another user')
+    course = Course.objects.filter(pk=notes.get('course_id')).first()
+    if course is None:
+        raise OrderMismatch(f'order {order_id} names no known course')
+    amount = Decimal(int(order['amount'])) / 100
+    return record_order(user, course, order_id, amount, order.get('currency') or 'INR', billing)
+
+
+def _grant_access(payment):
+    from .models import CourseAccess
+    access, created = CourseAccess.objects.get_or_create(
+        user_id=payment.user_id, course_id=payment.course_id,
+        defaults={'payment': payment, 'is_active': True},
+    )
+    if not created and (not access.is_active or access.payment_id is None):
+        access.is_active = True
+        access.payment_id = access.payment_id or payment.pk
+        access.save(update_fields=['is_active', 'payment', 'updated_at'])
+    return created
+
+
+def confirm_payment(order_id, payment_id, source, captured=False):
+    """Mark the order's payment successful and grant course access, once.
+
+    Returns `(payment, confirmed)` where `confirmed` is True only for the
+    call that moved the payment to successful; `payment` is None when no
+    payment exists for `order_id`.
+    """
+    from .models import CoursePayment
+    with transaction.atomic():
+        payment = CoursePayment.objects.select_for_update().filter(order_id=order_id).first()
+        if payment is None:
+            return None, False
+        confirmed = payment.status != 'successful'
+        update_fields = []
+        if confirmed:
+            payment.status = 'successful'
+            payment.payment_id = payment_id
+            payment.confirmed_via = source
+            update_fields += ['status', 'payment_id', 'confirmed_via']
+        if captured and payment.captured_at is None:
+            payment.captured_at = timezone.now()
+            update_fields.append('captured_at')
+        if update_fields:
+            payment.save(update_fields=update_fields + ['updated_at'])
+        if confirmed:
+            _grant_access(payment)
+            logger.info(f'Payment for order {order_id} confirmed by {source}')
+    return payment, confirmed
+
+
+def mark_failed(order_id, payment_id, reason=''):
+    """Record a failed payment attempt.
+
+    Pending orders become failed. A confirmed but uncaptured payment whose
+    recorded payment id failed is reverted and the access it granted is
+    deactivated. Captured payments are never touched.
+    """
+    from .models import CourseAccess, CoursePayment
+    with transaction.atomic():
+        payment = CoursePayment.objects.select_for_update().filter(order_id=order_id).first()
+        if payment is None or payment.captured_at is not None:
+            return payment
+        if payment.status == 'pending':
+            payment.status = 'failed'
+        elif payment.status == 'successful' and payment.payment_id == payment_id:
+            payment.status = 'failed'
+            CourseAccess.objects.filter(payment=payment).update(is_active=False, updated_at=timezone.now())
+            logger.warning(f'Payment {payment_id} for order {order_id} failed after confirmation; access revoked')
+        else:
+            return payment
+        payment.notes = '\n'.join(filter(None, [payment.notes, f'{payment_id}: {reason}' if reason else '']))
+        payment.save(update_fields=['status', 'notes', 'updated_at'])
+    return payment
+
+
+def check_capture(payment_pk):
+    """Ask Razorpay whether a confirmed payment was captured and record the answer.
+
+    Returns the Razorpay payment status, or None when there was nothing to check.
+    """
+    from .models import CoursePayment
+    payment = (
+        CoursePayment.objects.filter(pk=payment_pk, status='successful', captured_at__isnull=True)
+        .exclude(payment_id=None).only('order_id', 'payment_id', 'confirmed_via').first()
+    )
+    if payment is None:
+        return None
+    details = payment_gateway.get_client().payment.fetch(payment.payment_id)
+    status = details.get('status')
+    if status == 'captured':
+        confirm_payment(payment.order_id, payment.payment_id, payment.confirmed_via, captured=True)
+    elif status == 'failed':
+        mark_failed(payment.order_id, payment.payment_id, reason=details.get('error_description') or 'failed')
+    return status
+
+
+def verify_webhook_signature(body, signature):
+    """True when `signature` is the HMAC-SHA256 of the raw webhook body."""
+    secret = payment_gateway.get_config()['WEBHOOK_SECRET']
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def handle_webhook_event(event):
+    """Apply a verified webhook event; returns a short outcome string."""
+    name = event.get('event', '')
+    payload = event.get('payload') or {}
+    entity = (payload.get('payment') or {}).get('entity') or {}
+    order_id = entity.get('order_id') or ((payload.get('order') or {}).get('entity') or {}).get('id')
+    payment_id = entity.get('id')
+    if not order_id:
+        return 'ignored'
+    if name in PAID_EVENTS:
+        payment, confirmed = confirm_payment(order_id, payment_id, WEBHOOK, captured=name in CAPTURED_EVENTS)
+        if payment is None:
+            return 'unknown-order'
+        return 'confirmed' if confirmed else 'duplicate'
+    if name == 'payment.failed':
+        payment = mark_failed(order_id, payment_id, reason=entity.get('error_description') or '')
+        return 'failed' if payment is not None else 'unknown-order'
+    return 'ignored'
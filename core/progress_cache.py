@@ -0,0 +1,200 @@
+"""
+Incremental course-progress helpers.
+
+Video progress used to be recomputed on every play by loading every active
+`CourseScheduleItem` ID of the course and every `VideoPlay` of the user and
+intersecting the two sets. Instead, `CourseProgress.watched_count` is bumped
+atomically the first time a user plays an item, and the number of active items
+per course is cached. Signal handlers in `core.signals` drop the cached count
+and re-derive the counters of a course when its schedule items change; the
+`reconcile_course_progress` command does the same for every course.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .cache import namespace
+
+# Admin edits delete the entry directly; the timeout is a safety net.
+ACTIVE_ITEMS_TIMEOUT = 60 * 5
+
+active_item_counts = namespace('course-active-items', timeout=ACTIVE_ITEMS_TIMEOUT)
+
+
+def _count_active_items(course_id):
+    from .models import CourseScheduleItem
+    return CourseScheduleItem.objects.filter(day__course_id=course_id, is_active=True).count()
+
+
+def get_active_item_count(course_id):
+    """Number of active schedule items in a course, served from the cache."""
+    return active_item_counts.get_or_set(course_id, compute=lambda: _count_active_items(course_id))
+
+
+def invalidate_active_item_count(course_id):
+    """Forget the cached active-item count (called from schedule-item signals)."""
+    active_item_counts.delete(course_id)
+
+
+class _PendingReconcile:
+    """Courses (and days, resolved to courses) to refresh when a transaction commits.
+
+    Each value says whether the watched counters need re-deriving as well as
+    the cached active-item count.
+    """
+
+    def __init__(self):
+        self.courses = {}
+        self.days = {}
+        # Course of every day deleted in the transaction, recorded before the
+        # row goes away
+        self.day_courses = {}
+        self.done = False
+
+    def __call__(self):
+        from .models import CourseScheduleDay
+        self.done = True
+        unresolved = set(self.days) - set(self.day_courses)
+        if unresolved:
+            self.day_courses.update(
+                CourseScheduleDay.objects.filter(pk__in=unresolved).values_list('pk', 'course_id')
+            )
+        for day_id, reconcile in self.days.items():
+            course_id = self.day_courses.get(day_id)
+            if course_id is not None:
+                self.courses[course_id] = self.courses.get(course_id, False) or reconcile
+        for course_id, reconcile in self.courses.items():
+            invalidate_active_item_count(course_id)
+            if reconcile:
+                reconcile_watched_counts(course_id)
+
+
+def _pending_reconcile():
+    """The current transaction's `_PendingReconcile`, scheduled on commit once."""
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'core_pending_reconcile', None)
+    # Start over once it has run, or when a rollback dropped the callback
+    if pending is None or pending.done or not any(
+        callback is pending for _, callback, _ in connection.run_on_commit
+    ):
+        pending = _PendingReconcile()
+        connection.core_pending_reconcile = pending
+        transaction.on_commit(pending)
+    return pending
+
+
+def reconcile_on_commit(course_ids=(), day_ids=(), reconcile=True):
+    """Refresh the counts of these courses (or of the courses of these days) once, on commit.
+
+    However many schedule items a transaction touches, each affected course
+    gets one cache delete and, with `reconcile`, one counter UPDATE.
+    """
+    if transaction.get_connection().in_atomic_block:
+        pending = _pending_reconcile()
+    else:
+        pending = _PendingReconcile()
+    for course_id in course_ids:
+        pending.courses[course_id] = pending.courses.get(course_id, False) or reconcile
+    for day_id in day_ids:
+        pending.days[day_id] = pending.days.get(day_id, False) or reconcile
+    if not transaction.get_connection().in_atomic_block:
+        pending()
+
+
+def note_deleted_day(day):
+    """Remember a day's course while its row still exists (pre_delete)."""
+    if transaction.get_connection().in_atomic_block:
+        _pending_reconcile().day_courses[day.pk] = day.course_id
+
+
+def get_or_create_progress(course_access):
+    """The access's `CourseProgress`, created with `watched_count` seeded from existing plays.
+
+    Users may have played items before their progress row exists; starting
+    them at zero would understate progress until the next reconcile.
+    """
+    from .models import CourseProgress, VideoPlay
+    progress, _ = CourseProgress.objects.get_or_create(
+        course_access=course_access,
+        defaults={
+            'watched_count': lambda: VideoPlay.objects.filter(
+                user_id=course_access.user_id,
+                course_item__day__course_id=course_access.course_id,
+                course_item__is_active=True,
+            ).count(),
+        },
+    )
+    return progress
+
+
+def record_first_play(progress, user, course_item):
+    """Record that `user` played `course_item` and bump progress on first play.
+
+    Returns True when this was the first play of the item. The counter is
+    incremented with an F() expression so concurrent plays of different items
+    never lose an update; `progress.watched_count` is refreshed in place.
+    """
+    from .models import CourseProgress, VideoPlay
+    _, created = VideoPlay.objects.get_or_create(user=user, course_item=course_item)
+    if created:
+        CourseProgress.objects.filter(pk=progress.pk).update(watched_count=F('watched_count') + 1)
+        progress.refresh_from_db(fields=['watched_count'])
+    return created
+
+
+def access_watched_items():
+    """Annotation for `CourseAccess` querysets: active items the user has played."""
+    from .models import VideoPlay
+    plays = (
+        VideoPlay.objects.filter(
+            user_id=OuterRef('user_id'),
+            course_item__day__course_id=OuterRef('course_id'),
+            course_item__is_active=True,
+        )
+        .order_by()
+        .values('user_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(plays), 0)
+
+
+def access_total_items():
+    """Annotation for `CourseAccess` querysets: active items in the course."""
+    from .models import CourseScheduleItem
+    items = (
+        CourseScheduleItem.objects.filter(day__course_id=OuterRef('course_id'), is_active=True)
+        .order_by()
+        .values('day__course_id')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(items), 0)
+
+
+def watched_count_expression():
+    """Subquery computing the true watched count for a `CourseProgress` row.
+
+    Usable in `CourseProgress.objects.update(watched_count=...)`; it counts
+    the plays of the row's user on active items of the row's course.
+    """
+    from .models import CourseAccess
+    per_access = (
+        CourseAccess.objects.filter(pk=OuterRef('course_access_id'))
+        .annotate(total=access_watched_items())
+        .values('total')
+    )
+    return Coalesce(Subquery(per_access), 0)
+
+
+def reconcile_watched_counts(course_id=None):
+    """Recompute `watched_count` for one course (or all) with a single UPDATE.
+
+    Returns the number of progress rows updated.
+    """
+    from .models import CourseProgress
+    progress = CourseProgress.objects.all()
+    if course_id is not None:
+        progress = progress.filter(course_access__course_id=course_id)
+    return progress.update(watched_count=watched_count_expression())
@@ -4,15 +4,41 @@ Hooks into the ExamAttempt model to create certificates when:
 1. Exam attempt is submitted
 2. Score is 80% or above
 3. is_passed flag is True
+
+Also drops cached exam metadata (see `core.exam_cache`) and notifies open
+exam event streams (see `core.exam_events`) when an admin edits an exam or
+its questions, keeps the incremental video-progress counters (see
+`core.progress_cache`) in step with schedule-item edits, and bumps the
+content version of cached course pages (see `core.page_cache`) when anything
+shown on them changes. The cached home page context (see `core.home_cache`)
+is dropped whenever any of its models changes, singleton content (see
+`core.singletons`) is reloaded after an edit, the about page version used
+for conditional GET (see `core.conditional`) moves with its content, and
+newly uploaded lecture videos are queued for HLS packaging and metadata
+extraction (see `core.video_packaging` and `core.video_metadata`), and
+uploaded images get responsive variants (see `core.image_variants`).
 """
 
-from django.db.models.signals import post_save
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 import json
 import logging
 
-from .models import ExamAttempt, ExamCertificate
+from .models import (
+    AboutPage, AboutSection, Course, CourseBrochure, CourseExam, CourseFeature, CourseInstructor,
+    CourseLocalInstructor, CourseOverview, CoursePurchaseCard, CourseScheduleDay, CourseScheduleItem,
+    CourseSkill, CourseTool, ExamAttempt, ExamCertificate, ExamQuestion, FeatureCard, HeroBanner,
+    Instructor, TestimonialStrip,
+)
+from . import (
+    exam_cache, exam_events, home_cache, image_variants, page_cache, progress_cache, singletons,
+    video_metadata, video_packaging,
+)
+from .cache import invalidate_tags_on
+from .conditional import ABOUT_TAG
 
 logger = logging.getLogger(__name__)
 
@@ -22,20 +48,40 @@ def auto_create_certificate_on_pass(sender, instance, created, update_fields, **
     """
     Automatically create an ExamCertificate when an exam attempt is passed.
     
-    This signal fires after an ExamAttempt is saved. If the attempt:
+    This signal fires after an ExamAttempt is saved, but only acts on the
+    save that makes the attempt submitted and passed. If the attempt:
     - Is submitted (is_submitted=True)
     - Has passed (is_passed=True)
     - Has a score of 80% or above
     
-    Then a certificate is automatically created with all student and exam details.
+    Then a certificate is created with all student and exam details once the
+    surrounding transaction commits, so grading does not wait on it.
     """
+    # Saves that don't touch the result fields (e.g. violation counters)
+    if update_fields is not None and not {'is_submitted', 'is_passed'} & set(update_fields):
+        return
+    
+    # Only process if this is a submitted and passed attempt with 80%+
+    if not instance.is_submitted or not instance.is_passed:
+        return
+    
+    # Already submitted and passed before this save
+    if instance.loaded_result_state == (True, True):
+        return
+    
+    if instance.score_percentage is None or instance.score_percentage < 80:
+        return
+    
+    attempt_id = instance.pk
+    transaction.on_commit(lambda: _create_exam_certificate(attempt_id))
+
+
+def _create_exam_certificate(attempt_id):
+    """Create the ExamCertificate for a passed attempt (runs after commit)."""
     try:
-        # Only process if this is a submitted and passed attempt with 80%+
-        if not instance.is_submitted or not instance.is_passed:
-            return
-        
-        if instance.score_percentage is None or instance.score_percentage < 80:
-            return
+        instance = ExamAttempt.objects.select_related(
+            'course_access__user', 'course_access__course', 'course_access__payment',
+        ).get(pk=attempt_id)
         
         # Check if certificate already exists
         if ExamCertificate.objects.filter(exam_attempt=instance).exists():
@@ -115,3 +161,136 @@ def certificate_file_upload_notification(sender, instance, created, update_field
                 # Example: send_certificate_ready_email(instance)
     except Exception as e:
         logger.error(f'Error in certificate upload notification: {str(e)}', exc_info=True)
+
+
+@receiver(post_save, sender=CourseExam)
+@receiver(post_delete, sender=CourseExam)
+def invalidate_exam_meta_on_exam_change(sender, instance, **kwargs):
+    """Drop cached exam metadata when the exam configuration changes."""
+    exam_cache.invalidate_exam_meta(instance.pk)
+    exam_events.publish_exam_updated(instance.pk)
+
+
+@receiver(post_save, sender=ExamQuestion)
+@receiver(post_delete, sender=ExamQuestion)
+def invalidate_exam_meta_on_question_change(sender, instance, **kwargs):
+    """Drop cached exam metadata when a question is added, edited or removed."""
+    exam_cache.invalidate_exam_meta(instance.exam_id)
+    exam_cache.bump_payload_version(instance.exam_id)
+    exam_events.publish_exam_updated(instance.exam_id)
+
+
+@receiver(post_save, sender=CourseScheduleItem)
+@receiver(post_delete, sender=CourseScheduleItem)
+def reconcile_progress_on_item_change(sender, instance, created=False, update_fields=None, **kwargs):
+    """Refresh the active-item count and watched counters of the item's course.
+
+    A new item has no plays yet, so only the cached count changes. Deletes
+    cascade to `VideoPlay`, and edits that toggle `is_active` or move the
+    item to another course change what counts, so the counters of the
+    affected courses are re-derived. Other edits (titles, thumbnails, video
+    files) leave them alone. The work is collected per transaction and done
+    once per course on commit, so deleting a whole course or bulk-deleting
+    items costs no query per item.
+    """
+    if kwargs['signal'] is post_delete:
+        progress_cache.reconcile_on_commit(day_ids=[instance.day_id])
+        return
+    day_ids = {instance.day_id}
+    active_changed = True
+    if not created:
+        if update_fields is not None and not {'is_active', 'day'} & set(update_fields):
+            return
+        loaded = instance.loaded_progress_state
+        if loaded is not None:
+            was_active, previous_day_id = loaded
+            active_changed = was_active != instance.is_active
+            if not active_changed and previous_day_id == instance.day_id:
+                return
+            day_ids.add(previous_day_id)
+    course_ids = set(CourseScheduleDay.objects.filter(pk__in=day_ids).values_list('course_id', flat=True))
+    if not active_changed and len(course_ids) == 1:
+        # Moved to another day of the same course
+        return
+    progress_cache.reconcile_on_commit(course_ids=course_ids, reconcile=not created)
+
+
+@receiver(pre_delete, sender=CourseScheduleDay)
+def remember_deleted_day_course(sender, instance, **kwargs):
+    """Keep the course of a deleted day for the reconcile of its items' deletes."""
+    progress_cache.note_deleted_day(instance)
+
+
+@receiver(post_save, sender=CourseScheduleItem)
+def process_uploaded_video(sender, instance, raw=False, **kwargs):
+    """Mark an item with a new video file pending for HLS packaging and queue metadata extraction."""
+    if not raw and video_packaging.queue_item(instance):
+        video_metadata.queue_item(instance)
+
+
+@receiver(post_delete, sender=CourseScheduleItem)
+def remove_packaged_video(sender, instance, **kwargs):
+    """Drop the HLS renditions of a deleted item."""
+    if instance.hls_source:
+        storage, video_name = instance.video_file.storage, instance.hls_source
+        transaction.on_commit(lambda: video_packaging.remove_packaged(storage, video_name))
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_slug(sender, instance, **kwargs):
+    """Keep the stored slug so a renamed course also drops its old page."""
+    if instance.pk:
+        instance._previous_slug = Course.objects.filter(pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def bump_course_page_on_course_change(sender, instance, **kwargs):
+    """Invalidate the cached course page when the course itself changes."""
+    page_cache.bump_page_version(instance.slug, getattr(instance, '_previous_slug', None))
+
+
+# Cached exam clocks carry the user's session hash and active flag
+invalidate_tags_on(User, lambda instance: [exam_cache.user_tag(instance.pk)])
+
+
+# Everything else shown on the course page invalidates it through tag hooks
+for _model in (
+    CourseLocalInstructor, CourseInstructor, CourseFeature, CourseSkill, CourseTool,
+    CourseOverview, CourseBrochure, CourseScheduleDay, CourseExam,
+):
+    invalidate_tags_on(_model, lambda instance: page_cache.course_page_tags(pk=instance.course_id))
+invalidate_tags_on(CourseScheduleItem, lambda instance: page_cache.course_page_tags(schedule_days=instance.day_id))
+# The page shows the number of active exam questions
+invalidate_tags_on(ExamQuestion, lambda instance: page_cache.course_page_tags(exam=instance.exam_id))
+# A shared instructor appears on every course it is linked to
+invalidate_tags_on(Instructor, lambda instance: page_cache.course_page_tags(courseinstructor__instructor=instance.pk))
+
+# Any admin edit of home page content drops the cached home context
+for _model in home_cache.home_models():
+    invalidate_tags_on(_model, lambda instance: [home_cache.HOME_TAG])
+
+# The about page version behind its ETag / Last-Modified
+for _model in (AboutPage, AboutSection):
+    invalidate_tags_on(_model, lambda instance: [ABOUT_TAG])
+
+# Singletons are served from process memory until their tag version moves
+for _name, _models in singletons.singleton_models().items():
+    for _model in _models:
+        invalidate_tags_on(_model, singletons.tags_for(_name))
+
+# Responsive variants of uploaded images; the pages showing them are
+# invalidated again once the variants exist
+image_variants.generate_on_save(HeroBanner, 'image', lambda instance: [home_cache.HOME_TAG])
+image_variants.generate_on_save(FeatureCard, 'card_image', lambda instance: [home_cache.HOME_TAG])
+image_variants.generate_on_save(TestimonialStrip, 'image', lambda instance: [home_cache.HOME_TAG])
+image_variants.generate_on_save(
+    Instructor, 'image', lambda instance: page_cache.course_page_tags(courseinstructor__instructor=instance.pk)
+)
+image_variants.generate_on_save(
+    CourseLocalInstructor, 'image', lambda instance: page_cache.course_page_tags(pk=instance.course_id)
+)
+image_variants.generate_on_save(
+    CourseScheduleItem, 'thumbnail', lambda instance: page_cache.course_page_tags(schedule_days=instance.day_id)
+)
+image_variants.generate_on_save(CoursePurchaseCard, 'card_image')
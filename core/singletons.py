@@ -0,0 +1,133 @@
+"""
+Process-local registry of singleton content models.
+
+Several admin-managed models are effectively singletons: pages show the most
+recently updated active row (`AboutPage`, `HeroBanner`, `HomeAboutSection`,
+`LearningBanner`, `WhyChoose`, `CertificateSection`). Each one is loaded at
+most once per process per content version and then served from memory.
+
+Every singleton has a `core.cache` tag; signal hooks in `core.signals`
+invalidate it when the model (or a child model shown with it) is saved or
+deleted. A request only reads the current tag versions, all in one shared
+cache round-trip, and reloads just the singletons whose version moved, so an
+admin edit is visible on the next request in every worker.
+"""
+
+import threading
+
+from django.apps import apps
+from django.db.models import Prefetch
+
+from .cache import tag_versions
+
+SINGLETON_TAG = 'singleton:{name}'
+
+
+def _why_choose_queryset(queryset):
+    from .models import WhyChooseItem
+    return queryset.prefetch_related(
+        Prefetch('items', queryset=WhyChooseItem.objects.filter(is_active=True).order_by('order'),
+                 to_attr='active_items'),
+    )
+
+
+# name -> (model label, child model labels, queryset hook or None)
+SINGLETONS = {
+    'about_page': ('core.AboutPage', (), None),
+    'hero_banner': ('core.HeroBanner', (), None),
+    'home_about': ('core.HomeAboutSection', (), None),
+    'learning_banner': ('core.LearningBanner', (), None),
+    'why_choose': ('core.WhyChoose', ('core.WhyChooseItem',), _why_choose_queryset),
+    'certificate_section': ('core.CertificateSection', (), None),
+}
+
+# name -> (version, instance or None)
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+
+def singleton_tag(name):
+    """Cache tag covering a registered singleton."""
+    return SINGLETON_TAG.format(name=name)
+
+
+def singleton_models():
+    """Map of singleton name -> models whose changes invalidate it (for signal hooks)."""
+    return {
+        name: [apps.get_model(label) for label in (model_label, *children)]
+        for name, (model_label, children, _) in SINGLETONS.items()
+    }
+
+
+def tags_for(name):
+    """`invalidate_tags_on` callback invalidating the singleton `name`."""
+    def _tags(instance):
+        return [singleton_tag(name)]
+    # invalidate_tags_on derives its dispatch_uid from the qualname
+    _tags.__qualname__ = f'singleton_tags:{name}'
+    return _tags
+
+
+def _load(name):
+    model_label, _, queryset_hook = SINGLETONS[name]
+    queryset = apps.get_model(model_label).objects.filter(is_active=True).order_by('-updated_at')
+    if queryset_hook is not None:
+        queryset = queryset_hook(queryset)
+    return queryset.first()
+
+
+def get_singletons(*names):
+    """Current instance (or None) of each named singleton, as a dict.
+
+    Reads every tag version in one round-trip and only queries the database
+    for singletons not yet loaded in this process at their current version.
+    """
+    names = names or tuple(SINGLETONS)
+    versions = tag_versions([singleton_tag(name) for name in names])
+    found = {}
+    with _loaded_lock:
+        for name in names:
+            entry = _loaded.get(name)
+            if entry is not None and entry[0] == versions[singleton_tag(name)]:
+                found[name] = entry[1]
+    for name in names:
+        if name in found:
+            continue
+        # The version was read before loading, so an edit made meanwhile
+        # leaves this entry outdated and it is reloaded on the next request.
+        instance = _load(name)
+        with _loaded_lock:
+            _loaded[name] = (versions[singleton_tag(name)], instance)
+        found[name] = instance
+    return found
+
+
+def get_singleton(name):
+    """Current instance of one registered singleton, or None."""
+    return get_singletons(name)[name]
+
+
+class SiteSingletons:
+    """Lazy, request-scoped view of every singleton for templates.
+
+    Nothing is read until a template first touches an attribute; after that
+    the whole set is resolved once and reused for the rest of the request.
+    """
+
+    def __init__(self):
+        self._values = None
+
+    def __getattr__(self, name):
+        if name.startswith('_') or name not in SINGLETONS:
+            raise AttributeError(name)
+        if self._values is None:
+            self._values = get_singletons()
+        return self._values[name]
+
+
+def site_singletons(request):
+    """Context processor exposing `site_singletons` (see `SiteSingletons`)."""
+    singletons = getattr(request, '_site_singletons', None)
+    if singletons is None:
+        singletons = request._site_singletons = SiteSingletons()
+    return {'site_singletons': singletons}
@@ -0,0 +1,64 @@
+"""
+Template tags serving uploaded images through their responsive variants
+(see `core.image_variants`).
+
+    {% load responsive_images %}
+    {% picture item.thumbnail sizes="24px" alt=item.title class="video-thumb" %}
+    <div style="background-image: url('{% variant_url hero_banner.image 1920 %}')">
+
+Until an upload's variants exist both fall back to the original file.
+"""
+
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core import image_variants
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(image, sizes='100vw', **attrs):
+    """`<picture>` with WebP and JPEG/PNG srcsets for an uploaded image.
+
+    Extra keyword arguments (alt, class, style, loading, ...) become
+    attributes of the `<img>`. The `<picture>` wrapper uses
+    `display: contents` so existing CSS sizing of the image keeps working.
+    """
+    if not image:
+        return ''
+    attrs.setdefault('alt', '')
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    manifest = image_variants.get_manifest(image)
+    if manifest is None or not manifest['widths']:
+        return format_html('<img src="{}"{}>', image.url, _attributes(attrs))
+
+    fallback = manifest['fallback']
+    return format_html(
+        '<picture style="display: contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}>'
+        '</picture>',
+        image_variants.srcset(manifest, 'webp'), sizes,
+        image_variants.variant_url(manifest, manifest['widths'][-1], fallback),
+        image_variants.srcset(manifest, fallback), sizes,
+        _attributes(attrs),
+    )
+
+
+@register.simple_tag
+def variant_url(image, width, ext=None):
+    """URL of the smallest variant at least `width` pixels wide (in `ext`, default the fallback format)."""
+    if not image:
+        return ''
+    manifest = image_variants.get_manifest(image)
+    if manifest is None or not manifest['widths']:
+        return image.url
+    ext = ext or manifest['fallback']
+    chosen = next((w for w in manifest['widths'] if w >= int(width)), manifest['widths'][-1])
+    return image_variants.variant_url(manifest, chosen, ext)
+
+
+def _attributes(attrs):
+    return format_html_join('', ' {}="{}"', ((name.replace('_', '-'), value) for name, value in attrs.items()))
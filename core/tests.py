@@ -0,0 +1,642 @@
+from datetime import timedelta
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import razorpay
+
+from core import cache as shared_cache, media_streaming, payments, progress_cache, video_packaging
+from core.models import (
+    Course, CourseAccess, CourseExam, CoursePayment, CourseProgress, CourseScheduleDay, CourseScheduleItem,
+    ExamAnswer, ExamAttempt, ExamQuestion, ExamViolation, VideoPlay,
+)
+
+# Query budgets below must not include cache round-trips, so the tests run
+# against a per-process cache instead of the database cache table (and over
+# plain HTTP whatever DEBUG is)
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'core-tests',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'core-tests-sessions',
+    },
+}
+
+
+def make_user(username='student'):
+    return User.objects.create_user(username, f'{username}@example.com', 'password')
+
+
+def make_course(slug='python', **fields):
+    return Course.objects.create(name=slug.title(), slug=slug, discounted_price=100, **fields)
+
+
+def make_questions(exam, count, correct_answer='A'):
+    return [
+        ExamQuestion.objects.create(
+            exam=exam, question_text=f'Question {order + 1}', option_a='a', option_b='b',
+            option_c='c', option_d='d', correct_answer=correct_answer, order=order,
+        )
+        for order in range(count)
+    ]
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class ExamViolationQueryTests(TestCase):
+    """Recording violations costs the same queries for one event or a batch."""
+
+    def setUp(self):
+        self.user = make_user()
+        course = make_course()
+        CourseExam.objects.create(course=course, duration_minutes=60)
+        self.access = CourseAccess.objects.create(user=self.user, course=course)
+        self.client.force_login(self.user)
+
+    def _record(self, attempt, count):
+        return self.client.post(
+            reverse('exam_record_violation', args=[attempt.pk]),
+            json.dumps({'events': [{'violation_type': 'tab_switch', 'description': 'Left the tab'}] * count}),
+            content_type='application/json',
+        )
+
+    def test_constant_queries_for_one_and_many_events(self):
+        for attempt_number, count in enumerate((1, 20), start=1):
+            with self.subTest(events=count):
+                attempt = ExamAttempt.objects.create(
+                    course_access=self.access, attempt_number=attempt_number, duration_minutes=60,
+                )
+                # session user, attempt, then UPDATE + INSERT of the new type
+                # and the attempt counter UPDATE, in savepoints
+                with self.assertNumQueries(9):
+                    self.assertEqual(self._record(attempt, count).status_code, 200)
+                # a known type is a single UPDATE
+                with self.assertNumQueries(6):
+                    self.assertEqual(self._record(attempt, count).status_code, 200)
+
+                violation = ExamViolation.objects.get(attempt=attempt)
+                self.assertEqual(violation.violation_count, 2 * count)
+                attempt.refresh_from_db()
+                self.assertTrue(attempt.has_violations)
+                self.assertEqual(attempt.violation_count, 1)
+
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class CourseDetailQueryTests(TestCase):
+    """course_detail's query count does not grow with the schedule."""
+
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+        CourseExam.objects.create(course=self.course, duration_minutes=60)
+        for number in range(90):
+            day = CourseScheduleDay.objects.create(course=self.course, title=f'Day {number + 1}', order=number)
+            CourseScheduleItem.objects.bulk_create(
+                CourseScheduleItem(day=day, title=f'Lesson {order + 1}', order=order, duration_seconds=600)
+                for order in range(3)
+            )
+        self.url = reverse('course_detail', args=[self.course.slug])
+
+    def test_logged_in_query_budget(self):
+        self.client.force_login(make_user())
+        # session user, access check, course, two instructor prefetches and
+        # seven section prefetches (days and their items included)
+        with self.assertNumQueries(12):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Day 90')
+        # cached sections: only the user-specific hero is queried
+        with self.assertNumQueries(5):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_anonymous_warm_render_is_query_free(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class ConditionalGetTests(TestCase):
+    """Anonymous revalidation of unchanged pages is a 304 from one cache read."""
+
+    def setUp(self):
+        cache.clear()
+        self.course = make_course()
+
+    def _assert_cheap_304(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        backend = caches['default']
+        with mock.patch.object(backend, 'get', wraps=backend.get) as get, \
+                mock.patch.object(backend, 'get_many', wraps=backend.get_many) as get_many:
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertLessEqual(get.call_count + get_many.call_count, 1)
+
+    def test_home(self):
+        self._assert_cheap_304(reverse('home'))
+
+    def test_about(self):
+        self._assert_cheap_304(reverse('about'))
+
+    def test_course_detail(self):
+        self._assert_cheap_304(reverse('course_detail', args=[self.course.slug]))
+
+    def test_edit_changes_etag(self):
+        url = reverse('course_detail', args=[self.course.slug])
+        etag = self.client.get(url)['ETag']
+        self.course.description = 'Updated'
+        self.course.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ProtectedMediaBackendCheckTests(TestCase):
+    """The python media backend only passes the system checks under DEBUG."""
+
+    def _errors(self):
+        from core.checks import check_protected_media_backend
+        return [error.id for error in check_protected_media_backend(None)]
+
+    @override_settings(DEBUG=False, PROTECTED_MEDIA_BACKEND='python')
+    def test_python_backend_fails_without_debug(self):
+        self.assertEqual(self._errors(), ['core.E002'])
+
+    @override_settings(DEBUG=True, PROTECTED_MEDIA_BACKEND='python')
+    def test_python_backend_allowed_with_debug(self):
+        self.assertEqual(self._errors(), [])
+
+    @override_settings(DEBUG=False, PROTECTED_MEDIA_BACKEND='nginx')
+    def test_proxy_backend_passes(self):
+        self.assertEqual(self._errors(), [])
+
+    @override_settings(DEBUG=False, PROTECTED_MEDIA_BACKEND='apache')
+    def test_unknown_backend(self):
+        self.assertEqual(self._errors(), ['core.E001'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class ExamSaveAnswersTests(TestCase):
+    """Batched answer saves and the answers carried by a forced submit."""
+
+    def setUp(self):
+        self.user = make_user()
+        course = make_course()
+        self.exam = CourseExam.objects.create(course=course, duration_minutes=60, passing_score=50)
+        self.questions = make_questions(self.exam, 3)
+        access = CourseAccess.objects.create(user=self.user, course=course)
+        self.attempt = ExamAttempt.objects.create(
+            course_access=access, duration_minutes=60, total_questions=3,
+            question_ids=[question.pk for question in self.questions],
+        )
+        self.client.force_login(self.user)
+
+    def _post(self, name, answers):
+        return self.client.post(
+            reverse(name, args=[self.attempt.pk]),
+            json.dumps({'answers': answers}),
+            content_type='application/json',
+        )
+
+    def _stored(self):
+        return dict(ExamAnswer.objects.filter(attempt=self.attempt).values_list('question_id', 'selected_answer'))
+
+    def test_highest_client_seq_wins(self):
+        first = self.questions[0].pk
+        response = self._post('exam_save_answers', [
+            {'question_id': first, 'selected_answer': 'C', 'client_seq': 3},
+            {'question_id': first, 'selected_answer': 'B', 'client_seq': 1},
+        ])
+        self.assertEqual(response.json()['acked_seq'], 3)
+        self.assertEqual(self._stored(), {first: 'C'})
+
+    def test_foreign_questions_are_rejected(self):
+        other_exam = CourseExam.objects.create(course=make_course('django'), duration_minutes=60)
+        foreign = make_questions(other_exam, 1)[0]
+        response = self._post('exam_save_answers', [
+            {'question_id': foreign.pk, 'selected_answer': 'A', 'client_seq': 1},
+            {'question_id': self.questions[1].pk, 'selected_answer': 'Z', 'client_seq': 2},
+        ])
+        self.assertEqual(sorted(response.json()['rejected']), sorted([foreign.pk, self.questions[1].pk]))
+        self.assertEqual(self._stored(), {})
+
+    def test_submitted_attempt_is_rejected(self):
+        ExamAttempt.objects.filter(pk=self.attempt.pk).update(is_submitted=True)
+        response = self._post('exam_save_answers', [
+            {'question_id': self.questions[0].pk, 'selected_answer': 'A', 'client_seq': 1},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self._stored(), {})
+
+    def test_batch_is_written_with_one_upsert(self):
+        answers = [
+            {'question_id': question.pk, 'selected_answer': 'A', 'client_seq': seq}
+            for seq, question in enumerate(self.questions, start=1)
+        ]
+        self._post('exam_save_answers', answers)
+        answers[0]['selected_answer'] = 'D'
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self._post('exam_save_answers', answers).json()['saved'], 3)
+        writes = [
+            query['sql'] for query in queries
+            if not query['sql'].upper().startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))
+        ]
+        self.assertEqual(len(writes), 1)
+        self.assertIn('ON CONFLICT', writes[0].upper())
+        self.assertEqual(self._stored()[self.questions[0].pk], 'D')
+
+    def test_submit_stores_carried_answers_before_grading(self):
+        self._post('exam_save_answers', [
+            {'question_id': self.questions[0].pk, 'selected_answer': 'A', 'client_seq': 1},
+        ])
+        response = self._post('exam_submit', [
+            {'question_id': self.questions[1].pk, 'selected_answer': 'A', 'client_seq': 2},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['correct_answers'], 2)
+        self.assertEqual(len(self._stored()), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NamespaceGetOrSetTests(TestCase):
+    """A contended refresh serves the stale value, or computes, but never waits."""
+
+    def setUp(self):
+        cache.clear()
+        self.namespace = shared_cache.namespace('test-get-or-set', timeout=60)
+        self.tag = 'test-get-or-set-tag'
+
+    def _hold_lock(self):
+        cache.add(self.namespace.key('entry') + ':lock', 1, shared_cache.LOCK_TIMEOUT)
+
+    def test_contended_refresh_serves_stale_value(self):
+        self.namespace.set('entry', value='old', tags=[self.tag])
+        shared_cache.invalidate_tags(self.tag)
+        self.assertIsNone(self.namespace.get('entry'))
+
+        self._hold_lock()
+        compute = mock.Mock(return_value='new')
+        with mock.patch('core.cache.time.sleep') as sleep:
+            value = self.namespace.get_or_set('entry', compute=compute, tags=[self.tag])
+        self.assertEqual(value, 'old')
+        compute.assert_not_called()
+        sleep.assert_not_called()
+
+    def test_contended_cold_miss_computes_without_waiting(self):
+        self._hold_lock()
+        with mock.patch('core.cache.time.sleep') as sleep:
+            value = self.namespace.get_or_set('entry', compute=lambda: 'new')
+        self.assertEqual(value, 'new')
+        sleep.assert_not_called()
+
+    def test_expired_entry_is_refreshed_by_the_lock_holder(self):
+        self.namespace.set('entry', value='old', timeout=0)
+        self.assertEqual(self.namespace.get_or_set('entry', compute=lambda: 'new'), 'new')
+        self.assertEqual(self.namespace.get('entry'), 'new')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class ExamClockTests(TestCase):
+    """A warm clock poll is served from the cache and the session alone."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        course = make_course()
+        exam = CourseExam.objects.create(course=course, duration_minutes=60)
+        make_questions(exam, 2)
+        CourseAccess.objects.create(user=self.user, course=course)
+        self.client.force_login(self.user)
+        self.client.get(reverse('exam_start', args=[course.pk]))
+        self.url = reverse('exam_clock', args=[ExamAttempt.objects.get().pk])
+
+    def test_warm_poll_runs_no_queries(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.json()['is_submitted'])
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+
+KEY_SECRET = 'test-key-secret'
+WEBHOOK_SECRET = 'test-webhook-secret'
+
+
+def sign(secret, message):
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class PaymentConfirmationTests(TestCase):
+    """The checkout callback and the webhook grant access once, in either order."""
+
+    def setUp(self):
+        self.user = make_user()
+        self.course = make_course()
+        self.order_id, self.payment_id = 'order_test1', 'pay_test1'
+        payments.record_order(self.user, self.course, self.order_id, 100, 'INR', {})
+        client = razorpay.Client(auth=('test-key', KEY_SECRET))
+        config = {'WEBHOOK_SECRET': WEBHOOK_SECRET}
+        for patcher in (
+            mock.patch('core.payment_gateway.get_client', return_value=client),
+            mock.patch('core.payment_gateway.get_config', return_value=config),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client.force_login(self.user)
+
+    def _callback(self):
+        return self.client.post(
+            reverse('payment_callback', args=[self.course.slug]),
+            json.dumps({
+                'razorpay_order_id': self.order_id,
+                'razorpay_payment_id': self.payment_id,
+                'razorpay_signature': sign(KEY_SECRET, f'{self.order_id}|{self.payment_id}'),
+            }),
+            content_type='application/json',
+        )
+
+    def _webhook(self, signature=None):
+        body = json.dumps({
+            'event': 'payment.captured',
+            'payload': {'payment': {'entity': {'id': self.payment_id, 'order_id': self.order_id}}},
+        })
+        return self.client.post(
+            reverse('razorpay_webhook'), body, content_type='application/json',
+            HTTP_X_RAZORPAY_SIGNATURE=signature or sign(WEBHOOK_SECRET, body),
+        )
+
+    def _assert_granted_once(self, confirmed_via):
+        self.assertEqual(CourseAccess.objects.filter(user=self.user, course=self.course).count(), 1)
+        payment = CoursePayment.objects.get(order_id=self.order_id)
+        self.assertEqual(payment.status, 'successful')
+        self.assertEqual(payment.confirmed_via, confirmed_via)
+        self.assertIsNotNone(payment.captured_at)
+
+    def test_callback_then_webhook(self):
+        self.assertEqual(self._callback().status_code, 200)
+        self.assertEqual(self._webhook().json()['status'], 'duplicate')
+        self._assert_granted_once(payments.CALLBACK)
+
+    def test_webhook_then_callback(self):
+        self.assertEqual(self._webhook().json()['status'], 'confirmed')
+        self.assertEqual(self._callback().status_code, 200)
+        self._assert_granted_once(payments.WEBHOOK)
+
+    def test_webhook_with_bad_signature_is_rejected(self):
+        response = self._webhook(signature=sign('wrong-secret', 'body'))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CourseAccess.objects.exists())
+        self.assertEqual(CoursePayment.objects.get(order_id=self.order_id).status, 'pending')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class VideoPackagingQueueTests(TestCase):
+    """Uploads are only marked pending; the package_videos command encodes them."""
+
+    def setUp(self):
+        day = CourseScheduleDay.objects.create(course=make_course(), title='Day 1', order=0)
+        with mock.patch('core.video_packaging.package_item') as package_item, \
+                mock.patch('core.video_metadata.enqueue'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.item = CourseScheduleItem.objects.create(
+                    day=day, title='Lesson 1', order=0, video_file='course_videos/lesson.mp4',
+                )
+        package_item.assert_not_called()
+
+    def test_upload_is_marked_pending(self):
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.hls_status, video_packaging.PENDING)
+        self.assertEqual(self.item.hls_source, 'course_videos/lesson.mp4')
+
+    def test_command_packages_pending_items(self):
+        with mock.patch('core.video_packaging.package_item', return_value=video_packaging.READY) as package_item:
+            call_command('package_videos', stdout=mock.Mock())
+        package_item.assert_called_once_with(self.item.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FinalizeExpiredAttemptsTests(TestCase):
+    """The sweeper grades expired open attempts once and leaves the rest alone."""
+
+    def setUp(self):
+        course = make_course()
+        exam = CourseExam.objects.create(course=course, duration_minutes=60, passing_score=50)
+        questions = make_questions(exam, 2)
+        access = CourseAccess.objects.create(user=make_user(), course=course)
+        past, future = timezone.now() - timedelta(minutes=5), timezone.now() + timedelta(minutes=30)
+
+        def attempt(number, expires_at, **fields):
+            created = ExamAttempt.objects.create(
+                course_access=access, attempt_number=number, duration_minutes=60, total_questions=2,
+                question_ids=[question.pk for question in questions], **fields,
+            )
+            ExamAttempt.objects.filter(pk=created.pk).update(expires_at=expires_at)
+            return created
+
+        self.expired = attempt(1, past)
+        ExamAnswer.objects.create(attempt=self.expired, question=questions[0], selected_answer='A')
+        self.submitted = attempt(2, past, is_submitted=True, correct_answers=0, score_percentage=0)
+        self.running = attempt(3, future)
+
+    def _sweep(self):
+        call_command('finalize_expired_attempts', stdout=mock.Mock())
+
+    def test_expired_attempts_are_graded_once(self):
+        self._sweep()
+        self.expired.refresh_from_db()
+        self.assertTrue(self.expired.is_submitted)
+        self.assertEqual(self.expired.correct_answers, 1)
+        self.assertTrue(self.expired.is_passed)
+        submitted_at = self.expired.submitted_at
+
+        self._sweep()
+        self.expired.refresh_from_db()
+        self.assertEqual(self.expired.submitted_at, submitted_at)
+
+    def test_submitted_and_running_attempts_are_left_alone(self):
+        before = ExamAttempt.objects.filter(pk=self.submitted.pk).values().get()
+        self._sweep()
+        self.assertEqual(ExamAttempt.objects.filter(pk=self.submitted.pk).values().get(), before)
+        self.running.refresh_from_db()
+        self.assertFalse(self.running.is_submitted)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ScheduleItemDeleteTests(TestCase):
+    """Deleting schedule items reconciles each course once, on commit."""
+
+    def setUp(self):
+        self.course = make_course()
+        self.user = make_user()
+        access = CourseAccess.objects.create(user=self.user, course=self.course)
+        self.progress = CourseProgress.objects.create(course_access=access, watched_count=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            for number in range(3):
+                day = CourseScheduleDay.objects.create(course=self.course, title=f'Day {number + 1}', order=number)
+                for order in range(3):
+                    item = CourseScheduleItem.objects.create(day=day, title=f'Lesson {order + 1}', order=order)
+                    VideoPlay.objects.create(user=self.user, course_item=item)
+        CourseProgress.objects.filter(pk=self.progress.pk).update(watched_count=9)
+
+    def _delete(self, queryset):
+        reconcile = mock.patch.object(
+            progress_cache, 'reconcile_watched_counts', wraps=progress_cache.reconcile_watched_counts,
+        )
+        with reconcile as reconcile_counts, self.captureOnCommitCallbacks(execute=True):
+            queryset.delete()
+        reconcile_counts.assert_called_once_with(self.course.pk)
+        self.progress.refresh_from_db()
+        return self.progress.watched_count
+
+    def test_bulk_item_delete(self):
+        self.assertEqual(self._delete(CourseScheduleItem.objects.filter(order__lt=2)), 3)
+
+    def test_day_delete_cascades(self):
+        self.assertEqual(self._delete(CourseScheduleDay.objects.filter(order=0)), 6)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SECURE_SSL_REDIRECT=False)
+class AttemptQuestionSnapshotTests(TestCase):
+    """An attempt keeps the questions and option order it was started with."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        course = make_course()
+        self.exam = CourseExam.objects.create(
+            course=course, duration_minutes=60, passing_score=50, question_count=4,
+            randomize_questions=True, shuffle_options=True,
+        )
+        self.questions = make_questions(self.exam, 8, correct_answer='C')
+        CourseAccess.objects.create(user=self.user, course=course)
+        self.client.force_login(self.user)
+        self.client.get(reverse('exam_start', args=[course.pk]))
+        self.attempt = ExamAttempt.objects.get()
+
+    def _submit(self):
+        url = reverse('exam_submit', args=[self.attempt.pk])
+        return self.client.post(url, {}, content_type='application/json').json()
+
+    def _portal_questions(self):
+        data = self.client.get(reverse('exam_get_questions', args=[self.attempt.pk])).json()
+        return [question['id'] for question in data['questions']], data['option_order']
+
+    def test_same_seed_gives_same_selection(self):
+        from core.exam_views import _select_attempt_questions
+        first = _select_attempt_questions(self.exam, 1234)
+        self.assertEqual(_select_attempt_questions(self.exam, 1234), first)
+        self.assertEqual(len(first[0]), 4)
+        self.assertEqual(
+            _select_attempt_questions(self.exam, self.attempt.question_seed),
+            (self.attempt.question_ids, self.attempt.option_order),
+        )
+
+    def test_deactivated_question_stays_in_attempt(self):
+        question_ids, option_order = self._portal_questions()
+        self.assertEqual(question_ids, self.attempt.question_ids)
+
+        ExamQuestion.objects.filter(pk=question_ids[0]).update(is_active=False)
+        self.assertEqual(self._portal_questions(), (question_ids, option_order))
+
+        for question_id in question_ids:
+            ExamAnswer.objects.create(attempt=self.attempt, question_id=question_id, selected_answer='C')
+        result = self._submit()
+        self.assertEqual((result['correct_answers'], result['total_questions']), (4, 4))
+
+    def test_shuffled_options_grade_by_letter(self):
+        question_ids, option_order = self._portal_questions()
+        for question_id in question_ids:
+            self.assertEqual(sorted(option_order[str(question_id)]), ['A', 'B', 'C', 'D'])
+        # The portal shows the options in option_order but sends the letter of
+        # the chosen option: pick the correct one for the first two questions
+        # and whatever is displayed first, if it is not C, for the others
+        chosen = {}
+        for position, question_id in enumerate(question_ids):
+            displayed = option_order[str(question_id)]
+            chosen[question_id] = 'C' if position < 2 else next(letter for letter in displayed if letter != 'C')
+            ExamAnswer.objects.create(
+                attempt=self.attempt, question_id=question_id, selected_answer=chosen[question_id],
+            )
+        result = self._submit()
+        self.assertEqual(result['correct_answers'], 2)
+        graded = dict(ExamAnswer.objects.filter(attempt=self.attempt).values_list('question_id', 'is_correct'))
+        self.assertEqual(graded, {qid: answer == 'C' for qid, answer in chosen.items()})
+
+
+class RangedFileResponseTests(SimpleTestCase):
+    """Range, If-Range and ASGI streaming of protected files."""
+
+    SIZE = 2000
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        self.data = os.urandom(self.SIZE)
+        with os.fdopen(handle, 'wb') as file:
+            file.write(self.data)
+        self.addCleanup(os.remove, self.path)
+
+    def _get(self, **headers):
+        response = media_streaming.ranged_file_response(RequestFactory().get('/', headers=headers), self.path)
+        self.addCleanup(response.close)
+        return response
+
+    def test_suffix_range(self):
+        response = self._get(Range='bytes=-500')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 1500-1999/{self.SIZE}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[-500:])
+
+    def test_open_ended_range(self):
+        response = self._get(Range='bytes=1990-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(b''.join(response.streaming_content), self.data[1990:])
+
+    def test_unsatisfiable_range(self):
+        response = self._get(Range=f'bytes={self.SIZE}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{self.SIZE}')
+
+    def test_stale_if_range_sends_whole_file(self):
+        response = self._get(Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.data)
+
+        etag = response['ETag']
+        self.assertEqual(self._get(Range='bytes=0-9', **{'If-Range': etag}).status_code, 206)
+
+    @mock.patch.object(media_streaming, 'BLOCK_SIZE', 64)
+    async def test_asgi_range_is_iterated_asynchronously(self):
+        request = AsyncRequestFactory().get('/', headers={'Range': 'bytes=100-399'})
+        response = media_streaming.ranged_file_response(request, self.path)
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        response.close()
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(b''.join(chunks), self.data[100:400])
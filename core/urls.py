@@ -13,6 +13,8 @@ urlpatterns = [
     path('course/<slug:slug>/brochure/', views.download_brochure, name='download_brochure'),
     path('course/<slug:slug>/', views.course_detail, name='course_detail'),
     # Video play tracking endpoints (DB-driven progress)
+    path('course/<int:course_id>/video/<int:item_id>/stream/', views.stream_course_video, name='stream_course_video'),
+    path('course/<int:course_id>/video/<int:item_id>/hls/<path:name>', views.course_video_hls, name='course_video_hls'),
     path('course/<int:course_id>/video/<int:item_id>/mark-watched/', views.mark_video_watched, name='mark_video_watched'),
     path('course/<int:course_id>/check-completion/', views.check_course_completion, name='check_course_completion'),
     path('signup/', views.signup_view, name='signup'),
@@ -30,6 +32,9 @@ urlpatterns = [
     path('testimonials/', views.testimonials, name='testimonials'),
     # Dev-only debug endpoint to inspect Razorpay settings during a browser session
     path('payment-debug/', views.payment_debug, name='payment_debug'),
+    path('payments/razorpay/webhook/', views.razorpay_webhook, name='razorpay_webhook'),
+    # Staff-only: cache hit/miss counters of the worker serving the request
+    path('internal/cache-metrics/', views.cache_metrics, name='cache_metrics'),
     
     # Exam system URLs
     path('course/<int:course_id>/exam/check-eligibility/', exam_views.exam_check_eligibility, name='exam_check_eligibility'),
@@ -37,7 +42,10 @@ urlpatterns = [
     path('exam/<int:attempt_id>/', exam_views.exam_portal, name='exam_portal'),
     path('exam/<int:attempt_id>/get-questions/', exam_views.exam_get_questions, name='exam_get_questions'),
     path('exam/<int:attempt_id>/time-left/', exam_views.exam_time_left, name='exam_time_left'),
+    path('exam/<int:attempt_id>/clock/', exam_views.exam_clock, name='exam_clock'),
+    path('exam/<int:attempt_id>/events/', exam_views.exam_events_stream, name='exam_events_stream'),
     path('exam/<int:attempt_id>/save-answer/', exam_views.exam_save_answer, name='exam_save_answer'),
+    path('exam/<int:attempt_id>/save-answers/', exam_views.exam_save_answers, name='exam_save_answers'),
     path('exam/<int:attempt_id>/record-violation/', exam_views.exam_record_violation, name='exam_record_violation'),
     path('exam/<int:attempt_id>/submit/', exam_views.exam_submit, name='exam_submit'),
     path('exam/<int:attempt_id>/results/', exam_views.exam_results, name='exam_results'),
@@ -0,0 +1,194 @@
+"""
+Duration and poster frames for uploaded lecture videos.
+
+When an item gets a new `video_file` (see `core.signals`) a small thread
+pool reads the video's length into `duration_seconds` and, when the item has
+no thumbnail, grabs a frame from early in the video and stores it resized
+with Pillow. A duration or thumbnail entered by an admin still wins (see
+`CourseScheduleItem.duration_label`).
+
+The length of MP4/MOV uploads is read straight from the `mvhd` header box,
+which takes a few small reads and needs no external tools; other containers
+and poster frames need ffmpeg (see `core.video_packaging.ffmpeg_binary`)
+and are skipped without it. `extract_video_metadata` backfills existing
+uploads.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import io
+import logging
+import os
+import struct
+import subprocess
+
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from .cache import invalidate_tags
+from . import image_variants, page_cache, video_packaging
+
+logger = logging.getLogger(__name__)
+
+# Poster frames are scaled down to fit this box
+THUMBNAIL_SIZE = (480, 270)
+THUMBNAIL_QUALITY = 82
+# Take the frame this far in (capped), past intros that fade from black
+POSTER_FRACTION = 0.1
+POSTER_MAX_SECONDS = 10
+
+_extraction = ThreadPoolExecutor(max_workers=2, thread_name_prefix='video-metadata')
+
+
+def _boxes(handle, start, end):
+    """(type, payload offset, payload end) of the ISO-BMFF boxes between two offsets."""
+    offset = start
+    while offset + 8 <= end:
+        handle.seek(offset)
+        size, kind = struct.unpack('>I4s', handle.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', handle.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield kind, offset + header, offset + size
+        offset += size
+
+
+def mp4_duration(path):
+    """Length in seconds from an MP4/MOV movie header, or None if there is none."""
+    with open(path, 'rb') as handle:
+        end = os.fstat(handle.fileno()).st_size
+        for kind, start, stop in _boxes(handle, 0, end):
+            if kind != b'moov':
+                continue
+            for inner, payload, _ in _boxes(handle, start, stop):
+                if inner != b'mvhd':
+                    continue
+                handle.seek(payload)
+                version = handle.read(4)[0]
+                if version == 1:
+                    timescale, duration = struct.unpack('>16xIQ', handle.read(28))
+                else:
+                    timescale, duration = struct.unpack('>8xII', handle.read(16))
+                return duration / timescale if timescale else None
+    return None
+
+
+def read_duration(path, ffmpeg=None):
+    """Video length in seconds, or None when it cannot be determined."""
+    try:
+        seconds = mp4_duration(path)
+    except (OSError, struct.error, IndexError):
+        seconds = None
+    if seconds is None and ffmpeg:
+        try:
+            seconds = video_packaging.probe(ffmpeg, path)['duration']
+        except Exception:
+            seconds = None
+    return seconds
+
+
+def poster_frame(ffmpeg, path, seconds):
+    """JPEG bytes of a frame `seconds` into the video, fit into THUMBNAIL_SIZE."""
+    from PIL import Image
+
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-nostdin', '-loglevel', 'error', '-ss', f'{seconds:.2f}', '-i', path,
+         '-frames:v', '1', '-f', 'image2pipe', '-c:v', 'png', '-'],
+        capture_output=True, timeout=120,
+    )
+    if result.returncode != 0 or not result.stdout:
+        return None
+    with Image.open(io.BytesIO(result.stdout)) as image:
+        image = image.convert('RGB')
+        image.thumbnail(THUMBNAIL_SIZE, Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def format_duration(seconds):
+    """`12:34` or `1:02:03` for a length in seconds."""
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{secs:02d}' if hours else f'{minutes}:{secs:02d}'
+
+
+def format_total(seconds):
+    """`3h 05m`, `42m` or `40s` for the total length of a course or day."""
+    if seconds < 60:
+        return f'{int(round(seconds))}s'
+    minutes = int(round(seconds / 60))
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h {minutes:02d}m' if hours else f'{minutes}m'
+
+
+def extract_item(item_pk):
+    """Read the duration and poster frame of an item's video; returns the fields updated."""
+    from .models import CourseScheduleItem
+    item = CourseScheduleItem.objects.select_related('day').filter(pk=item_pk).first()
+    if item is None or not item.video_file:
+        return {}
+    video_name = item.video_file.name
+    try:
+        path = item.video_file.path
+    except NotImplementedError:
+        return {}
+    if not os.path.exists(path):
+        return {}
+
+    ffmpeg = video_packaging.ffmpeg_binary()
+    seconds = read_duration(path, ffmpeg)
+    fields = {}
+    if seconds is not None:
+        fields['duration_seconds'] = int(round(seconds))
+    if not item.thumbnail and ffmpeg:
+        offset = min(seconds * POSTER_FRACTION, POSTER_MAX_SECONDS) if seconds else 0
+        image = poster_frame(ffmpeg, path, offset) or (offset and poster_frame(ffmpeg, path, 0))
+        if image:
+            stem = os.path.splitext(os.path.basename(video_name))[0]
+            name = item.thumbnail.field.generate_filename(item, f'{stem}.jpg')
+            fields['thumbnail'] = item.thumbnail.storage.save(name, ContentFile(image))
+    if not fields:
+        return {}
+    # Only if the upload was not replaced meanwhile; a bare update keeps the
+    # save signals (and another extraction) out of it
+    updated = CourseScheduleItem.objects.filter(pk=item_pk, video_file=video_name).update(**fields)
+    if not updated:
+        if 'thumbnail' in fields:
+            item.thumbnail.storage.delete(fields['thumbnail'])
+        return {}
+    tags = page_cache.course_page_tags(pk=item.day.course_id)
+    invalidate_tags(*tags)
+    if 'thumbnail' in fields:
+        item.thumbnail.name = fields['thumbnail']
+        image_variants.schedule(item.thumbnail, tags)
+    return fields
+
+
+def _run_extraction(item_pk):
+    close_old_connections()
+    try:
+        extract_item(item_pk)
+    except Exception:
+        logger.exception(f'Video metadata extraction failed for item {item_pk}')
+    finally:
+        close_old_connections()
+
+
+def enqueue(item_pk):
+    """Extract an item's video metadata in the background."""
+    _extraction.submit(_run_extraction, item_pk)
+
+
+def queue_item(item):
+    """Extract metadata for an item's new upload after commit, or forget the old duration."""
+    if not item.video_file:
+        type(item).objects.filter(pk=item.pk).update(duration_seconds=None)
+        item.duration_seconds = None
+        return
+    item_pk = item.pk
+    transaction.on_commit(lambda: enqueue(item_pk))
@@ -0,0 +1,277 @@
+"""
+HLS packaging of uploaded lecture videos.
+
+Saving a `CourseScheduleItem` with a new `video_file` only marks it
+`pending` (see `core.signals`); the web workers never encode. The
+`package_videos` command, run by the videos worker (render.yaml, Procfile),
+picks pending items up and runs one ffmpeg pass per item that decodes the
+upload once and encodes every rendition in `RENDITIONS` no taller than the
+source, as 6-second HLS segments:
+
+    course_videos/lecture.mp4
+    course_videos/lecture_hls/master.m3u8
+    course_videos/lecture_hls/360p/index.m3u8, seg_00000.ts, ...
+    course_videos/lecture_hls/720p/...
+
+Status and progress are recorded on the item (`hls_status`, `hls_progress`)
+and the course page switches to the master playlist once it is `ready`;
+until then, and for browsers without HLS support, the original file is
+streamed as before. Without an ffmpeg binary (FFMPEG_BINARY or `ffmpeg` on
+PATH) or with remote storage the item is marked `skipped` and nothing else
+happens. The pending status is the queue, so restarts lose nothing; items
+left `processing` by a worker that died are retried once they go stale.
+"""
+
+import logging
+import os
+import re
+import shutil
+import subprocess
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .cache import invalidate_tags
+from . import page_cache
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+PROCESSING = 'processing'
+READY = 'ready'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+# (height, video kbit/s, audio kbit/s), lowest first
+RENDITIONS = (
+    (360, 800, 96),
+    (540, 1400, 128),
+    (720, 2800, 128),
+    (1080, 5000, 160),
+)
+SEGMENT_SECONDS = 6
+MASTER_PLAYLIST = 'master.m3u8'
+
+# Seconds between progress writes while ffmpeg runs
+PROGRESS_INTERVAL = 2
+
+_DURATION_RE = re.compile(r'Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)')
+_VIDEO_RE = re.compile(r'Stream #\d+:\d+.*?: Video: .*?(\d{2,5})x(\d{2,5})')
+_AUDIO_RE = re.compile(r'Stream #\d+:\d+.*?: Audio: ')
+
+class PackagingSkipped(Exception):
+    pass
+
+
+def ffmpeg_binary():
+    """Path of the ffmpeg executable, or None when it is not installed."""
+    configured = getattr(settings, 'FFMPEG_BINARY', '')
+    if configured:
+        return configured if os.access(configured, os.X_OK) else None
+    return shutil.which('ffmpeg')
+
+
+def probe(ffmpeg, path):
+    """Duration (seconds), video height and whether `path` has audio.
+
+    Read from the stream summary ffmpeg prints for an input, so no separate
+    ffprobe binary is needed.
+    """
+    result = subprocess.run(
+        [ffmpeg, '-hide_banner', '-nostdin', '-i', path],
+        capture_output=True, text=True, errors='replace', timeout=60,
+    )
+    info = result.stderr
+    duration = _DURATION_RE.search(info)
+    video = _VIDEO_RE.search(info)
+    if video is None:
+        raise PackagingSkipped('no video stream found')
+    seconds = None
+    if duration:
+        hours, minutes, secs = duration.groups()
+        seconds = int(hours) * 3600 + int(minutes) * 60 + float(secs)
+    return {
+        'duration': seconds,
+        'height': int(video.group(2)),
+        'has_audio': bool(_AUDIO_RE.search(info)),
+    }
+
+
+def renditions_for(height):
+    """Renditions no taller than the source; a short source gets one at its own height."""
+    chosen = [r for r in RENDITIONS if r[0] <= height]
+    if not chosen:
+        _, video_kbps, audio_kbps = RENDITIONS[0]
+        chosen = [(height - height % 2, video_kbps, audio_kbps)]
+    return chosen
+
+
+def hls_dir_name(video_name):
+    """Storage name of the HLS directory next to an uploaded video."""
+    return os.path.splitext(video_name)[0] + '_hls'
+
+
+def build_command(ffmpeg, source, output_dir, renditions, has_audio):
+    """ffmpeg arguments encoding all renditions in one pass."""
+    count = len(renditions)
+    graph = [f'[0:v]split={count}' + ''.join(f'[s{i}]' for i in range(count))]
+    graph += [f'[s{i}]scale=-2:{height}[v{i}]' for i, (height, _, _) in enumerate(renditions)]
+    command = [
+        ffmpeg, '-hide_banner', '-nostdin', '-y', '-loglevel', 'error',
+        '-i', source, '-filter_complex', ';'.join(graph),
+    ]
+    stream_map = []
+    for i, (height, video_kbps, audio_kbps) in enumerate(renditions):
+        command += [
+            '-map', f'[v{i}]', f'-c:v:{i}', 'libx264', f'-b:v:{i}', f'{video_kbps}k',
+            f'-maxrate:v:{i}', f'{video_kbps * 107 // 100}k', f'-bufsize:v:{i}', f'{video_kbps * 3 // 2}k',
+        ]
+        entry = f'v:{i}'
+        if has_audio:
+            command += ['-map', '0:a:0', f'-c:a:{i}', 'aac', f'-b:a:{i}', f'{audio_kbps}k']
+            entry += f',a:{i}'
+        stream_map.append(f'{entry},name:{height}p')
+    command += [
+        '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        # Keyframes on segment boundaries so every rendition switches cleanly
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})', '-sc_threshold', '0',
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output_dir, '%v', 'seg_%05d.ts'),
+        '-master_pl_name', MASTER_PLAYLIST,
+        '-var_stream_map', ' '.join(stream_map),
+        '-progress', 'pipe:1', '-nostats',
+        os.path.join(output_dir, '%v', 'index.m3u8'),
+    ]
+    return command
+
+
+def _update(item_pk, **fields):
+    from .models import CourseScheduleItem
+    CourseScheduleItem.objects.filter(pk=item_pk).update(**fields, updated_at=timezone.now())
+
+
+def _run_ffmpeg(command, item_pk, duration):
+    """Run ffmpeg, recording progress from its `-progress` output."""
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, errors='replace',
+    )
+    last_write, last_percent = 0.0, 0
+    for line in process.stdout:
+        key, _, value = line.strip().partition('=')
+        if key != 'out_time_us' or not duration or not value.isdigit():
+            continue
+        percent = min(99, int(int(value) / 1e6 / duration * 100))
+        now = time.monotonic()
+        if percent > last_percent and now - last_write >= PROGRESS_INTERVAL:
+            _update(item_pk, hls_progress=percent)
+            last_write, last_percent = now, percent
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise RuntimeError(stderr.strip()[-500:] or f'ffmpeg exited with {process.returncode}')
+
+
+def _swap_into_place(built, final):
+    """Replace `final` with the freshly built directory."""
+    previous = None
+    if os.path.exists(final):
+        previous = f'{final}.old-{uuid.uuid4().hex[:8]}'
+        os.rename(final, previous)
+    os.rename(built, final)
+    if previous:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def package_item(item_pk):
+    """Package one item's video; returns the resulting status, or None if there was nothing to do."""
+    from .models import CourseScheduleItem
+    item = CourseScheduleItem.objects.select_related('day').filter(pk=item_pk).first()
+    if item is None or not item.video_file:
+        return None
+    video_name = item.video_file.name
+    ffmpeg = ffmpeg_binary()
+    try:
+        if ffmpeg is None:
+            raise PackagingSkipped('ffmpeg not found')
+        try:
+            source = item.video_file.path
+        except NotImplementedError:
+            raise PackagingSkipped('video is not on local storage')
+        if not os.path.exists(source):
+            raise PackagingSkipped('video file missing')
+        info = probe(ffmpeg, source)
+    except PackagingSkipped as e:
+        _update(item_pk, hls_status=SKIPPED, hls_progress=0, hls_error=str(e))
+        logger.info(f'HLS packaging of item {item_pk} skipped: {e}')
+        return SKIPPED
+
+    _update(item_pk, hls_status=PROCESSING, hls_progress=0, hls_error='')
+    dir_name = hls_dir_name(video_name)
+    final_dir = item.video_file.storage.path(dir_name)
+    work_dir = f'{final_dir}.tmp-{uuid.uuid4().hex[:8]}'
+    renditions = renditions_for(info['height'])
+    started = time.perf_counter()
+    try:
+        for height, _, _ in renditions:
+            os.makedirs(os.path.join(work_dir, f'{height}p'), exist_ok=True)
+        command = build_command(ffmpeg, source, work_dir, renditions, info['has_audio'])
+        _run_ffmpeg(command, item_pk, info['duration'])
+        # The upload may have been replaced while ffmpeg ran; its own job follows
+        if not CourseScheduleItem.objects.filter(pk=item_pk, video_file=video_name).exists():
+            shutil.rmtree(work_dir, ignore_errors=True)
+            return None
+        _swap_into_place(work_dir, final_dir)
+    except Exception as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        _update(item_pk, hls_status=FAILED, hls_error=str(e)[:1000])
+        logger.error(f'HLS packaging of item {item_pk} failed: {str(e)}')
+        return FAILED
+
+    _update(item_pk, hls_status=READY, hls_progress=100,
+            hls_manifest=f'{dir_name}/{MASTER_PLAYLIST}', hls_error='')
+    invalidate_tags(*page_cache.course_page_tags(pk=item.day.course_id))
+    logger.info(
+        f'Packaged item {item_pk} as HLS ({", ".join(f"{r[0]}p" for r in renditions)}) '
+        f'in {time.perf_counter() - started:.1f}s'
+    )
+    return READY
+
+
+def remove_packaged(storage, video_name):
+    """Delete the HLS output of a replaced or removed upload."""
+    try:
+        shutil.rmtree(storage.path(hls_dir_name(video_name)), ignore_errors=True)
+    except NotImplementedError:
+        pass
+
+
+def mark_pending(item_pks):
+    """Mark items pending for their current upload, ahead of packaging them again."""
+    from .models import CourseScheduleItem
+    return (
+        CourseScheduleItem.objects.filter(pk__in=item_pks).exclude(video_file='').exclude(video_file=None)
+        .update(hls_source=F('video_file'), hls_status=PENDING, hls_progress=0, hls_error='',
+                updated_at=timezone.now())
+    )
+
+
+def queue_item(item):
+    """Mark an item's current upload as pending for the `package_videos` worker.
+
+    Called for every save; does nothing when the upload was already queued.
+    """
+    video_name = item.video_file.name if item.video_file else ''
+    if video_name == item.hls_source:
+        return False
+    fields = {'hls_source': video_name, 'hls_progress': 0, 'hls_manifest': '', 'hls_error': '',
+              'hls_status': PENDING if video_name else ''}
+    type(item).objects.filter(pk=item.pk).update(**fields)
+    previous = item.hls_source
+    for name, value in fields.items():
+        setattr(item, name, value)
+    if previous:
+        transaction.on_commit(lambda: remove_packaged(item.video_file.storage, previous))
+    return True
@@ -3,28 +3,41 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
-from django.http import FileResponse, JsonResponse
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
 from django.conf import settings as django_settings
-from django.views.decorators.csrf import csrf_exempt
-from django.core.exceptions import ImproperlyConfigured
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
 from django.urls import reverse
-from django.db.models import Count
+from django.utils._os import safe_join
+from django.db.models import Count, Exists, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 try:
     import razorpay
 except Exception:
     razorpay = None
 import json
 import logging
+import os
 
 # Import core models used by views
 from .models import (
-    AboutPage, AboutSection, Course, CourseBrochure, CourseScheduleDay,
-    CourseScheduleItem, CourseAccess, CourseProgress, CoursePayment,
-    CourseExam, ExamAttempt, Certificate, ExamCertificate
+    AboutSection, Course, CourseBrochure, CourseScheduleDay,
+    CourseScheduleItem, CourseAccess, CoursePayment, CourseProgress,
+    CourseExam, ExamAttempt, ExamQuestion, Certificate, ExamCertificate,
+    CourseInstructor, CourseLocalInstructor, CourseOverview, CourseSkill, CourseTool,
 )
 
 # Also import VideoPlay model for play tracking
 from .models import VideoPlay
+from .progress_cache import (
+    access_total_items, access_watched_items, get_active_item_count, get_or_create_progress, record_first_play,
+)
+from . import cache as shared_cache, media_streaming, page_cache, payment_gateway, payments, singletons, video_metadata
+from .conditional import ABOUT_TAG, conditional_page
+from .home_cache import HOME_TAG, get_home_context
 
 # Brochure downloads are stored in a separate module
 from .models_brochure import BrochureDownload
@@ -37,9 +50,10 @@ logger = logging.getLogger(__name__)
 def settings(request):
     return render(request, 'settings.html')
 
+@conditional_page(lambda: ABOUT_TAG)
 def about(request):
     """Render the about page with dynamic AboutPage and AboutSection content."""
-    about_page = AboutPage.objects.filter(is_active=True).order_by('-updated_at').first()
+    about_page = singletons.get_singleton('about_page')
     about_sections = AboutSection.objects.filter(is_active=True).order_by('order')
 
     context = {
@@ -62,9 +76,10 @@ def team(request):
     return render(request, 'team.html')
 
 
+@conditional_page(lambda: HOME_TAG)
 def home(request):
-    """Render the home page."""
-    return render(request, 'home.html')
+    """Render the home page from the cached, admin-managed content (see `core.home_cache`)."""
+    return render(request, 'home.html', get_home_context())
 
 
 def signup_view(request):
@@ -142,36 +157,40 @@ def my_purchase(request):
     """Render the My Purchase page with the user's active course accesses.
 
     The template expects `course_accesses` (iterable of access objects) and
-    an `active_tab` string. Historically `CourseAccess.progress` was a numeric
-    value in templates; the model property now returns a `CourseProgress`
-    object. To keep the template unchanged we attach a numeric `progress`
-    attribute to each access instance (shadowing the property) which holds
-    the percentage value.
+    an `active_tab` string. `CourseAccess.progress` is a property that
+    returns (and may create) a `CourseProgress` object, so each access gets a
+    numeric `progress_value` attribute holding the percentage instead.
+
+    Progress is read-only here: every access is annotated with its active and
+    watched item counts in the same query, and missing `CourseProgress` rows
+    are created together in one bulk insert.
     """
     # Query active accesses for the logged-in user
-    accesses = CourseAccess.objects.filter(user=request.user, is_active=True).select_related('course', 'payment')
+    accesses = list(
+        CourseAccess.objects.filter(user=request.user, is_active=True)
+        .select_related('course__purchase_card', 'payment')
+        .annotate(
+            total_items=access_total_items(),
+            watched_items=access_watched_items(),
+            has_progress=Exists(CourseProgress.objects.filter(course_access=OuterRef('pk'))),
+        )
+    )
+
+    missing = [access for access in accesses if not access.has_progress]
+    if missing:
+        CourseProgress.objects.bulk_create(
+            [CourseProgress(course_access=access, watched_count=access.watched_items) for access in missing],
+            ignore_conflicts=True,
+        )
 
     course_accesses = []
     for access in accesses:
-        # Ensure a CourseProgress exists and is refreshed if possible
-        try:
-            prog = access.progress  # this returns CourseProgress object
-            try:
-                prog.update_progress()
-            except Exception:
-                # non-fatal: keep whatever progress value exists
-                pass
-            progress_value = float(prog.progress_percentage) if hasattr(prog, 'progress_percentage') else 0.0
-        except Exception:
-            progress_value = 0.0
+        total = access.total_items
+        watched = min(access.watched_items, total)
+        progress_value = round(watched / total * 100, 2) if total > 0 else 0.0
 
-        # Attach numeric progress to the instance so the template can use
-        # `access.progress` as before (this shadows the property at instance level)
-        try:
-            setattr(access, 'progress', progress_value)
-        except Exception:
-            # If we cannot set attribute for some reason, ignore and continue
-            pass
+        # Attach numeric progress for the template (`access.progress_value`)
+        access.progress_value = progress_value
 
         course_accesses.append(access)
 
@@ -235,136 +254,219 @@ def logout_view(request):
     messages.success(request, 'You have been successfully logged out.')
     return redirect('login')
 
-@login_required
-def download_brochure(request, course_slug):
+def download_brochure(request, slug):
     """
     Handle downloading of course brochure with user information tracking.
+
+    The brochure form is the lead capture, so visitors do not need to log in;
+    the file itself is sent by `protected_file_response`.
     """
-    course = get_object_or_404(Course, slug=course_slug, is_active=True)
+    course = get_object_or_404(Course, slug=slug, is_active=True)
     brochure = get_object_or_404(CourseBrochure, course=course, is_active=True)
     
     if request.method == 'POST' and request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+        lead = {field: (request.POST.get(field) or '').strip() for field in ('user_name', 'email', 'phone')}
+        if not all(lead.values()):
+            return JsonResponse({'error': 'Please fill out the form to download the brochure.'}, status=400)
         try:
             # Create brochure download record
             BrochureDownload.objects.create(
-                user_name=request.POST.get('user_name'),
-                email=request.POST.get('email'),
-                phone=request.POST.get('phone'),
+                **lead,
                 course=course,
                 brochure=brochure,
                 ip_address=request.META.get('REMOTE_ADDR')
             )
-            
-            return FileResponse(brochure.brochure_file, as_attachment=True, 
-                             filename=f"{course.name}_brochure.pdf")
         except Exception as e:
             logger.error(f"Brochure download error: {str(e)}")
             return JsonResponse({'error': 'Failed to process download'}, status=500)
+        return media_streaming.protected_file_response(
+            request, brochure.brochure_file, filename=f"{course.name}_brochure.pdf", as_attachment=True
+        )
     else:
         messages.error(request, "Please fill out the form to download the brochure.")
-        return redirect('course_detail', slug=course_slug)
+        return redirect('course_detail', slug=slug)
 
-def course_detail(request, slug):
-    """
-    Display the details of a specific course.
+def _course_detail_queryset():
+    """Course queryset with everything the course content sections render.
+
+    Related rows come from `Prefetch` querysets that are already filtered and
+    ordered, so the query count does not grow with the number of schedule days.
     """
-    course = get_object_or_404(Course, slug=slug, is_active=True)
-    related_courses = Course.objects.filter(
-        category=course.category,
-        is_active=True
-    ).exclude(id=course.id)[:3]  # Get 3 related courses
-    # Prepare instructor lists for the template to avoid calling queryset methods
-    # inside the template (TemplateLanguage cannot parse chained calls with args).
-    local_instructors = course.local_instructors.filter(is_active=True).order_by('order')
-    course_instructors = course.courseinstructor_set.select_related('instructor').order_by('order')
+    active_questions = (
+        ExamQuestion.objects.filter(exam__course=OuterRef('pk'), is_active=True)
+        .order_by()
+        .values('exam')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return (
+        Course.objects.select_related('exam')
+        .annotate(active_exam_questions=Coalesce(Subquery(active_questions), 0))
+        .prefetch_related(
+            *_course_instructor_prefetches(),
+            'features',
+            Prefetch('skills', queryset=CourseSkill.objects.filter(is_active=True).order_by('order'),
+                     to_attr='active_skills'),
+            Prefetch('tools', queryset=CourseTool.objects.filter(is_active=True).order_by('order'),
+                     to_attr='active_tools'),
+            Prefetch('overviews', queryset=CourseOverview.objects.filter(is_active=True).order_by('order'),
+                     to_attr='active_overviews'),
+            Prefetch('brochures', queryset=CourseBrochure.objects.filter(is_active=True).order_by('pk'),
+                     to_attr='active_brochures'),
+            Prefetch('schedule_days',
+                     queryset=CourseScheduleDay.objects.filter(is_active=True).order_by('order', 'id').prefetch_related(
+                         Prefetch('items',
+                                  queryset=CourseScheduleItem.objects.filter(is_active=True).order_by('order'),
+                                  to_attr='active_items'),
+                     ),
+                     to_attr='active_schedule_days'),
+        )
+    )
 
+
+def _course_instructor_prefetches():
+    """Prefetches for the instructor block of the course hero."""
+    return (
+        Prefetch('local_instructors',
+                 queryset=CourseLocalInstructor.objects.filter(is_active=True).order_by('order'),
+                 to_attr='active_local_instructors'),
+        Prefetch('courseinstructor_set',
+                 queryset=CourseInstructor.objects.select_related('instructor').order_by('order'),
+                 to_attr='ordered_instructors'),
+    )
+
+
+def _render_course_sections(course, has_access, is_authenticated):
+    """Render the cacheable content sections of the course page.
+
+    Returns a dict with the HTML and whether the course has a schedule.
+    """
     # Get exam information if it exists
     try:
-        course_exam = CourseExam.objects.filter(course=course, is_active=True).first()
-        total_exam_questions = 0
-        exam_duration_minutes = 120  # default
-        if course_exam:
-            from .models import ExamQuestion
-            total_exam_questions = ExamQuestion.objects.filter(exam=course_exam, is_active=True).count()
-            exam_duration_minutes = course_exam.duration_minutes if hasattr(course_exam, 'duration_minutes') else 120
-    except Exception:
+        course_exam = course.exam if course.exam.is_active else None
+    except CourseExam.DoesNotExist:
         course_exam = None
-        total_exam_questions = 0
-        exam_duration_minutes = 120
+
+    # Build grouped schedule days to avoid duplicate day blocks when DB has multiple
+    # CourseScheduleDay rows with the same `order`. This merges their items for display.
+    grouped = []
+    last_order = None
+    for day in course.active_schedule_days:
+        if last_order is None or day.order != last_order:
+            # start a new group
+            grouped.append({
+                'title': day.title,
+                'order': day.order,
+                'items': list(day.active_items),
+            })
+            last_order = day.order
+        else:
+            # merge items into the previous group
+            grouped[-1]['items'].extend(day.active_items)
+
+    # Video lengths read at upload time; summed from the prefetched items and
+    # cached with the rendered sections
+    total_seconds = 0
+    for group in grouped:
+        seconds = sum(item.duration_seconds or 0 for item in group['items'])
+        group['duration'] = video_metadata.format_total(seconds) if seconds else ''
+        total_seconds += seconds
 
     context = {
         'course': course,
-        'related_courses': related_courses,
-        'local_instructors': local_instructors,
-        'course_instructors': course_instructors,
         'course_features': course.features.all(),
-        'course_skills': course.skills.filter(is_active=True).order_by('order'),
-        'course_tools': course.tools.filter(is_active=True).order_by('order'),
-        'course_overviews': course.overviews.filter(is_active=True).order_by('order'),
-        'brochure': CourseBrochure.objects.filter(course=course, is_active=True).first(),
+        'course_skills': course.active_skills,
+        'course_tools': course.active_tools,
+        'course_overviews': course.active_overviews,
+        'brochure': course.active_brochures[0] if course.active_brochures else None,
         'exam': course_exam,
-        'total_exam_questions': total_exam_questions,
-        'exam_duration_minutes': exam_duration_minutes,
+        'total_exam_questions': course.active_exam_questions if course_exam else 0,
+        'exam_duration_minutes': course_exam.duration_minutes if course_exam else 120,
+        'grouped_schedule_days': grouped,
+        'schedule_item_count': sum(len(group['items']) for group in grouped),
+        'schedule_total_duration': video_metadata.format_total(total_seconds) if total_seconds else '',
+        'has_access': has_access,
+        'is_authenticated': is_authenticated,
     }
+    return {
+        'html': render_to_string('course_detail_sections.html', context),
+        'has_schedule': bool(grouped),
+    }
+
+
+@ensure_csrf_cookie
+@conditional_page(lambda slug: page_cache.page_tag(slug))
+def course_detail(request, slug):
+    """
+    Display the details of a specific course.
+
+    Anonymous visitors are served a complete cached render. Logged-in users
+    get the cached content sections for their audience (see
+    `core.page_cache`) inside a fresh render of the user-specific hero and
+    navigation. Cache entries are keyed by a per-slug content version that
+    admin edits bump, and the view performs no writes. Anonymous revalidation
+    requests for an unchanged version get a 304 (see `core.conditional`).
+    """
+    version = page_cache.get_page_version(slug)
+    is_authenticated = request.user.is_authenticated
+    if not is_authenticated:
+        content = page_cache.get_page(slug, version)
+        if content is not None:
+            return HttpResponse(content)
+
     # Determine if the current logged-in user already has access to this course
     try:
         has_access = False
-        if request.user.is_authenticated:
-            has_access = CourseAccess.objects.filter(user=request.user, course=course, is_active=True).exists()
+        if is_authenticated:
+            has_access = CourseAccess.objects.filter(
+                user=request.user, course__slug=slug, course__is_active=True, is_active=True,
+            ).exists()
     except Exception:
         # If anything goes wrong while checking access, default to False
         has_access = False
 
-    context['has_access'] = has_access
-    
-    # We've disabled DB-driven per-video tracking for testing. Provide safe
-    # defaults so templates and other code paths don't break.
-    exam_eligible = False
-    exam_attempt = None
-    if request.user.is_authenticated and has_access:
-        try:
-            course_access = CourseAccess.objects.get(user=request.user, course=course, is_active=True)
-            # Keep progress data available but do not modify ready_for_exam here.
-            progress = course_access.progress
-            try:
-                progress.update_progress()
-            except Exception:
-                pass
-            # Do not compute/modify ready_for_exam based on removed VideoPlay records.
-        except (CourseAccess.DoesNotExist, Exception):
-            pass
+    if not is_authenticated:
+        variant = page_cache.VARIANT_ANONYMOUS
+    elif has_access:
+        variant = page_cache.VARIANT_ENROLLED
+    else:
+        variant = page_cache.VARIANT_BUYER
 
-    # Expose whether the congratulations container should be shown permanently.
-    # Since we've removed server-side per-video tracking, default to False.
-    context['show_congratulations'] = False
-    context['exam_eligible'] = exam_eligible
-    context['exam_attempt'] = exam_attempt
-    # Build grouped schedule days to avoid duplicate day blocks when DB has multiple
-    # CourseScheduleDay rows with the same `order`. This merges their items for display.
-    try:
-        from itertools import chain
-        schedule_days_qs = course.schedule_days.filter(is_active=True).order_by('order', 'id').prefetch_related('items')
-        grouped = []
-        last_order = None
-        for day in schedule_days_qs:
-            if last_order is None or day.order != last_order:
-                # start a new group
-                grouped.append({
-                    'title': day.title,
-                    'order': day.order,
-                    'items': list(day.items.filter(is_active=True).order_by('order'))
-                })
-                last_order = day.order
-            else:
-                # merge items into the previous group
-                grouped[-1]['items'].extend(list(day.items.filter(is_active=True).order_by('order')))
-
-        context['grouped_schedule_days'] = grouped
-    except Exception:
-        # Fallback to original queryset in case of any error
-        context['grouped_schedule_days'] = list(course.schedule_days.filter(is_active=True).order_by('order'))
+    sections = page_cache.get_sections(slug, version, variant)
+    if sections is None:
+        course = get_object_or_404(_course_detail_queryset(), slug=slug, is_active=True)
+        sections = _render_course_sections(course, has_access, is_authenticated)
+        page_cache.set_sections(slug, version, variant, sections)
+    else:
+        course = get_object_or_404(
+            Course.objects.prefetch_related(*_course_instructor_prefetches()), slug=slug, is_active=True,
+        )
 
-    return render(request, 'course_detail.html', context)
+    related_courses = Course.objects.filter(
+        category=course.category,
+        is_active=True
+    ).exclude(id=course.id)[:3]  # Get 3 related courses
+
+    context = {
+        'course': course,
+        'related_courses': related_courses,
+        # Prepare instructor lists for the template to avoid calling queryset
+        # methods inside the template
+        'local_instructors': course.active_local_instructors,
+        'course_instructors': course.ordered_instructors,
+        'course_sections': mark_safe(sections['html']),
+        'has_schedule': sections['has_schedule'],
+        'has_access': has_access,
+        # Per-video progress is tracked by the mark-watched / check-completion
+        # endpoints; the page itself only provides safe defaults.
+        'show_congratulations': False,
+        'exam_eligible': False,
+        'exam_attempt': None,
+    }
+    response = render(request, 'course_detail.html', context)
+    if not is_authenticated:
+        page_cache.set_page(slug, version, response.content)
+    return response
 
 
 def course_detail_by_id(request, course_id):
@@ -378,6 +480,84 @@ def course_detail_by_id(request, course_id):
     return redirect('course_detail', slug=course.slug)
 
 
+def _is_preview_day(day):
+    """The first active schedule day of a course is free to watch (as on the course page)."""
+    first_order = (
+        CourseScheduleDay.objects.filter(course_id=day.course_id, is_active=True)
+        .order_by('order').values_list('order', flat=True).first()
+    )
+    return day.is_active and day.order == first_order
+
+
+def _watchable_item(request, course_id, item_id):
+    """The schedule item whose uploaded video is requested, or None when the user may not watch it.
+
+    Items of the first (preview) day can be watched by anyone; everything else
+    needs an active `CourseAccess` (staff can watch all).
+    """
+    course_item = get_object_or_404(
+        CourseScheduleItem.objects.select_related('day'),
+        id=item_id, day__course_id=course_id, day__course__is_active=True, is_active=True,
+    )
+    if not course_item.video_file:
+        raise Http404('No video file for this item')
+
+    user = request.user
+    allowed = (
+        (user.is_authenticated and user.is_staff)
+        or _is_preview_day(course_item.day)
+        or (user.is_authenticated
+            and CourseAccess.objects.filter(user=user, course_id=course_id, is_active=True).exists())
+    )
+    return course_item if allowed else None
+
+
+def stream_course_video(request, course_id, item_id):
+    """
+    Stream an uploaded lecture video with HTTP Range support.
+
+    The bytes are sent by the front proxy or, locally, range by range; see
+    `core.media_streaming`.
+    """
+    course_item = _watchable_item(request, course_id, item_id)
+    if course_item is None:
+        return HttpResponseForbidden('You do not have access to this video')
+
+    response = media_streaming.protected_file_response(request, course_item.video_file)
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
+HLS_CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+def course_video_hls(request, course_id, item_id, name):
+    """
+    Serve the HLS playlists and segments of a packaged lecture video.
+
+    Players resolve the playlists' relative URIs against this view, so every
+    segment goes through the same access check as the original file.
+    """
+    course_item = _watchable_item(request, course_id, item_id)
+    if course_item is None:
+        return HttpResponseForbidden('You do not have access to this video')
+    content_type = HLS_CONTENT_TYPES.get(os.path.splitext(name)[1])
+    if course_item.hls_status != 'ready' or content_type is None:
+        raise Http404('No HLS rendition for this item')
+
+    storage = course_item.video_file.storage
+    try:
+        path = safe_join(storage.path(os.path.dirname(course_item.hls_manifest)), name)
+    except (NotImplementedError, SuspiciousFileOperation):
+        raise Http404('No HLS rendition for this item')
+    response = media_streaming.protected_path_response(request, path, content_type=content_type)
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
+
+
 @login_required
 def mark_video_watched(request, course_id, item_id):
     """
@@ -385,8 +565,9 @@ def mark_video_watched(request, course_id, item_id):
 
     This endpoint is authoritative: it records a `VideoPlay` row (if not
     already present), recalculates progress for the user's `CourseProgress`,
-    sets `ready_for_exam` when the user has played all course videos, and
-    returns JSON with progress counts and flags.
+    sets `ready_for_exam` and records completion (issuing the course
+    certificate) when the user has played all course videos, and returns
+    JSON with progress counts and flags.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Invalid request method'}, status=400)
@@ -395,8 +576,11 @@ def mark_video_watched(request, course_id, item_id):
         course_id = int(course_id)
         item_id = int(item_id)
 
-        course = get_object_or_404(Course, id=course_id, is_active=True)
-        course_item = get_object_or_404(CourseScheduleItem, id=item_id, day__course=course, is_active=True)
+        course_item = get_object_or_404(
+            CourseScheduleItem.objects.select_related('day__course'),
+            id=item_id, day__course_id=course_id, day__course__is_active=True, is_active=True,
+        )
+        course = course_item.day.course
 
         # Ensure user has access to the course
         course_access = CourseAccess.objects.filter(user=request.user, course=course, is_active=True).first()
@@ -404,47 +588,43 @@ def mark_video_watched(request, course_id, item_id):
             return JsonResponse({'error': 'User does not have access to this course'}, status=403)
 
         # Ensure progress exists
-        progress, _ = CourseProgress.objects.get_or_create(course_access=course_access)
+        progress = get_or_create_progress(course_access)
 
-        # Create VideoPlay record if not exists
+        # Create VideoPlay record if not exists; the first play bumps the
+        # progress counter atomically instead of recounting every play
+        first_play = False
         try:
-            VideoPlay.objects.get_or_create(user=request.user, course_item=course_item)
+            first_play = record_first_play(progress, request.user, course_item)
         except Exception:
             # If VideoPlay fails for some reason, continue gracefully
             pass
 
-        # Calculate all active course video IDs
-        all_course_videos = list(CourseScheduleItem.objects.filter(day__course=course, is_active=True).values_list('id', flat=True))
-        course_video_set = set(all_course_videos)
-
-        # Watched IDs come from VideoPlay rows
-        watched_ids_qs = VideoPlay.objects.filter(user=request.user, course_item__day__course=course).values_list('course_item', flat=True)
-        try:
-            watched_set = set(int(x) for x in watched_ids_qs)
-        except Exception:
-            watched_set = set()
-
-        watched_in_course = course_video_set.intersection(watched_set)
-        completed_count = len(watched_in_course)
-        total_items = len(course_video_set)
+        total_items = get_active_item_count(course.id)
+        completed_count = min(progress.watched_count, total_items)
 
         all_watched = (total_items > 0) and (completed_count == total_items)
         progress_percentage = (completed_count / total_items * 100) if total_items > 0 else 0
 
+        # Percentage and completion move with watched_count
+        update_fields = progress.update_progress(total_items)
+        just_completed = 'is_completed' in update_fields
         # Persist ready_for_exam when all videos are watched
         if all_watched and not progress.ready_for_exam:
             from django.utils import timezone
             progress.ready_for_exam = True
             progress.ready_for_exam_date = timezone.now()
-            progress.save()
+            update_fields += ['ready_for_exam', 'ready_for_exam_date']
 
-        # Keep completed_lessons list for backwards compatibility
-        try:
-            if item_id not in progress.completed_lessons:
-                progress.completed_lessons.append(item_id)
-                progress.save()
-        except Exception:
-            pass
+        # Keep completed_lessons list for backwards compatibility; it can only
+        # change on the first play of an item
+        if first_play and item_id not in progress.completed_lessons:
+            progress.completed_lessons.append(item_id)
+            update_fields.append('completed_lessons')
+
+        if update_fields:
+            progress.save(update_fields=update_fields)
+        if just_completed:
+            progress.generate_certificate()
 
         # Determine exam eligibility
         exam_eligible = False
@@ -483,8 +663,8 @@ def mark_video_watched(request, course_id, item_id):
                 'course_id': course_id,
                 'item_id': item_id,
                 'user': str(request.user),
-                'all_course_videos': all_course_videos,
-                'watched_in_course': list(watched_in_course),
+                'watched_count': progress.watched_count,
+                'first_play': first_play,
             }
 
         return JsonResponse(response_data)
@@ -509,7 +689,7 @@ def check_course_completion(request, course_id):
             response_data = {
                 'success': True,
                 'completed': 0,
-                'total': CourseScheduleItem.objects.filter(day__course=course, is_active=True).count(),
+                'total': get_active_item_count(course.id),
                 'progress_percentage': 0.0,
                 'all_watched': False,
                 'exam_eligible': False,
@@ -517,20 +697,10 @@ def check_course_completion(request, course_id):
             }
             return JsonResponse(response_data)
 
-        progress, _ = CourseProgress.objects.get_or_create(course_access=course_access)
+        progress = get_or_create_progress(course_access)
 
-        all_course_videos = list(CourseScheduleItem.objects.filter(day__course=course, is_active=True).values_list('id', flat=True))
-        course_video_set = set(all_course_videos)
-
-        watched_ids_qs = VideoPlay.objects.filter(user=request.user, course_item__day__course=course).values_list('course_item', flat=True)
-        try:
-            watched_set = set(int(x) for x in watched_ids_qs)
-        except Exception:
-            watched_set = set()
-
-        watched_in_course = course_video_set.intersection(watched_set)
-        completed_count = len(watched_in_course)
-        total_items = len(course_video_set)
+        total_items = get_active_item_count(course.id)
+        completed_count = min(progress.watched_count, total_items)
 
         all_watched = (total_items > 0) and (completed_count == total_items)
         progress_percentage = (completed_count / total_items * 100) if total_items > 0 else 0
@@ -540,7 +710,7 @@ def check_course_completion(request, course_id):
             from django.utils import timezone
             progress.ready_for_exam = True
             progress.ready_for_exam_date = timezone.now()
-            progress.save()
+            progress.save(update_fields=['ready_for_exam', 'ready_for_exam_date'])
 
         exam_eligible = False
         # prepare defaults so response can reference them safely
@@ -624,117 +794,15 @@ def create_order(request, slug):
         for field, session_key in form_fields.items():
             request.session[session_key] = data.get(field)
 
-        # Get configuration from settings - use direct references
-        # Get configuration from settings using getattr for safety
-        razorpay_settings = getattr(django_settings, 'RAZORPAY_SETTINGS', {})
-        enabled = getattr(django_settings, 'RAZORPAY_ENABLED', False)
-        key_id = getattr(django_settings, 'RAZORPAY_KEY_ID', '')
-        key_secret = getattr(django_settings, 'RAZORPAY_KEY_SECRET', '')
-        currency = getattr(django_settings, 'RAZORPAY_CURRENCY', 'INR')
-
-        # If a local razorpay_config.py exists with explicit keys, prefer it
         try:
-            import razorpay_config
-            cfg = razorpay_config.get_config(test_mode=True)
-            # Only override if config contains keys
-            if cfg and cfg.get('KEY_ID') and cfg.get('KEY_SECRET'):
-                key_id = cfg.get('KEY_ID')
-                key_secret = cfg.get('KEY_SECRET')
-                # Respect explicit enabled flag in the config if present
-                enabled = cfg.get('ENABLED', enabled)
-                currency = cfg.get('CURRENCY', currency)
-                logger.info('Using razorpay_config.py for credentials')
-        except Exception:
-            # No local config present or failed to load: continue with settings
-            pass
-
-        # Print debug info
-        print("\nDEBUG: Razorpay Settings:")
-        print("-" * 50)
-        print(f"Settings dict = {razorpay_settings}")
-        print(f"ENABLED = {enabled}")
-        print(f"KEY_ID = {key_id}")
-        print(f"KEY_SECRET length = {len(key_secret) if key_secret else 0}")
-        print(f"CURRENCY = {currency}")
-        print("-" * 50)
-
-        # Debug logging for troubleshooting
-        # Log configuration details
-        logger.debug('Razorpay Configuration:')
-        logger.debug(f'- Package Available: {razorpay is not None}')
-        logger.debug(f'- Settings Enabled: {razorpay_settings.get("ENABLED", False)}')
-        logger.debug(f'- Effective Enabled: {enabled}')
-        logger.debug(f'- KEY_ID: {key_id}')
-        logger.debug(f'- KEY_SECRET length: {len(key_secret) if key_secret else 0}')
-        logger.debug(f'- Currency: {currency}')
-
-        # Log the actual configuration being used
-        logger.info(f"Using Razorpay config: ENABLED={enabled}, KEY_ID={key_id}, CURRENCY={currency}")
-        if django_settings.DEBUG:
-            print('DEBUG: create_order using config:', {
-                'ENABLED': enabled,
-                'KEY_ID': key_id,
-                'SECRET': '*' * 4 if key_secret else None,
-                'CURRENCY': currency
-            })
-
-        if razorpay is None:
-            logger.error('Razorpay package not available')
-            resp = {'error': 'Payment gateway not available'}
-            if django_settings.DEBUG:
-                resp['debug'] = {'reason': 'razorpay package not installed'}
-            return JsonResponse(resp, status=500)
-
-        razorpay_settings = getattr(django_settings, 'RAZORPAY_SETTINGS', {})
-        if not razorpay_settings.get('ENABLED', False):
-            logger.error('Razorpay is disabled in settings')
-            resp = {'error': 'Payment gateway not configured'}
-            if django_settings.DEBUG:
-                resp['debug'] = {
-                    'reason': 'razorpay is disabled in settings',
-                    'settings': razorpay_settings
-                }
-            return JsonResponse(resp, status=500)
-
-        if not key_id or not key_secret:
-            logger.error('Razorpay credentials missing')
+            client = payment_gateway.get_client()
+        except payment_gateway.GatewayUnavailable as e:
+            logger.error('Razorpay unavailable: %s', e.reason)
             resp = {'error': 'Payment gateway not configured'}
             if django_settings.DEBUG:
-                resp['debug'] = {
-                    'KEY_ID_present': bool(key_id),
-                    'KEY_SECRET_present': bool(key_secret),
-                    'reason': 'missing credentials'
-                }
-            return JsonResponse(resp, status=500)
-
-        # Initialize Razorpay client
-        try:
-            if 'razorpay' not in globals() or razorpay is None:
-                logger.error('Razorpay package not installed')
-                return JsonResponse({'error': 'Payment gateway not available'}, status=500)
-
-            # Log what we're using to init the client
-            if getattr(django_settings, 'DEBUG', False):
-                print('DEBUG: Initializing Razorpay client with:', {
-                    'key_id': key_id,
-                    'key_secret': '*' * 4 if key_secret else None
-                })
-            client = razorpay.Client(auth=(key_id, key_secret))
-            
-            # Test the client by fetching payments (lightweight API call)
-            client.payment.all({'count': 1})
-            logger.info('Razorpay client initialized and tested successfully')
-            
-        except Exception as e:
-            logger.exception('Razorpay client initialization/test failed')
-            resp = {'error': 'Payment gateway configuration error'}
-            if getattr(django_settings, 'DEBUG', False):
-                resp['debug'] = {
-                    'exception': str(e),
-                    'key_id': key_id,
-                    'key_secret_present': bool(key_secret)
-                }
+                resp['debug'] = {'reason': e.reason}
             return JsonResponse(resp, status=500)
+        gateway = payment_gateway.get_config()
 
         # Convert price to paise (Razorpay expects amount in smallest currency unit)
         try:
@@ -749,7 +817,7 @@ def create_order(request, slug):
         try:
             order_data = {
                 'amount': amount,
-                'currency': currency,
+                'currency': gateway['CURRENCY'],
                 'payment_capture': 1,
                 'notes': {
                     'course_id': course.id,
@@ -761,11 +829,12 @@ def create_order(request, slug):
             }
             order = client.order.create(data=order_data)
             logger.info(f'Razorpay order created: {order}')
+            payments.record_order(request.user, course, order['id'], course.discounted_price, order['currency'], data)
             return JsonResponse({
                 'id': order['id'],
                 'amount': order['amount'],
                 'currency': order['currency'],
-                'key': key_id
+                'key': gateway['KEY_ID']
             })
         except Exception as e:
             logger.exception('Error creating Razorpay order')
@@ -795,6 +864,10 @@ def create_order(request, slug):
 def payment_callback(request, slug):
     """
     Handle Razorpay payment callback.
+
+    The signature is verified locally and the payment is confirmed through
+    `core.payments.confirm_payment`, so the request makes no call to Razorpay
+    and is safe to repeat or to race with the webhook.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Invalid request method'}, status=400)
@@ -802,49 +875,15 @@ def payment_callback(request, slug):
     course = get_object_or_404(Course, slug=slug, is_active=True)
     
     try:
-        # Get configuration from settings using getattr for safety
-        enabled = getattr(django_settings, 'RAZORPAY_ENABLED', False)
-        key_id = getattr(django_settings, 'RAZORPAY_KEY_ID', '')
-        key_secret = getattr(django_settings, 'RAZORPAY_KEY_SECRET', '')
-        currency = getattr(django_settings, 'RAZORPAY_CURRENCY', 'INR')
-
-        # If a local razorpay_config.py exists with explicit keys, prefer it
         try:
-            import razorpay_config
-            cfg = razorpay_config.get_config(test_mode=True)
-            if cfg and cfg.get('KEY_ID') and cfg.get('KEY_SECRET'):
-                key_id = cfg.get('KEY_ID')
-                key_secret = cfg.get('KEY_SECRET')
-                enabled = cfg.get('ENABLED', enabled)
-                currency = cfg.get('CURRENCY', currency)
-                logger.info('Using razorpay_config.py for credentials in payment_callback')
-        except Exception:
-            pass
-
-        if razorpay is None:
-            logger.error('Razorpay package not installed')
-            return JsonResponse(
-                {'error': 'Payment gateway not available', 'detail': 'razorpay package not installed'},
-                status=500
-            )
-
-        if not enabled:
-            logger.error('Razorpay is not enabled')
-            return JsonResponse(
-                {'error': 'Payment gateway not configured', 'detail': 'razorpay is disabled'},
-                status=500
-            )
-
-        if not key_id or not key_secret:
-            logger.error('Razorpay credentials missing')
+            client = payment_gateway.get_client()
+        except payment_gateway.GatewayUnavailable as e:
+            logger.error('Razorpay unavailable: %s', e.reason)
             return JsonResponse(
-                {'error': 'Payment gateway not configured', 'detail': 'missing credentials'},
+                {'error': 'Payment gateway not configured', 'detail': e.reason},
                 status=500
             )
 
-        # Initialize Razorpay client
-        client = razorpay.Client(auth=(key_id, key_secret))
-        
         # Parse and validate request data
         try:
             data = json.loads(request.body)
@@ -878,47 +917,30 @@ def payment_callback(request, slug):
             client.utility.verify_payment_signature(params_dict)
             logger.info('Payment signature verified successfully')
             
-            # Fetch payment details to verify status
-            payment_details = client.payment.fetch(params_dict['razorpay_payment_id'])
-            if payment_details.get('status') != 'captured':
-                logger.error(f'Payment not captured. Status: {payment_details.get("status")}')
+            # Check that the order is this user's purchase of this course
+            # before anything is granted; the webhook may already have
+            # confirmed it, which confirm_payment handles under a row lock.
+            # Capture is checked later by the confirm_payment_captures sweep.
+            order_id = params_dict['razorpay_order_id']
+            payment = CoursePayment.objects.filter(order_id=order_id).only('user_id', 'course_id').first()
+            if payment is None:
+                # Orders created before pending payments were recorded
+                try:
+                    payment = payments.record_gateway_order(
+                        request.user, order_id,
+                        {field: request.session.get(f'checkout_{field}', '') for field in payments.BILLING_FIELDS},
+                    )
+                except payments.OrderMismatch as e:
+                    payment = None
+                    logger.error(f'Rejected callback: {e}')
+            if payment is None or payment.user_id != request.user.id or payment.course_id != course.id:
+                logger.error(f'Order {order_id} does not belong to user {request.user.id} / course {course.id}')
                 return JsonResponse(
-                    {'error': 'Payment not completed', 'detail': 'payment not captured'},
+                    {'error': 'Payment verification failed', 'detail': 'order mismatch'},
                     status=400
                 )
-            
-            # Get or create payment record
-            payment = CoursePayment.objects.filter(order_id=params_dict['razorpay_order_id']).first()
-            if not payment:
-                payment = CoursePayment(
-                    user=request.user,
-                    course=course,
-                    order_id=params_dict['razorpay_order_id'],
-                    payment_id=params_dict['razorpay_payment_id'],
-                    amount=course.discounted_price,
-                    currency='INR',
-                    first_name=request.session.get('checkout_first_name', ''),
-                    last_name=request.session.get('checkout_last_name', ''),
-                    email=request.session.get('checkout_email', ''),
-                    phone=request.session.get('checkout_phone', ''),
-                    address=request.session.get('checkout_address', ''),
-                    city=request.session.get('checkout_city', ''),
-                    state=request.session.get('checkout_state', ''),
-                    zip_code=request.session.get('checkout_zip', ''),
-                    status='successful'
-                )
-                payment.save()
-            
-            # Grant course access
-            CourseAccess.objects.get_or_create(
-                user=request.user,
-                course=course,
-                defaults={
-                    'payment': payment,
-                    'is_active': True
-                }
-            )
-            
+            payments.confirm_payment(order_id, params_dict['razorpay_payment_id'], payments.CALLBACK)
+
             # Clear checkout session data
             checkout_fields = [
                 'checkout_first_name', 'checkout_last_name', 'checkout_email',
@@ -954,6 +976,28 @@ def payment_callback(request, slug):
             status=500
         )
 
+@csrf_exempt
+def razorpay_webhook(request):
+    """
+    Receive Razorpay webhook events.
+
+    The X-Razorpay-Signature header is checked against an HMAC of the raw
+    body with RAZORPAY_WEBHOOK_SECRET, without calling Razorpay. Any 2xx
+    stops Razorpay from retrying, so known-but-irrelevant events also get 200.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    if not payments.verify_webhook_signature(request.body, request.headers.get('X-Razorpay-Signature', '')):
+        logger.warning('Rejected Razorpay webhook with an invalid signature')
+        return JsonResponse({'error': 'Invalid signature'}, status=400)
+    try:
+        event = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    outcome = payments.handle_webhook_event(event)
+    logger.info(f'Razorpay webhook {event.get("event")}: {outcome}')
+    return JsonResponse({'status': outcome})
+
 def payment_debug(request):
     """
     Development-only endpoint to view effective Razorpay configuration and auth state.
@@ -973,6 +1017,16 @@ def payment_debug(request):
         'CURRENCY': getattr(django_settings, 'RAZORPAY_CURRENCY', 'INR'),
         'razorpay_package_importable': (razorpay is not None),
     }
+    # What the shared client actually uses, and the last background health check
+    gateway = payment_gateway.get_config()
+    resp['effective_config'] = {
+        'SOURCE': gateway['SOURCE'],
+        'ENABLED': gateway['ENABLED'],
+        'KEY_ID_present': bool(gateway['KEY_ID']),
+        'KEY_SECRET_present': bool(gateway['KEY_SECRET']),
+        'CURRENCY': gateway['CURRENCY'],
+    }
+    resp['health_check'] = payment_gateway.health()
     # Also report any local razorpay_config.py values for clarity
     try:
         import razorpay_config
@@ -997,7 +1051,10 @@ def download_exam_certificate(request, certificate_id):
     Allow logged-in users to download their exam certificates.
     Only the certificate owner or admin can download.
     """
-    certificate = get_object_or_404(ExamCertificate, id=certificate_id, is_active=True)
+    certificate = get_object_or_404(
+        ExamCertificate.objects.select_related('exam_attempt__course_access'),
+        id=certificate_id, is_active=True,
+    )
     
     # Check if user is the certificate owner or is admin
     if certificate.exam_attempt.course_access.user != request.user and not request.user.is_staff:
@@ -1010,12 +1067,22 @@ def download_exam_certificate(request, certificate_id):
         return redirect('my-purchase')
     
     try:
-        return FileResponse(
-            certificate.certificate_file.open('rb'),
+        return media_streaming.protected_file_response(
+            request,
+            certificate.certificate_file,
+            filename=f"{certificate.student_name.replace(' ', '_')}_certificate_{certificate.id}.pdf",
             as_attachment=True,
-            filename=f"{certificate.student_name.replace(' ', '_')}_certificate_{certificate.id}.pdf"
         )
+    except Http404:
+        messages.error(request, 'Certificate file is not available yet.')
+        return redirect('my-purchase')
     except Exception as e:
         logger.error(f"Error downloading certificate {certificate_id}: {str(e)}")
         messages.error(request, 'Error downloading certificate.')
         return redirect('my-purchase')
+
+
+@staff_member_required
+def cache_metrics(request):
+    """Staff-only JSON with this worker's cache hit/miss counters (see `core.cache`)."""
+    return JsonResponse(shared_cache.metrics())
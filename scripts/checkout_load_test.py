@@ -0,0 +1,267 @@
+"""End-to-end checkout load test against a running server and the Razorpay stub.
+
+Each simulated checkout logs in as its own user and walks the real flow:
+
+    POST /course/<slug>/create-order/        (app -> stub order create)
+    POST <stub>/stub/pay                     (the customer pays)
+    POST /course/<slug>/payment-callback/    (what Razorpay Checkout's handler does)
+
+while the stub may deliver webhooks for the same payments concurrently.
+Afterwards the database is checked for lost payments (paid at the stub but
+no successful CoursePayment with active access) and double grants (a user
+with more than one successful payment for the course; access rows are unique
+per user and course, so they cannot show one). Responses that are not the
+expected JSON count as failed checkouts rather than aborting the run.
+
+Typical run:
+    python scripts/razorpay_stub.py --port 9100 --latency-ms 150 --jitter-ms 50 \\
+        --webhook-url http://127.0.0.1:8000/payments/razorpay/webhook/ --webhook-copies 2
+    RAZORPAY_BASE_URL=http://127.0.0.1:9100 RAZORPAY_WEBHOOK_SECRET=stub-webhook-secret \\
+        gunicorn Online_Course.asgi:application -k uvicorn.workers.UvicornWorker --workers 4
+    python scripts/checkout_load_test.py --checkouts 200 --concurrency 20
+
+The server and this script must use the same database; users are created
+directly through the ORM (loadtest-<run>-<n>@example.com) and deleted, with
+their accesses and payments, when the run ends.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Online_Course.settings')
+import django
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db.models import Count
+from core.models import Course, CourseAccess, CoursePayment
+
+STEPS = ('login', 'create_order', 'pay', 'callback', 'checkout')
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of `values` (milliseconds), or None."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Browser:
+    """Cookie-keeping HTTP client standing in for one customer's browser."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def request(self, method, url, data=None, json_body=None, headers=None):
+        headers = dict(headers or {})
+        body = None
+        if json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode('utf-8')
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if not url.startswith('http'):
+            url = self.base_url + url
+            headers.setdefault('Referer', self.base_url + '/')
+            if method == 'POST':
+                headers.setdefault('X-CSRFToken', self.csrf_token())
+        request = urllib.request.Request(url, data=body, method=method, headers=headers)
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except (urllib.error.URLError, OSError) as e:
+            # Refused or reset connections count as a failed step, status 0
+            return 0, str(e).encode('utf-8')
+
+
+def timed(timings, step, call):
+    started = time.perf_counter()
+    try:
+        return call()
+    finally:
+        timings[step] = (time.perf_counter() - started) * 1000
+
+
+def run_checkout(args, email, course):
+    """One simulated checkout; returns a result dict."""
+    result = {'email': email, 'timings': {}, 'error': None, 'order_id': None, 'paid': False}
+    timings = result['timings']
+    browser = Browser(args.base_url)
+    started = time.perf_counter()
+
+    def fail(step, status, body):
+        result['error'] = f'{step}:{status}'
+        if args.verbose:
+            print(f'{email} {step} -> {status}: {body[:200]!r}', file=sys.stderr)
+        return result
+
+    browser.request('GET', '/login/')
+    status, body = timed(timings, 'login', lambda: browser.request('POST', '/login/', data={
+        'email': email, 'password': args.password, 'csrfmiddlewaretoken': browser.csrf_token(),
+    }))
+    if status not in (200, 302) or not any(c.name == 'sessionid' for c in browser.cookies):
+        return fail('login', status, body)
+
+    status, body = timed(timings, 'create_order', lambda: browser.request(
+        'POST', f'/course/{course.slug}/create-order/', json_body={
+            'first_name': 'Load', 'last_name': 'Test', 'email': email, 'phone': '9999999999',
+            'address': '1 Test Street', 'city': 'Chennai', 'state': 'TN', 'zip': '600001',
+        }))
+    if status != 200:
+        return fail('create_order', status, body)
+    try:
+        result['order_id'] = json.loads(body)['id']
+    except (ValueError, KeyError, TypeError):
+        # e.g. an HTML error page or an error object with a 200
+        return fail('create_order', f'{status}-invalid', body)
+
+    status, body = timed(timings, 'pay', lambda: browser.request(
+        'POST', args.stub_url.rstrip('/') + '/stub/pay', json_body={'order_id': result['order_id']}))
+    if status != 200:
+        return fail('pay', status, body)
+    try:
+        checkout_response = json.loads(body)
+    except ValueError:
+        return fail('pay', f'{status}-invalid', body)
+    result['paid'] = True
+
+    # A closed tab never reaches the callback; only the webhook can grant then
+    if random.random() >= args.skip_callback_rate:
+        status, body = timed(timings, 'callback', lambda: browser.request(
+            'POST', f'/course/{course.slug}/payment-callback/', json_body=checkout_response))
+        if status != 200:
+            return fail('callback', status, body)
+    else:
+        result['callback_skipped'] = True
+    timings['checkout'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def audit(run_users, course, paid_orders):
+    """Count lost payments and double grants for this run's users."""
+    payments = {
+        p.order_id: p for p in CoursePayment.objects.filter(order_id__in=paid_orders).select_related('user')
+    }
+    active_users = set(
+        CourseAccess.objects.filter(user__in=run_users, course=course, is_active=True).values_list('user_id', flat=True)
+    )
+    lost = [
+        order_id for order_id in paid_orders
+        if order_id not in payments or payments[order_id].status != 'successful'
+        or payments[order_id].user_id not in active_users
+    ]
+    # CourseAccess is unique per (user, course), so a second grant shows up
+    # as a second successful payment (each run user checks out once)
+    double_paid = (
+        CoursePayment.objects.filter(user__in=run_users, course=course, status='successful')
+        .values('user_id').annotate(rows=Count('pk')).filter(rows__gt=1).count()
+    )
+    confirmed_via = Counter(p.confirmed_via or 'unconfirmed' for p in payments.values())
+    captured = sum(1 for p in payments.values() if p.captured_at)
+    return {
+        'lost_payments': lost,
+        'double_grants': double_paid,
+        'confirmed_via': dict(confirmed_via),
+        'captured': captured,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent checkout load test')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--stub-url', default='http://127.0.0.1:9100')
+    parser.add_argument('--course', help='Course slug (default: first active paid course)')
+    parser.add_argument('--checkouts', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--skip-callback-rate', type=float, default=0.0,
+                        help='Fraction of checkouts whose browser never calls back')
+    parser.add_argument('--settle-seconds', type=float, default=5.0,
+                        help='Wait for webhooks before auditing')
+    parser.add_argument('--password', default='loadtest-pass')
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if args.course:
+        course = Course.objects.get(slug=args.course, is_active=True)
+    else:
+        course = Course.objects.filter(is_active=True, discounted_price__gt=0).order_by('pk').first()
+        if course is None:
+            sys.exit('No active paid course to check out; pass --course')
+
+    run = uuid.uuid4().hex[:8]
+    prefix = f'loadtest-{run}-'
+    try:
+        emails = [f'{prefix}{n}@example.com' for n in range(args.checkouts)]
+        User.objects.bulk_create([User(username=email, email=email) for email in emails])
+        run_users = list(User.objects.filter(username__in=emails))
+        for user in run_users:
+            user.set_password(args.password)
+        User.objects.bulk_update(run_users, ['password'])
+
+        print(f'Run {run}: {args.checkouts} checkouts of "{course.slug}" at concurrency {args.concurrency}')
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(lambda email: run_checkout(args, email, course), emails))
+        elapsed = time.perf_counter() - started
+
+        completed = [r for r in results if not r['error']]
+        errors = Counter(r['error'] for r in results if r['error'])
+        print(f'\nCompleted {len(completed)}/{len(results)} checkouts in {elapsed:.2f}s '
+              f'({len(completed) / elapsed:.1f} checkouts/s)')
+        if errors:
+            print('Errors: ' + ', '.join(f'{step} x{count}' for step, count in errors.most_common()))
+
+        print(f'\n{"step":<14}{"n":>6}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+        for step in STEPS:
+            values = [r['timings'][step] for r in results if step in r['timings']]
+            if values:
+                print(f'{step:<14}{len(values):>6}' + ''.join(
+                    f'{percentile(values, pct):>10.1f}' for pct in (50, 95, 99)))
+
+        if args.settle_seconds:
+            time.sleep(args.settle_seconds)
+        paid_orders = [r['order_id'] for r in results if r['paid']]
+        report = audit(run_users, course, paid_orders)
+        print(f'\nPaid at stub:     {len(paid_orders)}')
+        print(f'Callbacks skipped: {sum(1 for r in results if r.get("callback_skipped"))}')
+        print(f'Confirmed via:    {report["confirmed_via"]}')
+        print(f'Captured:         {report["captured"]}')
+        print(f'Lost payments:    {len(report["lost_payments"])}')
+        print(f'Double grants:    {report["double_grants"]}')
+        if report['lost_payments'] and args.verbose:
+            print('Lost orders: ' + ', '.join(report['lost_payments']))
+        sys.exit(1 if report['lost_payments'] or report['double_grants'] else 0)
+    finally:
+        # Users cascade to their course accesses and payments
+        deleted = User.objects.filter(username__startswith=prefix).delete()[1].get('auth.User', 0)
+        print(f'Removed {deleted} load-test users of run {run}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+"""Local stand-in for the Razorpay API, for exercising checkout offline.
+
+Implements just what the app uses:
+
+    POST /v1/orders              create an order (Basic auth: key id / secret)
+    GET  /v1/orders/<id>         fetch an order
+    GET  /v1/payments/<id>       fetch a payment
+    GET  /v1/payments            list payments (used by the health check)
+
+plus endpoints playing the customer's part and reporting on the run:
+
+    POST /stub/pay {"order_id": ...}
+        "pays" an order and returns the fields Razorpay Checkout hands to the
+        browser (razorpay_order_id, razorpay_payment_id, razorpay_signature),
+        signed with the key secret. With --webhook-url it also delivers a
+        signed `payment.captured` webhook to the app.
+    GET  /stub/stats
+        counts of orders, payments, webhooks and injected failures.
+
+Latency and failures can be injected into the /v1 API (--latency-ms,
+--jitter-ms, --fail-rate) and into webhook delivery (--webhook-delay-ms,
+--webhook-copies for duplicate deliveries, --webhook-drop-rate).
+scripts/checkout_load_test.py drives checkouts through it.
+
+Usage:
+    python scripts/razorpay_stub.py --port 9100 \\
+        --webhook-url http://127.0.0.1:8000/payments/razorpay/webhook/
+
+    # and run the app against it:
+    RAZORPAY_BASE_URL=http://127.0.0.1:9100 RAZORPAY_WEBHOOK_SECRET=stub-webhook-secret ...
+
+Credentials default to the ones the app resolves (razorpay_config.py, then
+RAZORPAY_KEY_ID / RAZORPAY_KEY_SECRET); the webhook secret defaults to
+RAZORPAY_WEBHOOK_SECRET or "stub-webhook-secret".
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+
+def default_credentials():
+    """Key id / secret the app would use, without importing Django."""
+    try:
+        import razorpay_config
+        cfg = razorpay_config.get_config(test_mode=True)
+        if cfg.get('KEY_ID') and cfg.get('KEY_SECRET'):
+            return cfg['KEY_ID'], cfg['KEY_SECRET']
+    except Exception:
+        pass
+    return os.environ.get('RAZORPAY_KEY_ID', 'rzp_test_stub'), os.environ.get('RAZORPAY_KEY_SECRET', 'stub-secret')
+
+
+def sign(secret, message):
+    return hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+class StubState:
+    """Orders and payments held in memory."""
+
+    def __init__(self, key_id, key_secret, webhook_secret, webhook_url=None,
+                 latency_ms=0, jitter_ms=0, fail_rate=0.0,
+                 webhook_delay_ms=0, webhook_copies=1, webhook_drop_rate=0.0):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.webhook_secret = webhook_secret
+        self.webhook_url = webhook_url
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.fail_rate = fail_rate
+        self.webhook_delay_ms = webhook_delay_ms
+        self.webhook_copies = webhook_copies
+        self.webhook_drop_rate = webhook_drop_rate
+        self.lock = threading.Lock()
+        self.orders = {}
+        self.payments = {}
+        self.counters = {'api_calls': 0, 'injected_failures': 0, 'webhooks_sent': 0,
+                         'webhooks_failed': 0, 'webhooks_dropped': 0}
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def simulate_api_call(self):
+        """Sleep for the configured latency; True when this call should fail."""
+        self.count('api_calls')
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if random.random() < self.fail_rate:
+            self.count('injected_failures')
+            return True
+        return False
+
+    def stats(self):
+        with self.lock:
+            return {'orders': len(self.orders), 'payments': len(self.payments), **self.counters}
+
+    def create_order(self, data):
+        order = {
+            'id': 'order_' + uuid.uuid4().hex[:14],
+            'entity': 'order',
+            'amount': int(data.get('amount', 0)),
+            'amount_paid': 0,
+            'currency': data.get('currency', 'INR'),
+            'status': 'created',
+            'notes': data.get('notes') or {},
+            'created_at': int(time.time()),
+        }
+        with self.lock:
+            self.orders[order['id']] = order
+        return order
+
+    def pay(self, order_id):
+        with self.lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                return None
+            payment = {
+                'id': 'pay_' + uuid.uuid4().hex[:14],
+                'entity': 'payment',
+                'order_id': order_id,
+                'amount': order['amount'],
+                'currency': order['currency'],
+                'status': 'captured',
+                'captured': True,
+                'created_at': int(time.time()),
+            }
+            self.payments[payment['id']] = payment
+            order.update(status='paid', amount_paid=order['amount'])
+        return payment
+
+    def checkout_response(self, payment):
+        """What Razorpay Checkout passes to the page's success handler."""
+        message = f"{payment['order_id']}|{payment['id']}".encode('utf-8')
+        return {
+            'razorpay_order_id': payment['order_id'],
+            'razorpay_payment_id': payment['id'],
+            'razorpay_signature': sign(self.key_secret, message),
+        }
+
+    def deliver_webhooks(self, event, payment):
+        """Deliver `event` as configured: delayed, duplicated or dropped."""
+        if random.random() < self.webhook_drop_rate:
+            self.count('webhooks_dropped')
+            return
+        if self.webhook_delay_ms:
+            time.sleep(self.webhook_delay_ms / 1000)
+        for _ in range(self.webhook_copies):
+            status = self.send_webhook(event, payment)
+            self.count('webhooks_sent' if status == 200 else 'webhooks_failed')
+
+    def send_webhook(self, event, payment):
+        body = json.dumps({
+            'entity': 'event',
+            'event': event,
+            'payload': {'payment': {'entity': payment}},
+            'created_at': int(time.time()),
+        }).encode('utf-8')
+        request = urllib.request.Request(self.webhook_url, data=body, method='POST', headers={
+            'Content-Type': 'application/json',
+            'X-Razorpay-Signature': sign(self.webhook_secret, body),
+            'X-Razorpay-Event-Id': 'evt_' + uuid.uuid4().hex[:14],
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status
+        except Exception as e:
+            print(f'webhook delivery failed: {e}', file=sys.stderr)
+            return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _authorized(self):
+        expected = base64.b64encode(f'{self.state.key_id}:{self.state.key_secret}'.encode('utf-8')).decode('ascii')
+        if self.headers.get('Authorization') == f'Basic {expected}':
+            return True
+        self._json(401, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'Authentication failed'}})
+        return False
+
+    def _injected_failure(self):
+        if self.state.simulate_api_call():
+            self._json(500, {'error': {'code': 'SERVER_ERROR', 'description': 'Injected failure'}})
+            return True
+        return False
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        if path == '/stub/stats':
+            return self._json(200, self.state.stats())
+        if not self._authorized() or self._injected_failure():
+            return
+        if path == '/v1/payments':
+            with self.state.lock:
+                items = list(self.state.payments.values())[-1:]
+            return self._json(200, {'entity': 'collection', 'count': len(items), 'items': items})
+        if path.startswith('/v1/orders/'):
+            order = self.state.orders.get(path.rsplit('/', 1)[-1])
+            if order is None:
+                return self._json(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The id provided does not exist'}})
+            return self._json(200, order)
+        if path.startswith('/v1/payments/'):
+            payment = self.state.payments.get(path.rsplit('/', 1)[-1])
+            if payment is None:
+                return self._json(400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The id provided does not exist'}})
+            return self._json(200, payment)
+        self._json(404, {'error': {'code': 'NOT_FOUND'}})
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        # Read the body up front so error responses keep the connection usable
+        data = self._body()
+        if path == '/v1/orders':
+            if not self._authorized() or self._injected_failure():
+                return
+            return self._json(200, self.state.create_order(data))
+        if path == '/stub/pay':
+            payment = self.state.pay(data.get('order_id'))
+            if payment is None:
+                return self._json(404, {'error': 'unknown order'})
+            if self.state.webhook_url:
+                threading.Thread(target=self.state.deliver_webhooks, args=('payment.captured', payment), daemon=True).start()
+            return self._json(200, self.state.checkout_response(payment))
+        self._json(404, {'error': {'code': 'NOT_FOUND'}})
+
+
+def make_server(host, port, state):
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    key_id, key_secret = default_credentials()
+    parser = argparse.ArgumentParser(description='Local Razorpay API stub')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--key-id', default=key_id)
+    parser.add_argument('--key-secret', default=key_secret)
+    parser.add_argument('--webhook-secret', default=os.environ.get('RAZORPAY_WEBHOOK_SECRET') or 'stub-webhook-secret')
+    parser.add_argument('--webhook-url', default=None,
+                        help='Deliver a signed payment.captured webhook here for every payment')
+    parser.add_argument('--latency-ms', type=float, default=0, help='Added latency of every /v1 call')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='Uniform +/- jitter on that latency')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of /v1 calls answered with a 500')
+    parser.add_argument('--webhook-delay-ms', type=float, default=0, help='Delay before delivering webhooks')
+    parser.add_argument('--webhook-copies', type=int, default=1, help='Deliveries per webhook (>1 simulates retries)')
+    parser.add_argument('--webhook-drop-rate', type=float, default=0.0, help='Fraction of webhooks never delivered')
+    args = parser.parse_args()
+
+    state = StubState(
+        args.key_id, args.key_secret, args.webhook_secret, args.webhook_url,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, fail_rate=args.fail_rate,
+        webhook_delay_ms=args.webhook_delay_ms, webhook_copies=args.webhook_copies,
+        webhook_drop_rate=args.webhook_drop_rate,
+    )
+    server = make_server(args.host, args.port, state)
+    print(f'Razorpay stub listening on http://{args.host}:{args.port} (key id {args.key_id})')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,14 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
-# Run migrations and collectstatic, then exec gunicorn. Using exec so signals
-# are forwarded correctly.
+# Refuse to start on a misconfigured deployment (see core/checks.py)
+python manage.py check --deploy
+
+# Run migrations, create the cache table and collectstatic, then exec
+# gunicorn. Using exec so signals are forwarded correctly.
 python manage.py migrate --no-input
+python manage.py createcachetable
 python manage.py collectstatic --no-input
 
 # Exec gunicorn so it becomes PID 1 in the container/process and receives signals
-exec gunicorn --bind 0.0.0.0:$PORT Online_Course.wsgi:application --timeout 120 --workers 4 --access-logfile - --error-logfile -
+exec gunicorn --bind 0.0.0.0:$PORT Online_Course.asgi:application -k uvicorn.workers.UvicornWorker --timeout 120 --workers 4 --access-logfile - --error-logfile -